@@ -8,3 +8,10 @@ class ApiConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Подключает учет SQL-запросов в метриках и сброс
+        кэша токенов."""
+
+        import api.authentication  # noqa: F401
+        import api.metrics  # noqa: F401
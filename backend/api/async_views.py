@@ -0,0 +1,76 @@
+"""Модуль асинхронных представлений для приложения Api.
+
+Под ASGI Django выполняет синхронные представления по одному
+в общем потоке, поэтому медленные клиенты и тяжелые запросы
+задерживают все остальные. Чтение тегов, ингредиентов и рецептов
+оборачивается в асинхронные представления: запрос обрабатывается тем же
+вьюсетом, что и под WSGI, но в пуле потоков цикла событий, и ответ
+не отличается от синхронного. Запросы на запись через маршруты списка
+и объекта рецептов выполняются в общем потоке, как и без обертки.
+
+Потоковые ответы Django 3.2 под ASGI перебирает в цикле событий,
+где генератор не может обращаться к базе, поэтому содержимое потокового
+ответа (список покупок) собирается по частям в потоке пула.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+ASYNC_ROUTES = (
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+)
+
+
+def make_async(view):
+    """Асинхронная обертка представления DRF."""
+
+    def run(request, *args, **kwargs):
+        # Поток пула не получает сигналов начала и конца запроса,
+        # поэтому подключения к базе закрываются здесь.
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = list(response.streaming_content)
+            elif hasattr(response, 'render'):
+                # Ответ отрисовывается в потоке пула: иначе Django
+                # отрисует его в общем потоке синхронного кода.
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    run_in_pool = sync_to_async(run, thread_sensitive=False)
+    run_in_main_thread = sync_to_async(view, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await run_in_pool(request, *args, **kwargs)
+        return await run_in_main_thread(request, *args, **kwargs)
+
+    return async_view
+
+
+def get_async_urls(urls) -> list:
+    """Заменяет представления маршрутов ASYNC_ROUTES асинхронными,
+    сохраняя порядок маршрутов."""
+
+    return [
+        URLPattern(
+            url.pattern, make_async(url.callback), url.default_args, url.name
+        )
+        if url.name in ASYNC_ROUTES
+        else url
+        for url in urls
+    ]
@@ -0,0 +1,103 @@
+"""Модуль аутентификации для приложения Api.
+
+TokenAuthentication на каждом запросе читает токен вместе
+с пользователем из базы данных. CachedTokenAuthentication хранит
+найденный токен с пользователем в кэше tokens, поэтому запросы
+с известным токеном аутентифицируются без обращения к базе.
+
+Запись кэша живет TIMEOUT секунд и сразу заменяется отметкой
+об отзыве, когда токен удаляется (выход из системы) или пользователь
+изменяется (смена пароля, блокировка). Отметка не дает запросу,
+прочитавшему токен из базы до отзыва, вернуть его в кэш.
+
+Счетчики пользователя меняются запросами UPDATE без сохранения модели
+и в кэше устаревают, поэтому пользователь загружается без них: save()
+сохраняет только загруженные поля и не перезаписывает счетчики.
+"""
+
+import hashlib
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from recipes.signals import is_last_login_update
+from users.models import User
+
+CACHE_ALIAS = 'tokens'
+REVOKED = 'revoked'
+# Время жизни отметки об отзыве, с. Должно быть больше длительности
+# запроса, прочитавшего токен из базы.
+REVOKED_TIMEOUT = 60
+DEFERRED_USER_FIELDS = ('recipes_count', 'subscribers_count')
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def make_key(key: str) -> str:
+    """Ключ записи кэша. Сам токен в ключе не хранится."""
+
+    return 'token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def revoke(keys):
+    """Убирает токены keys из кэша."""
+
+    if keys:
+        get_cache().set_many(
+            {make_key(key): REVOKED for key in keys}, REVOKED_TIMEOUT
+        )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшем токенов."""
+
+    def get_token(self, key: str) -> Token:
+        """Токен с пользователем без полей-счетчиков."""
+
+        try:
+            return (
+                Token.objects.select_related('user')
+                .defer(*(f'user__{field}' for field in DEFERRED_USER_FIELDS))
+                .get(key=key)
+            )
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        cache_key = make_key(key)
+        cached = cache.get(cache_key)
+        token = (
+            self.get_token(key)
+            if cached is None or cached == REVOKED
+            else cached
+        )
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        if cached is None:
+            cache.add(cache_key, token)
+        return token.user, token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def revoke_token(sender, instance, created=False, **kwargs):
+    if not created:
+        revoke([instance.key])
+
+
+@receiver(post_save, sender=User)
+def revoke_user_tokens(sender, instance, created, update_fields, **kwargs):
+    if created or is_last_login_update(update_fields):
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    revoke(list(keys))
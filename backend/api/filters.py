@@ -1,14 +1,18 @@
 """Модуль фильтров для представлений приложения Api."""
 
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (
     BooleanFilter,
     CharFilter,
     FilterSet,
-    ModelMultipleChoiceFilter,
+    MultipleChoiceFilter,
     NumberFilter,
 )
 
-from recipes.models import Recipe, Tag
+from api.paginator import CursorPageLimitPagination
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from recipes.tag_registry import get_tag_choices, tag_registry
 from users.models import User
 
 
@@ -23,19 +27,36 @@ class RecipeFilter(FilterSet):
 
     author = NumberFilter(field_name='author', lookup_expr='exact')
 
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = MultipleChoiceFilter(choices=get_tag_choices, method='filter_tags')
     is_favorited = BooleanFilter(method='filter_is_favorited')
 
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
 
+    search = CharFilter(method='filter_search')
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов.
+
+        Условие EXISTS не размножает строки рецептов с несколькими
+        тегами, поэтому DISTINCT не нужен.
+        """
+
+        if not value:
+            return queryset
+        tag_ids = tag_registry.get_ids()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=[tag_ids.get(slug) for slug in value],
+                )
+            )
+        )
+
     def filter_is_favorited(self, queryset, name, value):
         user: User = self.request.user
         if not user.is_anonymous and value:
@@ -47,3 +68,17 @@ class RecipeFilter(FilterSet):
         if not user.is_anonymous and value:
             return queryset.filter(shopping_cart_recipes__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, тегам, ингредиентам
+        и описанию.
+
+        Результаты упорядочиваются по релевантности, в режиме курсора -
+        по id.
+        """
+
+        cursor_mode = (
+            CursorPageLimitPagination.cursor_query_param
+            in self.request.query_params
+        )
+        return search_recipes(queryset, value, rank=not cursor_mode)
@@ -0,0 +1,517 @@
+"""Модуль метрик запросов к API.
+
+Для каждого запроса учитываются количество SQL-запросов, время
+в базе данных, время сериализации и общее время. Метрики копятся
+в памяти процесса по имени представления (recipes-list,
+recipes-download-shopping-cart) и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд записываются в файл процесса
+в каталоге METRICS_DIR. Эндпоинт /metrics суммирует файлы всех
+процессов gunicorn и отдает их в текстовом формате Prometheus.
+
+Метрики запроса хранятся в переменной контекста, поэтому их
+дополняют и SQL-запросы из потоков, в которых асинхронные
+представления выполняют синхронный код.
+
+Вместе с метриками запросов в файл процесса записывается состояние
+его пулов подключений к базе (foodgram_backend.db_pool), а время
+ожидания подключения учитывается в метриках запроса.
+
+Файл процесса называется по его pid и случайной метке, поэтому
+процесс, получивший pid завершившегося, не перезаписывает его метрики.
+При сборе метрики завершившихся процессов переносятся в общий файл
+archive.json, а их файлы удаляются: счетчики не уменьшаются, а число
+файлов не растет. Состояние пулов отдается только для работающих
+процессов.
+"""
+
+import fcntl
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from foodgram_backend.db_pool import connection_checked_out, get_pool_stats
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Общее время обработки запроса.',
+        TIME_BUCKETS,
+    ),
+    'foodgram_request_db_seconds': (
+        'Время выполнения SQL-запросов за запрос.',
+        TIME_BUCKETS,
+    ),
+    'foodgram_request_serializer_seconds': (
+        'Время сериализации ответа, включая подгрузку связанных объектов.',
+        TIME_BUCKETS,
+    ),
+    'foodgram_request_queries': (
+        'Количество SQL-запросов за запрос.',
+        QUERY_BUCKETS,
+    ),
+    'foodgram_request_pool_wait_seconds': (
+        'Время ожидания подключения из пула за запрос.',
+        TIME_BUCKETS,
+    ),
+}
+REQUESTS_TOTAL = 'foodgram_requests_total'
+# Метрики пулов подключений: имя, тип, описание и поле get_pool_stats.
+POOL_METRICS = (
+    ('foodgram_db_pool_size', 'gauge', 'Открытых подключений пула.', 'size'),
+    (
+        'foodgram_db_pool_in_use',
+        'gauge',
+        'Выданных подключений пула.',
+        'in_use',
+    ),
+    ('foodgram_db_pool_idle', 'gauge', 'Свободных подключений пула.', 'idle'),
+    (
+        'foodgram_db_pool_max_size',
+        'gauge',
+        'Наибольшее число подключений пула.',
+        'max_size',
+    ),
+    (
+        'foodgram_db_pool_waiting',
+        'gauge',
+        'Потоков, ожидающих подключения из пула.',
+        'waiting',
+    ),
+    (
+        'foodgram_db_pool_checkouts_total',
+        'counter',
+        'Выдач подключений из пула.',
+        'checkouts',
+    ),
+    (
+        'foodgram_db_pool_timeouts_total',
+        'counter',
+        'Отказов пула по истечении времени ожидания.',
+        'timeouts',
+    ),
+    (
+        'foodgram_db_pool_created_total',
+        'counter',
+        'Открытых пулом подключений.',
+        'created',
+    ),
+    (
+        'foodgram_db_pool_discarded_total',
+        'counter',
+        'Закрытых пулом подключений.',
+        'discarded',
+    ),
+    (
+        'foodgram_db_pool_wait_seconds_total',
+        'counter',
+        'Суммарное время ожидания подключений из пула.',
+        'wait_seconds',
+    ),
+)
+POOL_SATURATION = 'foodgram_db_pool_saturation'
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Метрики текущего запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.pool_wait = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL-запросов, учитывающая их в метриках
+    текущего запроса."""
+
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Подключает учет SQL-запросов к новому подключению."""
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_checked_out)
+def record_pool_wait(sender, wait, **kwargs):
+    """Учитывает ожидание подключения из пула в метриках
+    текущего запроса."""
+
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.pool_wait += wait
+
+
+@contextmanager
+def measure_request():
+    """Собирает метрики запросов к базе и сериализаторов на время
+    обработки запроса."""
+
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure_serializer():
+    """Учитывает время сериализации.
+
+    Вложенные сериализаторы не учитываются повторно.
+    """
+
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+class MeasuredSerializerMixin:
+    """Учитывает время отображения объектов сериализатором."""
+
+    def to_representation(self, instance):
+        with measure_serializer():
+            return super().to_representation(instance)
+
+
+class Registry:
+    """Метрики процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._flushed_at = 0
+        self._pid = None
+        self._file_name = None
+
+    def observe(self, name: str, labels: tuple, value: float):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        if key not in self._histograms:
+            self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        histogram = self._histograms[key]
+        for position, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[position] += 1
+                break
+        else:
+            histogram[len(buckets)] += 1
+        histogram[-1] += value
+
+    def record(self, view: str, method: str, status: int, metrics, total):
+        """Учитывает завершенный запрос."""
+
+        labels = (('view', view), ('method', method))
+        with self._lock:
+            for name, value in (
+                ('foodgram_request_duration_seconds', total),
+                ('foodgram_request_db_seconds', metrics.db_time),
+                (
+                    'foodgram_request_serializer_seconds',
+                    metrics.serializer_time,
+                ),
+                ('foodgram_request_queries', metrics.queries),
+                ('foodgram_request_pool_wait_seconds', metrics.pool_wait),
+            ):
+                self.observe(name, labels, value)
+            key = (REQUESTS_TOTAL, labels + (('status', str(status)),))
+            self._counters[key] = self._counters.get(key, 0) + 1
+            if (
+                time.monotonic() - self._flushed_at
+                >= settings.METRICS_FLUSH_INTERVAL
+            ):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """Записывает метрики процесса в его файл."""
+
+        self._flushed_at = time.monotonic()
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        data = dump(self._histograms, self._counters)
+        data['pools'] = get_pool_stats()
+        write(directory, self._get_file_name(directory), data)
+
+    def _get_file_name(self, directory: str) -> str:
+        """Имя файла процесса.
+
+        Файлы с тем же pid остались от завершившихся процессов,
+        их метрики переносятся в архив.
+        """
+
+        pid = os.getpid()
+        if self._pid != pid:
+            with locked(directory):
+                archive(
+                    directory,
+                    [
+                        file_name
+                        for file_name in os.listdir(directory)
+                        if get_pid(file_name) == pid
+                    ],
+                )
+            self._pid = pid
+            self._file_name = f'{pid}-{uuid.uuid4().hex}.json'
+        return self._file_name
+
+
+registry = Registry()
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_pid(file_name: str):
+    """Pid процесса по имени его файла метрик или None."""
+
+    if not file_name.endswith('.json'):
+        return None
+    pid = file_name[: -len('.json')].split('-')[0]
+    return int(pid) if pid.isdigit() else None
+
+
+@contextmanager
+def locked(directory: str):
+    """Блокировка каталога метрик между процессами."""
+
+    with open(os.path.join(directory, LOCK_FILE), 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        yield
+
+
+def dump(histograms: dict, counters: dict) -> dict:
+    return {
+        'histograms': [
+            [name, list(labels), histogram]
+            for (name, labels), histogram in histograms.items()
+        ],
+        'counters': [
+            [name, list(labels), value]
+            for (name, labels), value in counters.items()
+        ],
+    }
+
+
+def read(directory: str, file_name: str):
+    """Содержимое файла метрик или None, если его нет или он поврежден."""
+
+    try:
+        with open(os.path.join(directory, file_name)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write(directory: str, file_name: str, data: dict):
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_path, os.path.join(directory, file_name))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def merge(histograms: dict, counters: dict, data: dict):
+    """Добавляет метрики файла к суммам."""
+
+    for name, labels, histogram in data['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        total = histograms.setdefault(key, [0] * len(histogram))
+        for position, value in enumerate(histogram):
+            total[position] += value
+    for name, labels, value in data['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+
+
+def archive(directory: str, file_names: list):
+    """Переносит метрики завершившихся процессов в архив и удаляет
+    их файлы. Вызывается под блокировкой каталога."""
+
+    if not file_names:
+        return
+    histograms, counters = {}, {}
+    for file_name in [ARCHIVE_FILE, *file_names]:
+        data = read(directory, file_name)
+        if data is not None:
+            merge(histograms, counters, data)
+    write(directory, ARCHIVE_FILE, dump(histograms, counters))
+    for file_name in file_names:
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except FileNotFoundError:
+            pass
+
+
+def collect() -> tuple:
+    """Суммирует метрики всех процессов.
+
+    Возвращает гистограммы, счетчики и состояние пулов подключений
+    работающих процессов по их pid.
+    """
+
+    registry.flush()
+    histograms, counters, pools = {}, {}, {}
+    directory = settings.METRICS_DIR
+    with locked(directory):
+        finished = []
+        for file_name in os.listdir(directory):
+            pid = get_pid(file_name)
+            if pid is not None and not is_running(pid):
+                finished.append(file_name)
+        archive(directory, finished)
+        for file_name in os.listdir(directory):
+            pid = get_pid(file_name)
+            if pid is None and file_name != ARCHIVE_FILE:
+                continue
+            data = read(directory, file_name)
+            if data is None:
+                continue
+            merge(histograms, counters, data)
+            if data.get('pools') and pid is not None:
+                pools[str(pid)] = data['pools']
+    return histograms, counters, pools
+
+
+def is_allowed_client(address: str) -> bool:
+    """Входит ли адрес в METRICS_ALLOWED_IPS."""
+
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+        if network.strip()
+    )
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def render(gauges=()) -> str:
+    """Метрики в текстовом формате Prometheus.
+
+    gauges - дополнительные метрики: (имя, тип, описание,
+    [(метки, значение), ...]).
+    """
+
+    histograms, counters, pools = collect()
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), histogram):
+                cumulative += count
+                bucket_labels = format_labels(labels + (('le', bound),))
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {histogram[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    lines += [
+        f'# HELP {REQUESTS_TOTAL} Количество запросов.',
+        f'# TYPE {REQUESTS_TOTAL} counter',
+    ]
+    for (_, labels), value in sorted(counters.items()):
+        lines.append(f'{REQUESTS_TOTAL}{format_labels(labels)} {value}')
+    pool_labels = [
+        ((('database', alias), ('pid', pid)), stats)
+        for pid, databases in sorted(pools.items())
+        for alias, stats in sorted(databases.items())
+    ]
+    gauges = [
+        (
+            name,
+            metric_type,
+            description,
+            [(labels, stats[field]) for labels, stats in pool_labels],
+        )
+        for name, metric_type, description, field in POOL_METRICS
+    ] + [
+        (
+            POOL_SATURATION,
+            'gauge',
+            'Доля выданных подключений пула от наибольшего числа.',
+            [
+                (labels, stats['in_use'] / stats['max_size'])
+                for labels, stats in pool_labels
+            ],
+        ),
+        *gauges,
+    ]
+    for name, metric_type, description, samples in gauges:
+        lines += [
+            f'# HELP {name} {description}',
+            f'# TYPE {name} {metric_type}',
+        ]
+        for labels, value in samples:
+            lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,73 @@
+"""Модуль промежуточных слоев для приложения Api."""
+
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from api.metrics import measure_request, registry
+
+logger = logging.getLogger('api.requests')
+
+
+class RequestMetricsMiddleware:
+    """Промежуточный слой метрик запросов.
+
+    Добавляет к ответу заголовок Server-Timing, учитывает запрос
+    в метриках процесса и пишет в журнал запросы, выполнявшиеся
+    дольше SLOW_REQUEST_THRESHOLD миллисекунд. Работает и в синхронном,
+    и в асинхронном режиме, чтобы под ASGI асинхронные представления
+    не переводились в синхронные.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            # Так Django распознает асинхронный промежуточный слой.
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with measure_request() as metrics:
+            response = self.get_response(request)
+        return self.process_metrics(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with measure_request() as metrics:
+            response = await self.get_response(request)
+        return self.process_metrics(request, response, metrics, started)
+
+    def process_metrics(self, request, response, metrics, started):
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.record(
+            view, request.method, response.status_code, metrics, total
+        )
+        response['Server-Timing'] = (
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries", '
+            f'pool;dur={metrics.pool_wait * 1000:.1f}, '
+            f'serializer;dur={metrics.serializer_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, '
+                'SQL-запросов %d за %.0f мс, сериализация %.0f мс',
+                request.method,
+                request.get_full_path(),
+                view,
+                total * 1000,
+                metrics.queries,
+                metrics.db_time * 1000,
+                metrics.serializer_time * 1000,
+            )
+        return response
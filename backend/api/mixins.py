@@ -1,5 +1,9 @@
 """Модуль вьюсетов для приложения Api."""
 
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 
@@ -12,3 +16,66 @@ class NotPutModelViewSet(viewsets.ModelViewSet):
         if request.method == 'PUT':
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
         return super().update(request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы для списка и отдельного объекта.
+
+    Наследник определяет get_validators, возвращающий исходные данные
+    для ETag и дату последнего изменения. Если клиент передал
+    совпадающие If-None-Match или If-Modified-Since, ответ 304
+    формируется без построения данных.
+    """
+
+    conditional_vary_headers = ()
+
+    def get_validators(self):
+        """Возвращает кортеж (данные для ETag, дата изменения).
+
+        Значение None означает, что валидатор не используется.
+        """
+
+        return None, None
+
+    def make_etag(self, etag_source) -> str:
+        """Формирует строгий ETag из исходных данных."""
+
+        digest = hashlib.md5(
+            repr(etag_source).encode(), usedforsecurity=False
+        ).hexdigest()
+        return f'"{digest}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Возвращает 304 либо ответ обработчика с валидаторами."""
+
+        etag_source, last_modified = self.get_validators()
+        etag = None if etag_source is None else self.make_etag(etag_source)
+        timestamp = (
+            None if last_modified is None else int(last_modified.timestamp())
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            if etag:
+                response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            if self.conditional_vary_headers:
+                patch_vary_headers(response, self.conditional_vary_headers)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,6 +1,14 @@
 """Модуль настройки паджинации для приложения Api."""
 
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.db import connections
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -9,3 +17,152 @@ class PageLimitPagination(PageNumberPagination):
     page_size = 8
     max_page_size = 25
     page_size_query_param = 'limit'
+
+
+class CursorPageLimitPagination(PageLimitPagination):
+    """Паджинация с необязательным режимом курсора.
+
+    Без параметра cursor работает как PageLimitPagination.
+    С параметром cursor (пустое значение - первая страница) страница
+    выбирается условием по id вместо OFFSET, поэтому ее стоимость
+    не зависит от глубины. Порядок берется из запроса; если он не по id
+    (прямой или обратный), например при поиске по релевантности,
+    параметр cursor не учитывается и страница выбирается по номеру.
+
+    Общее количество в режиме курсора не считается, если не передан
+    параметр count: exact - точное, estimate - оценка планировщика.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        by_id = tuple(ordering) in (('id',), ('-id',), ('pk',), ('-pk',))
+        if self.cursor_query_param not in request.query_params or not by_id:
+            self.cursor_mode = False
+            return super().paginate_queryset(queryset, request, view)
+
+        def fetch(position, descending, limit):
+            page = queryset.order_by('-pk' if descending else 'pk')
+            if position is not None:
+                lookup = 'pk__lt' if descending else 'pk__gt'
+                page = page.filter(**{lookup: position})
+            return list(page[:limit])
+
+        self.request = request
+        return self.paginate_cursor(
+            fetch,
+            request,
+            descending=ordering[0].startswith('-'),
+            count=self.get_count(queryset),
+        )
+
+    def paginate_cursor(self, fetch, request, descending=True, count=None):
+        """Страница в режиме курсора.
+
+        fetch(position, descending, limit) возвращает не более limit
+        объектов с id меньше (или больше) position в заданном порядке.
+        """
+
+        self.cursor_mode = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = count
+        reverse, position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+
+        results = fetch(
+            position, descending != reverse, self.page_size + 1
+        )
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        self.next_position = self.previous_position = None
+        if results:
+            if has_next:
+                self.next_position = results[-1].pk
+            if has_previous:
+                self.previous_position = results[0].pk
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                'count': self.count,
+                'next': self.get_cursor_link(self.next_position, False),
+                'previous': self.get_cursor_link(
+                    self.previous_position, True
+                ),
+                'results': data,
+            }
+        )
+
+    def get_count(self, queryset):
+        """Возвращает количество по параметру count или None."""
+
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def encode_cursor(self, position, reverse):
+        return urlsafe_b64encode(
+            json.dumps([int(reverse), position]).encode()
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает направление и id, от которого выбирается страница."""
+
+        if not cursor:
+            return False, None
+        try:
+            reverse, position = json.loads(urlsafe_b64decode(cursor))
+        except (DecodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, int) or reverse not in (0, 1):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse),
+        )
+
+
+def estimate_count(queryset):
+    """Оценка количества строк запроса.
+
+    Для PostgreSQL берется из плана запроса без его выполнения,
+    для остальных баз выполняется точный подсчет.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
@@ -0,0 +1,83 @@
+"""Модуль кэша отображений рецептов.
+
+В кэше хранится сериализованная в JSON часть отображения рецепта,
+не зависящая от пользователя. Ключ содержит id рецепта и дату его
+изменения, поэтому любое изменение рецепта, его тегов, ингредиентов
+или автора (см. recipes.signals) делает прежнюю запись недостижимой.
+Признаки текущего пользователя накладываются при формировании ответа.
+"""
+
+import json
+
+from django.core.cache import caches
+
+CACHE_ALIAS = 'recipes'
+HITS = 'recipe-cache:hits'
+MISSES = 'recipe-cache:misses'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def make_key(recipe, base_url: str) -> str:
+    """Ключ записи кэша.
+
+    Содержит базовый адрес запроса, так как ссылки на изображения
+    в отображении рецепта абсолютные.
+    """
+
+    return f'recipe:{recipe.pk}:{recipe.updated_at.timestamp()}:{base_url}'
+
+
+def get_fragments(recipes, base_url: str) -> dict:
+    """Возвращает найденные в кэше отображения рецептов по их id."""
+
+    keys = {make_key(recipe, base_url): recipe.pk for recipe in recipes}
+    cached = get_cache().get_many(keys)
+    return {keys[key]: json.loads(value) for key, value in cached.items()}
+
+
+def set_fragments(fragments: dict, base_url: str):
+    """Сохраняет отображения рецептов в кэш.
+
+    fragments - словарь рецепт: отображение.
+    """
+
+    get_cache().set_many(
+        {
+            make_key(recipe, base_url): json.dumps(fragment)
+            for recipe, fragment in fragments.items()
+        }
+    )
+
+
+def increment(key: str, delta: int):
+    if not delta:
+        return
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def count(hits: int, misses: int):
+    """Учитывает попадания и промахи кэша."""
+
+    increment(HITS, hits)
+    increment(MISSES, misses)
+
+
+def get_stats() -> dict:
+    """Возвращает счетчики попаданий и промахов кэша."""
+
+    counters = get_cache().get_many((HITS, MISSES))
+    hits, misses = counters.get(HITS, 0), counters.get(MISSES, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,45 @@
+"""Модуль рендереров для приложения Api.
+
+Рендереры файлов списка покупок участвуют только в согласовании
+формата ответа (параметр format= или заголовок Accept): содержимое
+файлов формирует представление и отдает его потоком.
+"""
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class FileRenderer(BaseRenderer):
+    """Рендерер файла, возвращает готовые данные без изменений.
+
+    Прочие данные, например описание ошибки, отдаются в JSON.
+    """
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or isinstance(data, (bytes, str)):
+            return data
+        return JSONRenderer().render(data)
+
+
+class PlainTextRenderer(FileRenderer):
+    """Текстовый файл."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+
+class CSVRenderer(FileRenderer):
+    """Файл CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class PDFRenderer(FileRenderer):
+    """Файл PDF."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
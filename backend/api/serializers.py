@@ -1,23 +1,41 @@
 """Модуль сериализаторов для приложения Api."""
 
-from django.shortcuts import get_object_or_404
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Manager, prefetch_related_objects
+from django.http import Http404
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api import recipe_cache
+from api.metrics import MeasuredSerializerMixin, measure_serializer
+from recipes import shopping_list
+from recipes.images import get_srcset
 from recipes.models import (
     Favorite,
     Ingredient,
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
-    Subscription,
     Tag,
+    recipe_read_lookups,
 )
 from users.models import User
 from users.serializers import DjoserUserSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+def get_image_srcset(recipe: Recipe, request=None):
+    """Строки srcset копий изображения рецепта по форматам."""
+
+    if not recipe.image or not recipe.image_derivatives:
+        return None
+    build_url = request.build_absolute_uri if request else str
+    return get_srcset(recipe.image.name, build_url)
+
+
+class TagSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для тегов."""
 
     class Meta:
@@ -25,7 +43,9 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    MeasuredSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для ингредиентов."""
 
     class Meta:
@@ -50,8 +70,29 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
-    """Сериализатор для чтения рецептов."""
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """Сериализатор списка рецептов.
+
+    Передает рецепты дочернему сериализатору одним списком,
+    чтобы обратиться к кэшу отображений один раз.
+    """
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        with measure_serializer():
+            return self.child.to_representation_many(list(recipes))
+
+
+class RecipeReadSerializer(
+    MeasuredSerializerMixin, serializers.ModelSerializer
+):
+    """Сериализатор для чтения рецептов.
+
+    Не зависящая от пользователя часть отображения берется из кэша,
+    признаки текущего пользователя добавляются при каждом запросе.
+    """
+
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
 
     author = DjoserUserSerializer(required=True, many=False)
     tags = TagSerializer(required=False, many=True)
@@ -59,17 +100,24 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.ImageField()
+    image_srcset = serializers.SerializerMethodField()
 
     def get_ingredients(self, obj: Recipe):
         """Получает ингредиенты рецепта."""
 
-        ingredients = IngredientInRecipe.objects.filter(recipe=obj)
-        serializer = IngredientInRecipeSerializer(ingredients, many=True)
+        serializer = IngredientInRecipeSerializer(
+            obj.ingredient.all(), many=True
+        )
         return serializer.data
 
+    def get_image_srcset(self, obj: Recipe):
+        return get_image_srcset(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj: Recipe):
         """Находится ли рецепт в избранном у текущего пользователя."""
 
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user: User = self.context.get('request').user
         return (
             user.is_authenticated
@@ -79,12 +127,68 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj: Recipe):
         """Находится ли рецепт в списке покупок у текущего пользователя."""
 
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user: User = self.context.get('request').user
         return (
             user.is_authenticated
             and ShoppingCart.objects.filter(user=user, recipe=obj).exists()
         )
 
+    def make_fragment(self, recipe: Recipe) -> dict:
+        """Не зависящая от пользователя часть отображения рецепта."""
+
+        data = super().to_representation(recipe)
+        for field in self.user_fields:
+            data.pop(field)
+        data['author'] = dict(data['author'])
+        data['author'].pop('is_subscribed')
+        return data
+
+    def add_user_fields(self, recipe: Recipe, fragment: dict) -> dict:
+        """Добавляет к отображению рецепта признаки текущего пользователя."""
+
+        user: User = self.context.get('request').user
+        author_field = self.fields['author']
+        fragment['author']['is_subscribed'] = (
+            user.is_authenticated
+            and recipe.author_id in author_field.get_subscribed_author_ids()
+        )
+        fragment['is_favorited'] = self.get_is_favorited(recipe)
+        fragment['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        return fragment
+
+    def to_representation_many(self, recipes: list) -> list:
+        """Отображение списка рецептов с использованием кэша.
+
+        Связанные объекты подгружаются только для рецептов,
+        отсутствующих в кэше.
+        """
+
+        base_url = self.context.get('request').build_absolute_uri('/')
+        fragments = recipe_cache.get_fragments(recipes, base_url)
+        misses = [recipe for recipe in recipes if recipe.pk not in fragments]
+        if misses:
+            prefetch_related_objects(misses, *recipe_read_lookups())
+            new_fragments = {
+                recipe: self.make_fragment(recipe) for recipe in misses
+            }
+            recipe_cache.set_fragments(new_fragments, base_url)
+            fragments.update(
+                (recipe.pk, fragment)
+                for recipe, fragment in new_fragments.items()
+            )
+        recipe_cache.count(
+            hits=len(recipes) - len(misses), misses=len(misses)
+        )
+        return [
+            self.add_user_fields(recipe, dict(fragments[recipe.pk]))
+            for recipe in recipes
+        ]
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
     class Meta:
         model = Recipe
         fields = (
@@ -92,6 +196,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'name',
             'text',
             'image',
+            'image_srcset',
             'cooking_time',
             'author',
             'tags',
@@ -99,6 +204,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
         )
+        list_serializer_class = RecipeReadListSerializer
 
 
 class IngredientInRecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -111,6 +217,19 @@ class IngredientInRecipeCreateUpdateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+def delete_rows(model, pks):
+    """Удаляет строки model одним запросом DELETE без сигналов
+    и каскадной обработки."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name(model._meta.pk.column)} '
+            f'IN ({", ".join(["%s"] * len(pks))})',
+            pks,
+        )
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор рецепта для создания и обновления."""
 
@@ -121,40 +240,94 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     ingredients = IngredientInRecipeCreateUpdateSerializer(many=True)
     author = DjoserUserSerializer(read_only=True)
 
+    def get_ingredient_amounts(self, ingredients, recipe_ingredients=None):
+        """Возвращает пары (id ингредиента, количество).
+
+        Существование ингредиентов проверяется одним запросом.
+        При обновлении id может указывать на ингредиент в этом рецепте:
+        recipe_ingredients - id ингредиентов по id строк рецепта.
+        """
+
+        ids = [ingredient.get('id') for ingredient in ingredients]
+        if recipe_ingredients:
+            ids = [recipe_ingredients.get(pk, pk) for pk in ids]
+        if set(ids) - set(Ingredient.objects.in_bulk(ids)):
+            raise Http404
+        return [
+            (ingredient_id, ingredient.get('amount'))
+            for ingredient_id, ingredient in zip(ids, ingredients)
+        ]
+
     def set_ingredient_in_recipe_amount(self, ingredients, recipe):
         """Сохраняет значения для ингредиентов в рецепте при создании."""
 
         IngredientInRecipe.objects.bulk_create(
             [
                 IngredientInRecipe(
-                    ingredient=get_object_or_404(
-                        Ingredient, id=ingredient.get('id')
-                    ),
-                    recipe=recipe,
-                    amount=ingredient.get('amount'),
+                    ingredient_id=ingredient_id, recipe=recipe, amount=amount
+                )
+                for ingredient_id, amount in self.get_ingredient_amounts(
+                    ingredients
                 )
-                for ingredient in ingredients
             ]
         )
 
-    def set_ingredient_in_recipe_amount_for_update(
-        self, ingredients_in_recipe, recipe
-    ):
-        """Сохраняет значения для ингредиентов в рецепте при обновлении."""
+    def set_ingredient_in_recipe_amount_for_update(self, ingredients, recipe):
+        """Сохраняет значения для ингредиентов в рецепте при обновлении.
 
-        IngredientInRecipe.objects.bulk_create(
-            [
-                IngredientInRecipe(
-                    ingredient=get_object_or_404(
-                        Ingredient, id=ingredient.get('ingredient_id')
-                    ),
-                    recipe=recipe,
-                    amount=ingredient.get('amount'),
+        Изменяет только отличающиеся строки, по одному запросу
+        на удаление, изменение и создание. Эти запросы не отправляют
+        сигналы, поэтому их изменения переносятся в списки покупок
+        явно, а дату изменения обновляет сохранение рецепта.
+        """
+
+        rows = IngredientInRecipe.objects.filter(recipe=recipe)
+        existing = defaultdict(list)
+        for ingredient_in_recipe in rows:
+            existing[ingredient_in_recipe.ingredient_id].append(
+                ingredient_in_recipe
+            )
+
+        created, updated = [], []
+        deltas = defaultdict(int)
+        for ingredient_id, amount in self.get_ingredient_amounts(
+            ingredients, {row.pk: row.ingredient_id for row in rows}
+        ):
+            if existing[ingredient_id]:
+                ingredient_in_recipe = existing[ingredient_id].pop()
+                if ingredient_in_recipe.amount == amount:
+                    continue
+                deltas[ingredient_id] += amount - ingredient_in_recipe.amount
+                ingredient_in_recipe.amount = amount
+                updated.append(ingredient_in_recipe)
+            else:
+                deltas[ingredient_id] += amount
+                created.append(
+                    IngredientInRecipe(
+                        ingredient_id=ingredient_id,
+                        recipe=recipe,
+                        amount=amount,
+                    )
                 )
-                for ingredient in ingredients_in_recipe
-            ]
+
+        deleted = []
+        for ingredients_in_recipe in existing.values():
+            for ingredient_in_recipe in ingredients_in_recipe:
+                deltas[ingredient_in_recipe.ingredient_id] -= (
+                    ingredient_in_recipe.amount
+                )
+                deleted.append(ingredient_in_recipe.pk)
+        if deleted:
+            delete_rows(IngredientInRecipe, deleted)
+        if updated:
+            IngredientInRecipe.objects.bulk_update(updated, ('amount',))
+        if created:
+            IngredientInRecipe.objects.bulk_create(created)
+        shopping_list.change_recipe(
+            recipe.pk, {key: delta for key, delta in deltas.items() if delta}
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта."""
 
@@ -168,29 +341,25 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         )
         return recipe
 
+    @transaction.atomic
     def update(self, instance: Recipe, validated_data):
-        """Обновление рецепта."""
+        """Обновление рецепта.
+
+        Рецепт сохраняется последним, чтобы дата изменения
+        в экземпляре совпадала с сохраненной в базе.
+        """
 
         tags = validated_data.pop('tags', None)
-        ingredients_in_recipe = validated_data.pop('ingredients', None)
-        for item in ingredients_in_recipe:
-            if IngredientInRecipe.objects.filter(pk=item.get('id')).exists():
-                item['ingredient_id'] = get_object_or_404(
-                    IngredientInRecipe, pk=item.get('id')
-                ).ingredient.pk
-            else:
-                item['ingredient_id'] = item.get('id')
-        instance = super().update(
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.set_ingredient_in_recipe_amount_for_update(
+                recipe=instance, ingredients=ingredients
+            )
+        return super().update(
             instance=instance, validated_data=validated_data
         )
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.set_ingredient_in_recipe_amount_for_update(
-            recipe=instance, ingredients_in_recipe=ingredients_in_recipe
-        )
-        instance.save()
-        return instance
 
     def to_representation(self, instance):
         """Возвращает отображение рецепта после создания или обновления."""
@@ -212,111 +381,32 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeMinifiedSerializer(serializers.ModelSerializer):
+class RecipeMinifiedSerializer(
+    MeasuredSerializerMixin, serializers.ModelSerializer
+):
     """Сеериалиатор рецепта для краткого отображения."""
 
-    class Meta:
-        model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
-
-
-class ChosenCreateAbstractSerializer(serializers.ModelSerializer):
-    """Абстрактный сериалиатор для создания подборок
-    (избранное и корзина для покупок).
-    В мета-подклассе наследника необходимо определить модель.
-    """
-
-    def validate(self, data):
-        """Проверяет на наличие рецепта в подборке."""
+    image_srcset = serializers.SerializerMethodField()
 
-        if self.Meta.model.objects.filter(**data).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в подборку.'
-            )
-        return data
+    def get_image_srcset(self, obj: Recipe):
+        return get_image_srcset(obj, self.context.get('request'))
 
     class Meta:
-        fields = ('user', 'recipe')
-
-
-class ChosenDeleteAbstractSerializer(ChosenCreateAbstractSerializer):
-    """Абстрактный сериалиатор для удаления подборок
-    (избранное и корзина для покупок).
-    В мета-подклассе наследника необходимо определить модель.
-    """
-
-    def validate(self, data):
-        """Проверяет на наличие рецепта в подборке.
-        Находит объект модели в базе данных,
-        устанавливает в instance сериализатора перед удалением.
-        """
-
-        if not self.Meta.model.objects.filter(**data).exists():
-            raise serializers.ValidationError('Запись отсутствует.')
-        self.instance = self.Meta.model.objects.get(**data)
-
-        return data
-
-    class Meta(ChosenCreateAbstractSerializer.Meta):
-        pass
-
-
-class FavoriteCreateSerializer(ChosenCreateAbstractSerializer):
-    """Сериалиатор избранного для создания записи."""
-
-    class Meta(ChosenCreateAbstractSerializer.Meta):
-        model = Favorite
-
-
-class FavoriteDeleteSerializer(ChosenDeleteAbstractSerializer):
-    """Сериалиатор подборки (избранного) для удаления записи."""
-
-    class Meta(ChosenDeleteAbstractSerializer.Meta):
-        model = Favorite
-
-
-class ShoppingCartCreateSerializer(ChosenCreateAbstractSerializer):
-    """Сериалиатор подборки (корзина для покупок) для создания записи."""
-
-    class Meta(ChosenCreateAbstractSerializer.Meta):
-        model = ShoppingCart
-
-
-class ShoppingCartDeleteSerializer(ChosenDeleteAbstractSerializer):
-    """Сериалиатор подборки (корзина для покупок) для удаления записи."""
-
-    class Meta(ChosenDeleteAbstractSerializer.Meta):
-        model = ShoppingCart
-
-
-class SubscriptionDeleteSerializer(ChosenDeleteAbstractSerializer):
-    """Cериализатор удаления для подписок."""
-
-    class Meta:
-        model = Subscription
-        fields = ('user', 'author')
-
+        model = Recipe
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
 
-class SubscriptionCreateSerializer(SubscriptionDeleteSerializer):
-    """Сериализатор создания подписки."""
 
-    def validate(self, data):
-        """Проверяет на наличие уже существующей подписки,
-        и исключает подписку на самого себя."""
+class BulkIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id для пакетного добавления и удаления."""
 
-        if self.Meta.model.objects.filter(**data).exists():
-            raise serializers.ValidationError('Подписка уже существует.')
-        if data.get('user') == data.get('author'):
-            raise serializers.ValidationError(
-                'Подписка на самого себя запрещена.'
-            )
-        return data
-
-    class Meta(SubscriptionDeleteSerializer.Meta):
-        pass
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
 
 
-class UserWithRecipesSerializer(DjoserUserSerializer):
+class UserWithRecipesSerializer(MeasuredSerializerMixin, DjoserUserSerializer):
     """Сериализатор для пользователей с рецептами.
 
     Использует параметр get-запроса recipes_limit,
@@ -340,7 +430,7 @@ class UserWithRecipesSerializer(DjoserUserSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj: User):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     class Meta(DjoserUserSerializer.Meta):
         fields = DjoserUserSerializer.Meta.fields + (
@@ -0,0 +1,200 @@
+"""Модуль формирования файлов списка покупок.
+
+Текст и CSV формируются построчно и отдаются потоком. PDF строится
+средствами Pillow в пуле процессов, чтобы отрисовка не занимала
+потоки, обслуживающие запросы. Готовые файлы кэшируются по версии
+корзины пользователя.
+"""
+
+import csv
+import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from PIL import Image, ImageDraw, ImageFont
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from recipes.models import ShoppingCart, ShoppingListItem
+
+TITLE = 'Список покупок'
+FOOTER = '\u00A9 Foodgram  \u2122. 2023.'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+UTF = 'UTF-8'
+
+# Параметры страницы PDF: A4 при 150 dpi.
+PAGE_SIZE = (1240, 1754)
+PAGE_MARGIN = 100
+FONT_SIZE = 28
+LINE_HEIGHT = 44
+
+_pdf_executor = None
+
+
+class PDFTimeout(APIException):
+    """PDF не построен за отведенное время."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'PDF не сформирован вовремя, повторите позже.'
+    default_code = 'pdf_timeout'
+
+
+def get_cart_items(user):
+    """Возвращает ингредиенты корзины пользователя с суммарным количеством.
+
+    Читает поддерживаемую таблицу списков покупок без соединений.
+    """
+
+    return ShoppingListItem.objects.filter(user=user).values(
+        'name', 'measurement_unit', 'amount'
+    )
+
+
+def get_cart_version(user) -> str:
+    """Возвращает версию корзины пользователя одним запросом.
+
+    Идентификаторы записей корзины только растут, поэтому пара
+    (количество, максимальный id) меняется при любом добавлении или
+    удалении рецепта, а дата изменения рецептов - при изменении
+    их ингредиентов.
+    """
+
+    version = ShoppingCart.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        last_id=Max('id'),
+        updated_at=Max('recipe__updated_at'),
+    )
+    return hashlib.md5(
+        repr(sorted(version.items())).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def make_item_line(item: dict) -> str:
+    return (
+        f"\u00B7 {str(item.get('name')).capitalize()} "
+        f"({item.get('measurement_unit')}.) "
+        f"\u2014 {item.get('amount')}"
+    )
+
+
+def iter_text(items):
+    """Построчно формирует текстовый файл списка покупок."""
+
+    yield f'{TITLE}\n'
+    for item in items:
+        yield f'\n{make_item_line(item)}'
+    yield f'\n\n{FOOTER}'
+
+
+class Echo:
+    """Псевдобуфер: возвращает записываемую строку вместо ее хранения."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(items):
+    """Построчно формирует CSV-файл списка покупок."""
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for item in items:
+        yield writer.writerow(
+            [item.get(field) for field in CSV_HEADER]
+        )
+
+
+def render_pdf(lines: list, font_path: str) -> bytes:
+    """Отрисовывает строки на страницах A4 и возвращает PDF.
+
+    Выполняется в отдельном процессе, поэтому принимает только
+    простые данные.
+    """
+
+    try:
+        font = ImageFont.truetype(font_path, FONT_SIZE)
+    except OSError:
+        font = ImageFont.load_default()
+
+    lines_per_page = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // LINE_HEIGHT
+    pages = []
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        for number, line in enumerate(lines[start:start + lines_per_page]):
+            draw.text(
+                (PAGE_MARGIN, PAGE_MARGIN + number * LINE_HEIGHT),
+                line,
+                font=font,
+                fill='black',
+            )
+        pages.append(page)
+
+    buffer = io.BytesIO()
+    pages[0].save(
+        buffer,
+        format='PDF',
+        save_all=True,
+        append_images=pages[1:],
+        resolution=150,
+    )
+    return buffer.getvalue()
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=settings.SHOPPING_CART_PDF_WORKERS
+        )
+    return _pdf_executor
+
+
+def make_pdf(items) -> bytes:
+    """Формирует PDF-файл списка покупок в пуле процессов."""
+
+    lines = [TITLE, ''] + [make_item_line(item) for item in items]
+    lines += ['', FOOTER]
+    future = get_pdf_executor().submit(
+        render_pdf, lines, settings.SHOPPING_CART_PDF_FONT
+    )
+    try:
+        return future.result(timeout=settings.SHOPPING_CART_PDF_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise PDFTimeout
+
+
+def make_cache_key(user, file_format: str, version: str) -> str:
+    return f'shopping-cart:{user.pk}:{file_format}:{version}'
+
+
+def get_cached_file(user, file_format: str, version: str):
+    """Возвращает файл из кэша или None."""
+
+    return cache.get(make_cache_key(user, file_format, version))
+
+
+def iter_and_cache(chunks, user, file_format: str, version: str):
+    """Отдает части файла и сохраняет файл в кэш после отдачи
+    последней части."""
+
+    parts = []
+    for chunk in chunks:
+        encoded = chunk.encode(UTF)
+        parts.append(encoded)
+        yield encoded
+    cache_file(user, file_format, version, b''.join(parts))
+
+
+def cache_file(user, file_format: str, version: str, content: bytes):
+    """Сохраняет готовый файл в кэш."""
+
+    cache.set(
+        make_cache_key(user, file_format, version),
+        content,
+        timeout=settings.SHOPPING_CART_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,52 @@
+"""Создание тестовых данных для тестов приложения Api."""
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+PASSWORD = 'Pass12345!x'
+IMAGE = 'recipes/images/test.png'
+
+
+def create_user(username: str) -> User:
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        first_name=username.capitalize(),
+        last_name=username.capitalize(),
+        password=PASSWORD,
+    )
+
+
+def create_tag(number: int) -> Tag:
+    return Tag.objects.create(
+        name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}'
+    )
+
+
+def create_ingredient(number: int) -> Ingredient:
+    return Ingredient.objects.create(
+        name=f'ингредиент {number}', measurement_unit='г'
+    )
+
+
+def create_recipe(author: User, amounts=None, tags=(), **fields) -> Recipe:
+    """Создает рецепт с ингредиентами amounts: {ингредиент: количество}."""
+
+    recipe = Recipe.objects.create(
+        author=author,
+        name=fields.pop('name', 'Рецепт'),
+        text=fields.pop('text', 'Описание'),
+        cooking_time=fields.pop('cooking_time', 10),
+        image=fields.pop('image', IMAGE),
+        **fields,
+    )
+    if tags:
+        recipe.tags.set(tags)
+    if amounts:
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+    return recipe
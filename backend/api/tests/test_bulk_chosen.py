@@ -0,0 +1,167 @@
+"""Тесты пакетного добавления и удаления рецептов подборок."""
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.factories import (
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes import chosen
+from recipes.counters import fold_favorites_count_deltas
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.shopping_list import find_drift
+
+ALREADY_ADDED = 'Рецепт уже добавлен в подборку.'
+ABSENT = 'Запись отсутствует.'
+
+
+class BulkChosenTests(TestCase):
+    """Статусы по каждому id, счетчики избранного и список покупок
+    после пакетных запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        author = create_user('author')
+        tag = create_tag(0)
+        first, second = create_ingredient(0), create_ingredient(1)
+        cls.recipes = [
+            create_recipe(author, {first: 100, second: 2}, [tag]),
+            create_recipe(author, {second: 3}, [tag]),
+            create_recipe(author, {first: 7}, [tag]),
+        ]
+        cls.missing_id = cls.recipes[-1].pk + 100
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, url: str, method: str, ids: list) -> dict:
+        """Выполняет пакетный запрос.
+
+        Возвращает {id: (статус, текст ошибки)} в порядке ответа.
+        """
+
+        response = getattr(self.client, method)(
+            f'/api/recipes/{url}/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        for result in response.data:
+            if 'data' in result:
+                self.assertEqual(result['data']['id'], result['id'])
+        return {
+            result['id']: (result['status'], result.get('errors'))
+            for result in response.data
+        }
+
+    def assert_favorites_counts(self):
+        for recipe in Recipe.objects.all():
+            with self.subTest(recipe=recipe.pk):
+                self.assertEqual(
+                    recipe.favorites_count,
+                    Favorite.objects.filter(recipe=recipe).count(),
+                )
+
+    def download(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/?format=txt', **headers
+        )
+
+    def test_statuses(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        for model, url in (
+            (Favorite, 'bulk_favorite'),
+            (ShoppingCart, 'bulk_shopping_cart'),
+        ):
+            with self.subTest(url=url):
+                chosen.add(model, self.user.pk, [first])
+                results = self.bulk(
+                    url, 'post', [first, second, self.missing_id, second]
+                )
+                self.assertEqual(
+                    list(results.items()),
+                    [
+                        (first, (400, ALREADY_ADDED)),
+                        (second, (201, None)),
+                        (self.missing_id, (404, 'Рецепт не найден.')),
+                    ],
+                )
+                results = self.bulk(
+                    url, 'delete', [second, third, self.missing_id]
+                )
+                self.assertEqual(
+                    list(results.items()),
+                    [
+                        (second, (204, None)),
+                        (third, (400, ABSENT)),
+                        (self.missing_id, (404, 'Рецепт не найден.')),
+                    ],
+                )
+                self.assertEqual(
+                    set(
+                        model.objects.filter(user=self.user).values_list(
+                            'recipe', flat=True
+                        )
+                    ),
+                    {first},
+                )
+
+    def test_favorites_counts(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        self.bulk('bulk_favorite', 'post', ids[:2])
+        self.assert_favorites_counts()
+        self.bulk('bulk_favorite', 'post', ids)
+        self.assert_favorites_counts()
+        self.bulk('bulk_favorite', 'delete', ids[1:])
+        self.assert_favorites_counts()
+        self.assertEqual(
+            list(
+                Recipe.objects.order_by('pk').values_list(
+                    'favorites_count', flat=True
+                )
+            ),
+            [1, 0, 0],
+        )
+
+    @override_settings(FAVORITES_COUNT_HOT_THRESHOLD=0)
+    def test_hot_favorites_counts(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        self.bulk('bulk_favorite', 'post', ids)
+        self.bulk('bulk_favorite', 'delete', ids[:1])
+        fold_favorites_count_deltas()
+        self.assert_favorites_counts()
+
+    def test_shopping_list_cache(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        empty = self.download()
+        self.assertEqual(empty.status_code, 200)
+        etag = empty['ETag']
+        self.assertEqual(self.download(etag).status_code, 304)
+
+        self.bulk('bulk_shopping_cart', 'post', [first, second])
+        self.assertEqual(find_drift([self.user.pk]), [])
+        filled = self.download(etag)
+        self.assertEqual(filled.status_code, 200)
+        self.assertNotEqual(filled['ETag'], etag)
+        content = b''.join(filled.streaming_content).decode()
+        self.assertIn('— 100', content)
+        self.assertIn('— 5', content)
+
+        # Запрос без изменений корзины не меняет версию списка.
+        self.bulk('bulk_shopping_cart', 'delete', [third])
+        self.assertEqual(self.download(filled['ETag']).status_code, 304)
+
+        self.bulk('bulk_shopping_cart', 'delete', [first])
+        self.assertEqual(find_drift([self.user.pk]), [])
+        reduced = self.download(filled['ETag'])
+        self.assertEqual(reduced.status_code, 200)
+        content = b''.join(reduced.streaming_content).decode()
+        self.assertNotIn('— 100', content)
+        self.assertIn('— 3', content)
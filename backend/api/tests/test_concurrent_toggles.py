@@ -0,0 +1,128 @@
+"""Тесты переключателей подборок под одновременными запросами."""
+
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from api.tests.factories import (
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.shopping_list import find_drift
+
+THREADS = 8
+ROUNDS = 3
+# Переключатели: модель и адрес.
+TOGGLES = (
+    (Favorite, '/api/recipes/{pk}/favorite/'),
+    (ShoppingCart, '/api/recipes/{pk}/shopping_cart/'),
+)
+# Статус единственного успешного запроса, остальные получают 400.
+EXPECTED = {'post': 201, 'delete': 204}
+
+
+def run_concurrently(users, method: str, url: str) -> Counter:
+    """Отправляет одновременно по запросу от каждого пользователя
+    и возвращает количество ответов каждого статуса."""
+
+    barrier = threading.Barrier(len(users))
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def work(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            status = getattr(client, method)(url).status_code
+        except Exception as error:
+            status = repr(error)
+        finally:
+            connection.close()
+        with lock:
+            statuses[status] += 1
+
+    workers = [threading.Thread(target=work, args=(user,)) for user in users]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return statuses
+
+
+# Тестовая база SQLite в памяти недоступна другим потокам.
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentToggleTests(TransactionTestCase):
+    """Ровно один из одновременных запросов добавляет или удаляет
+    запись, без ответов 500, повторяющихся записей и расхождения
+    счетчика избранного."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.user = create_user('reader')
+        author = create_user('author')
+        tag = create_tag(0)
+        ingredient = create_ingredient(0)
+        self.recipes = [
+            create_recipe(author, {ingredient: 10 * number}, [tag])
+            for number in range(1, ROUNDS + 1)
+        ]
+
+    def assert_consistent(self, model):
+        duplicates = (
+            model.objects.values('user', 'recipe')
+            .annotate(rows=Count('id'))
+            .filter(rows__gt=1)
+        )
+        self.assertFalse(duplicates.exists())
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count(),
+            )
+        self.assertEqual(find_drift(), [])
+
+    def test_same_user_toggles(self):
+        for model, url in TOGGLES:
+            for recipe in self.recipes:
+                rows = model.objects.filter(user=self.user, recipe=recipe)
+                for method, expected_rows in (('post', 1), ('delete', 0)):
+                    with self.subTest(
+                        model=model.__name__, recipe=recipe.pk, method=method
+                    ):
+                        statuses = run_concurrently(
+                            [self.user] * THREADS,
+                            method,
+                            url.format(pk=recipe.pk),
+                        )
+                        self.assertEqual(
+                            statuses,
+                            {EXPECTED[method]: 1, 400: THREADS - 1},
+                        )
+                        self.assertEqual(rows.count(), expected_rows)
+                        self.assert_consistent(model)
+
+    def test_many_users_toggles(self):
+        users = [create_user(f'user{number}') for number in range(THREADS)]
+        recipe = self.recipes[0]
+        for model, url in TOGGLES:
+            for method, expected_rows in (('post', THREADS), ('delete', 0)):
+                with self.subTest(model=model.__name__, method=method):
+                    statuses = run_concurrently(
+                        users, method, url.format(pk=recipe.pk)
+                    )
+                    self.assertEqual(statuses, {EXPECTED[method]: THREADS})
+                    self.assertEqual(
+                        model.objects.filter(recipe=recipe).count(),
+                        expected_rows,
+                    )
+                    self.assert_consistent(model)
@@ -0,0 +1,112 @@
+"""Тесты денормализованных счетчиков."""
+
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeCreateUpdateSerializer
+from api.tests.factories import (
+    PASSWORD,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes.counters import fold_favorites_count_deltas
+from recipes.models import (
+    Favorite,
+    FavoritesCountDelta,
+    Recipe,
+    Subscription,
+)
+from users.models import User
+
+
+class CounterSaveTests(TestCase):
+    """Сохранение модели не перезаписывает счетчики, измененные после
+    ее загрузки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.ingredient = create_ingredient(0)
+        cls.recipe = create_recipe(
+            cls.author, {cls.ingredient: 1}, [create_tag(0)]
+        )
+
+    def patch_recipe(self, before_update):
+        """Изменяет рецепт, вызывая before_update между загрузкой
+        рецепта и его сохранением."""
+
+        update = RecipeCreateUpdateSerializer.update
+
+        def update_later(serializer, instance, validated_data):
+            before_update(instance)
+            return update(serializer, instance, validated_data)
+
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with mock.patch.object(
+            RecipeCreateUpdateSerializer, 'update', update_later
+        ):
+            response = client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'name': 'Новое название',
+                    'ingredients': [{'id': self.ingredient.pk, 'amount': 2}],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.name, 'Новое название')
+        return recipe
+
+    def test_recipe_patch_keeps_favorite(self):
+        def add_favorite(instance):
+            self.assertEqual(instance.favorites_count, 0)
+            Favorite.objects.create(user=self.reader, recipe=instance)
+
+        recipe = self.patch_recipe(add_favorite)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(
+            recipe.favorites_count,
+            Favorite.objects.filter(recipe=recipe).count(),
+        )
+
+    @override_settings(FAVORITES_COUNT_HOT_THRESHOLD=0)
+    def test_recipe_patch_keeps_folded_deltas(self):
+        def add_favorite_and_fold(instance):
+            Favorite.objects.create(user=self.reader, recipe=instance)
+            fold_favorites_count_deltas()
+
+        recipe = self.patch_recipe(add_favorite_and_fold)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertFalse(FavoritesCountDelta.objects.exists())
+
+    def test_user_save_keeps_counters(self):
+        author = User.objects.get(pk=self.author.pk)
+        create_recipe(self.author)
+        Subscription.objects.create(user=self.reader, author=self.author)
+        author.first_name = 'Автор'
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.first_name, 'Автор')
+        self.assertEqual(
+            (author.recipes_count, author.subscribers_count), (2, 1)
+        )
+
+    def test_user_password_change_keeps_counters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.author.pk))
+        create_recipe(self.author)
+        response = client.post(
+            '/api/users/set_password/',
+            {'new_password': 'Pass54321!y', 'current_password': PASSWORD},
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).recipes_count, 2
+        )
@@ -0,0 +1,160 @@
+"""Тесты ленты подписок."""
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from recipes.feed import get_feed_page, update_pulled_authors
+from recipes.models import FeedItem, PulledAuthor, Recipe, Subscription
+
+
+@override_settings(
+    FEED_PULL_SUBSCRIBERS=3,
+    FEED_PUSH_SUBSCRIBERS=2,
+    FEED_PULL_RECIPES=100,
+    FEED_PUSH_RECIPES=80,
+)
+class FeedTests(TestCase):
+    """Рецепты записываемых в ленты и читаемых напрямую авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.pushed = create_user('pushed')
+        cls.pulled = create_user('pulled')
+        cls.fans = [create_user(f'fan{number}') for number in range(3)]
+        for fan in cls.fans:
+            Subscription.objects.create(user=fan, author=cls.pulled)
+        # Рецепты авторов чередуются по id.
+        for _ in range(5):
+            create_recipe(cls.pushed)
+            create_recipe(cls.pulled)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        update_pulled_authors()
+
+    def subscribe(self, author, expected_status=201):
+        response = self.client.post(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, expected_status)
+
+    def unsubscribe(self, author):
+        response = self.client.delete(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+
+    def feed_items(self, author) -> set:
+        return set(
+            FeedItem.objects.filter(
+                user=self.reader, author=author
+            ).values_list('recipe_id', flat=True)
+        )
+
+    def recipe_ids(self, *authors) -> list:
+        return list(
+            Recipe.objects.filter(author__in=authors)
+            .order_by('-id')
+            .values_list('id', flat=True)
+        )
+
+    def read_feed(self, limit: int) -> list:
+        """Читает ленту целиком по ссылкам на следующие страницы."""
+
+        recipe_ids = []
+        url = f'/api/recipes/feed/?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = [recipe['id'] for recipe in response.data['results']]
+            self.assertLessEqual(len(page), limit)
+            recipe_ids += page
+            url = response.data['next']
+        return recipe_ids
+
+    def test_authors_modes(self):
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.pulled).exists()
+        )
+        self.assertFalse(
+            PulledAuthor.objects.filter(author=self.pushed).exists()
+        )
+
+    def test_subscribe_backfills_pushed_author(self):
+        self.subscribe(self.pushed)
+        self.assertEqual(
+            self.feed_items(self.pushed), set(self.recipe_ids(self.pushed))
+        )
+
+    def test_subscribe_skips_pulled_author(self):
+        self.subscribe(self.pulled)
+        self.assertEqual(self.feed_items(self.pulled), set())
+        self.assertEqual(self.read_feed(25), self.recipe_ids(self.pulled))
+
+    def test_new_recipes(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        pushed_recipe = create_recipe(self.pushed)
+        pulled_recipe = create_recipe(self.pulled)
+        self.assertIn(pushed_recipe.pk, self.feed_items(self.pushed))
+        self.assertNotIn(pulled_recipe.pk, self.feed_items(self.pulled))
+        self.assertEqual(
+            self.read_feed(25)[:2], [pulled_recipe.pk, pushed_recipe.pk]
+        )
+
+    def test_unsubscribe_prunes(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        self.unsubscribe(self.pushed)
+        self.assertEqual(self.feed_items(self.pushed), set())
+        self.assertEqual(self.read_feed(25), self.recipe_ids(self.pulled))
+        self.unsubscribe(self.pulled)
+        self.assertEqual(self.read_feed(25), [])
+
+    def test_pages_interleave(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        expected = self.recipe_ids(self.pushed, self.pulled)
+        for limit in (1, 2, 3, 4, 7):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.read_feed(limit), expected)
+
+    def test_page_boundary(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        expected = self.recipe_ids(self.pushed, self.pulled)
+        for position in range(len(expected)):
+            for limit in (1, 2, 3):
+                with self.subTest(position=position, limit=limit):
+                    self.assertEqual(
+                        get_feed_page(
+                            self.reader, expected[position], True, limit
+                        ),
+                        expected[position + 1:][:limit],
+                    )
+                    self.assertEqual(
+                        get_feed_page(
+                            self.reader, expected[position], False, limit
+                        ),
+                        expected[:position][::-1][:limit],
+                    )
+
+    def test_pulled_author_switches_to_push(self):
+        self.subscribe(self.pulled)
+        expected = self.read_feed(25)
+        # Пока подписчиков не меньше FEED_PUSH_SUBSCRIBERS, автор
+        # остается читаемым напрямую.
+        for fan in self.fans[:2]:
+            Subscription.objects.filter(user=fan, author=self.pulled).delete()
+            self.assertEqual(update_pulled_authors(), 0)
+            self.assertTrue(
+                PulledAuthor.objects.filter(author=self.pulled).exists()
+            )
+        Subscription.objects.filter(
+            user=self.fans[2], author=self.pulled
+        ).delete()
+        self.assertEqual(update_pulled_authors(), 1)
+        self.assertFalse(
+            PulledAuthor.objects.filter(author=self.pulled).exists()
+        )
+        self.assertEqual(self.feed_items(self.pulled), set(expected))
+        self.assertEqual(self.read_feed(25), expected)
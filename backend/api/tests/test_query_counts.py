@@ -0,0 +1,115 @@
+"""Тесты количества SQL-запросов эндпоинтов чтения."""
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    Subscription,
+    Tag,
+)
+from users.models import User
+
+AUTHORS = 6
+RECIPES_PER_AUTHOR = 4
+PAGE_SIZES = (1, 3, 6)
+# Запросы страницы рецептов: количество, рецепты, авторы, теги,
+# ингредиенты и id авторов, на которых подписан пользователь.
+RECIPE_LIST_QUERIES = 6
+# Запросы страницы подписок: количество, авторы и их рецепты.
+SUBSCRIPTIONS_QUERIES = 3
+
+
+class QueryCountTests(TestCase):
+    """Количество запросов списков не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            first_name='Reader',
+            last_name='Reader',
+            password='Pass12345!x',
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}',
+                color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        for number in range(AUTHORS):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Author',
+                last_name='Author',
+                password='Pass12345!x',
+            )
+            Subscription.objects.create(user=cls.user, author=author)
+            for _ in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name='Рецепт',
+                    text='Описание',
+                    cooking_time=10,
+                    image='recipes/images/test.png',
+                )
+                recipe.tags.set(tags)
+                IngredientInRecipe.objects.bulk_create(
+                    IngredientInRecipe(
+                        recipe=recipe, ingredient=ingredient, amount=1
+                    )
+                    for ingredient in ingredients
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_page_queries(self, url: str, expected: int):
+        """Проверяет количество запросов на нескольких размерах
+        страницы при пустых кэшах."""
+
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                for cache in caches.all():
+                    cache.clear()
+                self.assertEqual(
+                    self.count_queries(url.format(limit=limit)), expected
+                )
+
+    def test_recipe_list(self):
+        self.assert_page_queries(
+            '/api/recipes/?limit={limit}', RECIPE_LIST_QUERIES
+        )
+
+    def test_subscriptions(self):
+        self.assert_page_queries(
+            '/api/users/subscriptions/?limit={limit}', SUBSCRIPTIONS_QUERIES
+        )
+
+    def test_subscriptions_recipes_limit(self):
+        self.assert_page_queries(
+            '/api/users/subscriptions/?limit={limit}&recipes_limit=2',
+            SUBSCRIPTIONS_QUERIES,
+        )
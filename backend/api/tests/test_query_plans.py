@@ -0,0 +1,231 @@
+"""Тесты планов запросов горячих путей API."""
+
+import json
+import os
+import tempfile
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import (
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes import chosen
+from recipes.ingredient_index import build_ingredient_index
+from recipes.models import Favorite, ShoppingCart, Subscription
+from users.models import User
+
+# Запросы горячих путей API. Списки запрашиваются в режиме курсора:
+# общее количество в режиме страниц требует полного подсчета.
+REQUESTS = (
+    ('GET', '/api/tags/'),
+    ('GET', '/api/tags/{tag_id}/'),
+    ('GET', '/api/ingredients/'),
+    ('GET', '/api/ingredients/?name={ingredient_prefix}'),
+    ('GET', '/api/ingredients/{ingredient_id}/'),
+    ('GET', '/api/recipes/?cursor='),
+    ('GET', '/api/recipes/?cursor=&author={author_id}'),
+    ('GET', '/api/recipes/?cursor=&tags={tag_slug}'),
+    ('GET', '/api/recipes/?cursor=&is_favorited=1'),
+    ('GET', '/api/recipes/?cursor=&is_in_shopping_cart=1'),
+    ('GET', '/api/recipes/?cursor=&search={word}'),
+    ('GET', '/api/recipes/{recipe_id}/'),
+    ('GET', '/api/recipes/feed/'),
+    ('GET', '/api/recipes/download_shopping_cart/?format=txt'),
+    ('GET', '/api/users/subscriptions/?cursor=&recipes_limit=3'),
+    ('POST', '/api/recipes/{recipe_id}/favorite/'),
+    ('DELETE', '/api/recipes/{recipe_id}/favorite/'),
+    ('POST', '/api/recipes/{recipe_id}/shopping_cart/'),
+    ('DELETE', '/api/recipes/{recipe_id}/shopping_cart/'),
+    ('POST', '/api/recipes/bulk_favorite/'),
+    ('DELETE', '/api/recipes/bulk_favorite/'),
+    ('POST', '/api/recipes/bulk_shopping_cart/'),
+    ('DELETE', '/api/recipes/bulk_shopping_cart/'),
+    ('POST', '/api/users/{author_id}/subscribe/'),
+    ('DELETE', '/api/users/{author_id}/subscribe/'),
+)
+# Пакетные запросы, тело которых - список id рецептов.
+BULK_URLS = (
+    '/api/recipes/bulk_favorite/',
+    '/api/recipes/bulk_shopping_cart/',
+)
+# Таблицы, которые запрос выдает целиком: полный просмотр для них
+# и есть лучший план.
+FULL_TABLES = {
+    '/api/tags/': {'recipes_tag'},
+    '/api/ingredients/': {'recipes_ingredient'},
+}
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# Полный просмотр таблиц меньшего размера допустим: для них он дешевле
+# индекса. Таблицы тестовых данных, кроме тегов, не меньше этого размера.
+MIN_ROWS = 100
+USERS = 100
+AUTHORS = 10
+RECIPES = 200
+INGREDIENTS = 200
+CHOSEN_RECIPES = 5
+SUBSCRIPTIONS = 3
+
+
+def get_sequential_scans(sql: str) -> tuple:
+    """Возвращает план запроса и таблицы, читаемые полным просмотром."""
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans, nodes = [], [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    scans.append(node['Relation Name'])
+                nodes.extend(node.get('Plans', ()))
+            return json.dumps(plan, indent=1), scans
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    # SQLite не различает полный просмотр и чтение таблицы в порядке
+    # первичного ключа. Запрос с LIMIT без сортировки во временном
+    # B-дереве читает внешнюю таблицу по ключу и останавливается,
+    # как Index Scan по первичному ключу в PostgreSQL.
+    ordered = ' LIMIT ' in sql.upper() and not any(
+        detail.startswith('USE TEMP B-TREE') for detail in details
+    )
+    scans = []
+    for detail in details:
+        words = detail.split()
+        if words[0] != 'SCAN' or 'USING' in words or 'VIRTUAL' in words:
+            continue
+        if ordered:
+            ordered = False
+            continue
+        scans.append(words[2] if words[1] == 'TABLE' else words[1])
+    return '\n'.join(details), scans
+
+
+def get_table_sizes() -> dict:
+    with connection.cursor() as cursor:
+        sizes = {}
+        for table in connection.introspection.table_names(cursor):
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            sizes[table] = cursor.fetchone()[0]
+        return sizes
+
+
+class QueryPlanTests(TestCase):
+    """Запросы горячих путей API не читают большие таблицы
+    полным просмотром."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        authors = [create_user(f'author{number}') for number in range(AUTHORS)]
+        # Пароль читателям не нужен: его хеширование замедляет тесты.
+        User.objects.bulk_create(
+            User(username=f'user{number}', email=f'user{number}@example.com')
+            for number in range(USERS)
+        )
+        readers = User.objects.filter(username__startswith='user')
+        tags = [create_tag(number) for number in range(3)]
+        ingredients = [
+            create_ingredient(number) for number in range(INGREDIENTS)
+        ]
+        recipes = [
+            create_recipe(
+                authors[number % AUTHORS],
+                {
+                    ingredients[number % INGREDIENTS]: 10,
+                    ingredients[(number * 7 + 1) % INGREDIENTS]: 20,
+                },
+                [tags[number % len(tags)]],
+                name=f'Рецепт {number}',
+            )
+            for number in range(RECIPES)
+        ]
+        for number, user in enumerate([cls.user, *readers]):
+            chosen_ids = [
+                recipes[(number * CHOSEN_RECIPES + shift) % RECIPES].pk
+                for shift in range(CHOSEN_RECIPES)
+            ]
+            chosen.add(Favorite, user.pk, chosen_ids)
+            chosen.add(ShoppingCart, user.pk, chosen_ids)
+            # Первый автор остается без подписки пользователя.
+            for shift in range(1, SUBSCRIPTIONS + 1):
+                Subscription.objects.create(
+                    user=user, author=authors[(number + shift) % AUTHORS]
+                )
+        # Автор и рецепт, которых пользователь еще не выбрал.
+        cls.parameters = {
+            'author_id': authors[0].pk,
+            'recipe_id': recipes[-1].pk,
+            'tag_id': tags[0].pk,
+            'tag_slug': tags[0].slug,
+            'ingredient_id': ingredients[0].pk,
+            'ingredient_prefix': ingredients[0].name[:5],
+            'word': recipes[-1].name.split()[0],
+        }
+        cls.bulk_ids = [recipe.pk for recipe in recipes[-CHOSEN_RECIPES:]]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        # Индекс ингредиентов строится по тестовым данным заранее:
+        # поиск по названию читает его без обращения к базе.
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        index_settings = override_settings(
+            INGREDIENT_INDEX_PATH=os.path.join(index_dir.name, 'index.bin')
+        )
+        index_settings.enable()
+        self.addCleanup(index_settings.disable)
+        build_ingredient_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fixture_sizes(self):
+        sizes = get_table_sizes()
+        for table in (
+            'users_user',
+            'recipes_recipe',
+            'recipes_ingredient',
+            'recipes_ingredientinrecipe',
+            'recipes_favorite',
+            'recipes_shoppingcart',
+            'recipes_subscription',
+        ):
+            with self.subTest(table=table):
+                self.assertGreaterEqual(sizes[table], MIN_ROWS)
+
+    def test_no_sequential_scans(self):
+        sizes = get_table_sizes()
+        for method, url in REQUESTS:
+            url = url.format(**self.parameters)
+            data = {'ids': self.bulk_ids} if url in BULK_URLS else None
+            with self.subTest(method=method, url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method.lower())(
+                        url, data, format='json'
+                    )
+                self.assertLess(response.status_code, 400)
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith(STATEMENTS):
+                        continue
+                    plan, scans = get_sequential_scans(sql)
+                    scans = [
+                        table
+                        for table in scans
+                        if sizes.get(table, 0) >= MIN_ROWS
+                        and table not in FULL_TABLES.get(url, ())
+                    ]
+                    self.assertEqual(scans, [], f'{sql}\n{plan}')
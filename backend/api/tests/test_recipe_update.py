@@ -0,0 +1,118 @@
+"""Тесты количества SQL-запросов изменения ингредиентов рецепта."""
+
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import (
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes import chosen
+from recipes.models import Ingredient, IngredientInRecipe, ShoppingCart
+from recipes.shopping_list import find_drift
+
+INGREDIENTS = 12
+# id ингредиентов не совпадают с id строк рецептов: при обновлении id
+# строки рецепта в запросе означает ее ингредиент.
+FIRST_INGREDIENT_ID = 1000
+# Запросы изменения рецепта без изменения ингредиентов: рецепт, автор,
+# точка сохранения, строки рецепта, ингредиенты, прежнее изображение,
+# сохранение рецепта, задача построения копий изображения,
+# освобождение точки сохранения и отображение рецепта.
+UNCHANGED_QUERIES = 16
+# Удаление, изменение и создание строк - по одному запросу, покупатели
+# рецепта и изменение их списков покупок с созданием недостающих строк
+# и удалением опустевших.
+PARTLY_CHANGED_QUERIES = 29
+# Удаление и создание строк и изменение списков покупок.
+FULLY_REPLACED_QUERIES = 28
+
+
+class RecipeUpdateQueryTests(TestCase):
+    """Количество запросов изменения ингредиентов рецепта зависит
+    от видов изменений, но не от количества строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.buyer = create_user('buyer')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                pk=FIRST_INGREDIENT_ID + number,
+                name=f'ингредиент {number}',
+                measurement_unit='г',
+            )
+            for number in range(INGREDIENTS)
+        ]
+        cls.tag = create_tag(0)
+        cls.recipe = cls.create_recipe()
+
+    @classmethod
+    def create_recipe(cls):
+        """Рецепт с четырьмя ингредиентами в корзине покупателя."""
+
+        recipe = create_recipe(
+            cls.author,
+            {ingredient: 10 for ingredient in cls.ingredients[:4]},
+            [cls.tag],
+        )
+        chosen.add(ShoppingCart, cls.buyer.pk, [recipe.pk])
+        return recipe
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch_ingredients(self, recipe, amounts: dict, expected: int):
+        with self.assertNumQueries(expected):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': amount}
+                        for ingredient, amount in amounts.items()
+                    ]
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(
+                IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                    'ingredient', 'amount'
+                )
+            ),
+            {ingredient.pk: amount for ingredient, amount in amounts.items()},
+        )
+        self.assertEqual(find_drift([self.buyer.pk]), [])
+
+    def test_unchanged(self):
+        self.patch_ingredients(
+            self.recipe,
+            {ingredient: 10 for ingredient in self.ingredients[:4]},
+            UNCHANGED_QUERIES,
+        )
+
+    def test_partly_changed(self):
+        first, second, third = self.ingredients[:3]
+        self.patch_ingredients(
+            self.recipe,
+            {first: 10, second: 10, third: 5, self.ingredients[4]: 1},
+            PARTLY_CHANGED_QUERIES,
+        )
+
+    def test_fully_replaced(self):
+        for count in (2, 8):
+            with self.subTest(count=count):
+                self.patch_ingredients(
+                    self.create_recipe(),
+                    {
+                        ingredient: 3
+                        for ingredient in self.ingredients[4:][:count]
+                    },
+                    FULLY_REPLACED_QUERIES,
+                )
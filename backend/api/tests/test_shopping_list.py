@@ -0,0 +1,133 @@
+"""Тесты списка покупок."""
+
+import csv
+import io
+
+from django.core.cache import caches
+from django.db.models import Sum
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import (
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+from recipes.models import IngredientInRecipe
+from recipes.shopping_list import find_drift
+
+
+class ShoppingListTests(TestCase):
+    """Скачанный список покупок совпадает с пересчитанным по корзине
+    после изменений корзины и ингредиентов рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('buyer')
+        cls.author = create_user('author')
+        cls.tag = create_tag(0)
+        cls.ingredients = [create_ingredient(number) for number in range(4)]
+        first, second, third, fourth = cls.ingredients
+        cls.recipes = [
+            create_recipe(cls.author, {first: 100, second: 2}, [cls.tag]),
+            create_recipe(cls.author, {second: 3, third: 50}, [cls.tag]),
+            create_recipe(cls.author, {fourth: 7}, [cls.tag]),
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def download(self) -> dict:
+        """Скачивает список покупок в CSV.
+
+        Возвращает {(название, единица): количество}.
+        """
+
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=csv'
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = csv.DictReader(io.StringIO(response.getvalue().decode()))
+        return {
+            (row['name'], row['measurement_unit']): int(row['amount'])
+            for row in rows
+        }
+
+    def aggregate(self) -> dict:
+        """Список покупок, пересчитанный по корзине пользователя."""
+
+        rows = (
+            IngredientInRecipe.objects.filter(
+                recipe__shopping_cart_recipes__user=self.user
+            )
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+        return {
+            (row['ingredient__name'], row['ingredient__measurement_unit']): (
+                row['total']
+            )
+            for row in rows
+        }
+
+    def assert_list_is_fresh(self):
+        self.assertEqual(self.download(), self.aggregate())
+        self.assertEqual(find_drift([self.user.pk]), [])
+
+    def toggle(self, recipe, method: str, expected_status: int):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, expected_status)
+
+    def patch_ingredients(self, recipe, amounts: dict):
+        response = self.author_client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            {
+                'ingredients': [
+                    {'id': ingredient.pk, 'amount': amount}
+                    for ingredient, amount in amounts.items()
+                ]
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_toggles(self):
+        first, second, third = self.recipes
+        self.assert_list_is_fresh()
+        self.toggle(first, 'post', 201)
+        self.assert_list_is_fresh()
+        self.toggle(second, 'post', 201)
+        self.assertEqual(
+            self.download()[(self.ingredients[1].name, 'г')], 2 + 3
+        )
+        self.assert_list_is_fresh()
+        self.toggle(first, 'delete', 204)
+        self.assert_list_is_fresh()
+        self.toggle(third, 'post', 201)
+        self.toggle(second, 'delete', 204)
+        self.assert_list_is_fresh()
+
+    def test_ingredient_edits(self):
+        first, second, third, fourth = self.ingredients
+        for recipe in self.recipes[:2]:
+            self.toggle(recipe, 'post', 201)
+        self.assert_list_is_fresh()
+        # Изменение количества, добавление и удаление ингредиента.
+        self.patch_ingredients(self.recipes[0], {first: 150, fourth: 1})
+        self.assert_list_is_fresh()
+        self.patch_ingredients(self.recipes[1], {third: 50})
+        self.assert_list_is_fresh()
+        # Рецепт не в корзине: список не меняется.
+        self.patch_ingredients(self.recipes[2], {second: 9})
+        self.assert_list_is_fresh()
+        self.toggle(self.recipes[2], 'post', 201)
+        self.assert_list_is_fresh()
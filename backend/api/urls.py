@@ -1,10 +1,13 @@
 """Api application of foodgram_backend URL Configuration."""
 
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import get_async_urls
 from api.views import (
     IngredientViewSet,
+    JobViewSet,
     RecipeViewSet,
     TagViewSet,
     UserSubscriptionsViewSet,
@@ -15,8 +18,12 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserSubscriptionsViewSet, basename='users')
+router.register('jobs', JobViewSet, basename='jobs')
 
+urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    urls = get_async_urls(urls)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(urls)),
 ]
@@ -1,37 +1,92 @@
 """Модуль представлений для приложения Api."""
 
-
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value,
+    prefetch_related_objects,
+)
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    IsAdminUser,
+    IsAuthenticated,
+)
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from api import metrics, recipe_cache, shopping_cart
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import NotPutModelViewSet
+from api.mixins import ConditionalGetMixin, NotPutModelViewSet
+from api.paginator import CursorPageLimitPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.serializers import (
-    FavoriteCreateSerializer,
-    FavoriteDeleteSerializer,
+    BulkIdsSerializer,
     IngredientSerializer,
     RecipeCreateUpdateSerializer,
     RecipeMinifiedSerializer,
     RecipeReadSerializer,
-    ShoppingCartCreateSerializer,
-    ShoppingCartDeleteSerializer,
-    SubscriptionCreateSerializer,
-    SubscriptionDeleteSerializer,
     TagSerializer,
     UserWithRecipesSerializer,
 )
-from recipes.models import Ingredient, Recipe, Tag
+from recipes import chosen
+from recipes.feed import get_feed_page
+from recipes.ingredient_index import ingredient_index
+from recipes.jobs import get_job_metrics
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag,
+)
+from recipes.versions import INGREDIENTS, TAGS, USERS, get_versions
 from users.models import User
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def get_bulk_ids(request) -> list:
+    """Возвращает id из тела пакетного запроса без повторов,
+    в порядке запроса."""
+
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data['ids']))
+
+
+def make_bulk_response(ids, changed_status, data, errors) -> Response:
+    """Формирует ответ пакетного добавления или удаления.
+
+    Для каждого id в порядке запроса возвращается статус, как у действия
+    с одним объектом, и отображение добавленного объекта (data)
+    или текст ошибки. errors - словарь id: (статус, текст ошибки).
+    """
+
+    results = []
+    for pk in ids:
+        if pk in errors:
+            error_status, message = errors[pk]
+            results.append(
+                {'id': pk, 'status': error_status, 'errors': message}
+            )
+            continue
+        result = {'id': pk, 'status': changed_status}
+        if pk in data:
+            result['data'] = data[pk]
+        results.append(result)
+    return Response(results)
+
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
 
     queryset = Tag.objects.all()
@@ -41,8 +96,16 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
         IsAdminOrReadOnly,
     ]
 
+    def get_validators(self):
+        """Валидаторы строятся по версии каталога тегов."""
+
+        version, updated_at = get_versions(TAGS)[TAGS]
+        return (TAGS, self.action, self.kwargs, version), updated_at
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(
+    ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     """Вьюсет для ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -54,16 +117,113 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         IsAdminOrReadOnly,
     ]
 
+    def get_validators(self):
+        """Валидаторы строятся по версии каталога ингредиентов
+        и параметрам запроса."""
+
+        version, updated_at = get_versions(INGREDIENTS)[INGREDIENTS]
+        etag_source = (
+            INGREDIENTS,
+            self.action,
+            self.kwargs,
+            self.request.query_params.urlencode(),
+            version,
+        )
+        return etag_source, updated_at
+
+    def list(self, request, *args, **kwargs):
+        """Список ингредиентов.
+
+        Поиск по началу названия выполняется по индексу ингредиентов,
+        отображенному в память, без обращения к базе данных.
+        """
+
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(
+            self.search_by_name, request, *args, **kwargs
+        )
+
+    def search_by_name(self, request, *args, **kwargs):
+        """Поиск ингредиентов по началу названия."""
 
-class RecipeViewSet(NotPutModelViewSet):
+        serializer = self.get_serializer(
+            ingredient_index.search(request.query_params.get('name')),
+            many=True,
+        )
+        return Response(serializer.data)
+
+
+class RecipeViewSet(ConditionalGetMixin, NotPutModelViewSet):
     """Вьюсет для рецептов."""
 
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = CursorPageLimitPagination
     permission_classes = [
         (IsAdminOrReadOnly | IsAuthorOrReadOnly),
     ]
+    conditional_vary_headers = ('Authorization', 'Cookie')
+
+    def get_validators(self):
+        """Валидаторы рецепта и списка покупок.
+
+        Для списка покупок ETag строится по версии корзины пользователя
+        и формату файла.
+
+        ETag учитывает дату изменения рецепта, признаки избранного,
+        корзины покупок и подписки на автора для текущего пользователя,
+        а также версии каталогов тегов, ингредиентов и пользователей.
+        Дата изменения отдается только анонимным пользователям:
+        признаки текущего пользователя меняются без изменения рецепта.
+        """
+
+        if self.action == 'download_shopping_cart':
+            self.shopping_cart_version = shopping_cart.get_cart_version(
+                self.request.user
+            )
+            etag_source = (
+                'shopping_cart',
+                self.shopping_cart_version,
+                self.request.accepted_renderer.format,
+            )
+            return etag_source, None
+        if self.action != 'retrieve':
+            return None, None
+        user = self.request.user
+        recipe = Recipe.objects.filter(pk=self.kwargs.get('pk'))
+        if user.is_authenticated:
+            recipe = recipe.with_user_flags(user).annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, author=OuterRef('author')
+                    )
+                )
+            )
+        recipe = recipe.values(
+            'updated_at', *recipe.query.annotations
+        ).first()
+        if recipe is None:
+            return None, None
+        versions = get_versions(TAGS, INGREDIENTS, USERS)
+        etag_source = (
+            'recipe',
+            self.kwargs.get('pk'),
+            user.pk,
+            sorted(recipe.items()),
+            sorted((name, version) for name, (version, _) in versions.items()),
+        )
+        if user.is_authenticated:
+            return etag_source, None
+        return etag_source, max(
+            [recipe['updated_at']]
+            + [
+                updated_at
+                for _, updated_at in versions.values()
+                if updated_at is not None
+            ]
+        )
 
     def get_serializer_class(self):
         """возвражает класс-сериализатор в зависимости от метода запроса."""
@@ -72,47 +232,50 @@ class RecipeViewSet(NotPutModelViewSet):
             return RecipeReadSerializer
         return RecipeCreateUpdateSerializer
 
-    def get_chosen_data(self) -> dict:
-        """Формирует данные для сериализатора подборки."""
-
-        return {'user': self.request.user.pk, 'recipe': self.kwargs.get('pk')}
-
-    def get_serializer_for_chosen(self, serializer_class):
-        """Вовращает экземпляр сериализатора подборки."""
-
-        return serializer_class(data=self.get_chosen_data())
-
-    def get_chosen_instance(self, serializer_class):
-        """Возвращает экземспляр объекта подборки из сериализатора."""
-
-        serializer = serializer_class(data=self.get_chosen_data())
-        serializer.is_valid(raise_exception=True)
-        if serializer.instance:
-            return serializer.instance
-        return serializer.save()
+    def get_queryset(self):
+        """Возвращает рецепты с признаками текущего пользователя.
 
-    def get_chosen_recipe_data(self, chosen_instance):
-        """Возвращает данные рецепта в сокращенном виде."""
+        Связанные объекты подгружает сериализатор только для рецептов,
+        отсутствующих в кэше отображений.
+        """
 
-        recipe_serializer = RecipeMinifiedSerializer(chosen_instance.recipe)
-        return recipe_serializer.data
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            return queryset.with_user_flags(self.request.user)
+        return queryset
 
-    def chosen_action(self, create_serializer_class, delete_serializer_class):
+    def chosen_action(self, model):
         """Исполняет действия с подборкой.
 
-        Создание и удаление избранного и корзины для покупок."""
+        Создание и удаление избранного и корзины для покупок. Запись
+        добавляется или удаляется одним запросом, а причина отказа
+        выясняется только при отказе.
+        """
 
+        pk = int(self.kwargs['pk'])
         if self.request.method == 'POST':
-            data = self.get_chosen_recipe_data(
-                self.get_chosen_instance(create_serializer_class)
+            if chosen.add(model, self.request.user.pk, [pk]):
+                recipe = get_object_or_404(Recipe, pk=pk)
+                return Response(
+                    RecipeMinifiedSerializer(recipe).data,
+                    status=status.HTTP_201_CREATED,
+                )
+            message = 'Рецепт уже добавлен в подборку.'
+        else:
+            if chosen.remove(model, self.request.user.pk, [pk]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            message = 'Запись отсутствует.'
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise ValidationError(
+                {
+                    'recipe': [
+                        PrimaryKeyRelatedField.default_error_messages[
+                            'does_not_exist'
+                        ].format(pk_value=pk)
+                    ]
+                }
             )
-
-            return Response(data, status=status.HTTP_201_CREATED)
-
-        instance = self.get_chosen_instance(delete_serializer_class)
-        instance.delete()
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        raise ValidationError({'non_field_errors': [message]})
 
     @action(
         detail=False,
@@ -125,9 +288,7 @@ class RecipeViewSet(NotPutModelViewSet):
     def favorite(self, request, **kwargs):
         """Избранное добавить-удалить."""
 
-        return self.chosen_action(
-            FavoriteCreateSerializer, FavoriteDeleteSerializer
-        )
+        return self.chosen_action(Favorite)
 
     @action(
         detail=False,
@@ -140,27 +301,80 @@ class RecipeViewSet(NotPutModelViewSet):
     def shopping_cart(self, request, **kwargs):
         """Корзина для покупок добавить-удалить."""
 
-        return self.chosen_action(
-            ShoppingCartCreateSerializer, ShoppingCartDeleteSerializer
-        )
+        return self.chosen_action(ShoppingCart)
 
-    def make_shopping_cart_text_string(self, ingredient_in_cart: dict) -> str:
-        """Формирует текстовую строку со списком покупок."""
+    def bulk_chosen_action(self, model):
+        """Пакетно добавляет или удаляет рецепты подборки
+        в одной транзакции."""
 
-        response_string = 'Список покупок\n'
-        response_string += ''.join(
-            [
-                (
-                    f"\n\u00B7 {str(item.get('name')).capitalize()} "
-                    f"({item.get('measurement_unit')}.) "
-                    f"\u2014 {item.get('amount')}"
+        ids = get_bulk_ids(self.request)
+        recipes = Recipe.objects.in_bulk(ids)
+        errors = {
+            pk: (status.HTTP_404_NOT_FOUND, 'Рецепт не найден.')
+            for pk in ids
+            if pk not in recipes
+        }
+        found = [pk for pk in ids if pk in recipes]
+        if self.request.method == 'POST':
+            changed = chosen.add(model, self.request.user.pk, found)
+            unchanged_error = 'Рецепт уже добавлен в подборку.'
+            changed_status = status.HTTP_201_CREATED
+            data = dict(
+                zip(
+                    changed,
+                    RecipeMinifiedSerializer(
+                        [recipes[pk] for pk in changed], many=True
+                    ).data,
                 )
-                for item in ingredient_in_cart
-            ]
+            )
+        else:
+            changed = chosen.remove(model, self.request.user.pk, found)
+            unchanged_error = 'Запись отсутствует.'
+            changed_status = status.HTTP_204_NO_CONTENT
+            data = {}
+        errors.update(
+            (pk, (status.HTTP_400_BAD_REQUEST, unchanged_error))
+            for pk in set(found) - set(changed)
         )
+        return make_bulk_response(ids, changed_status, data, errors)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[
+            IsAuthenticated,
+        ],
+    )
+    def bulk_favorite(self, request, **kwargs):
+        """Избранное добавить-удалить пакетом рецептов."""
+
+        return self.bulk_chosen_action(Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[
+            IsAuthenticated,
+        ],
+    )
+    def bulk_shopping_cart(self, request, **kwargs):
+        """Корзина для покупок добавить-удалить пакетом рецептов."""
+
+        return self.bulk_chosen_action(ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=[
+            'GET',
+        ],
+        permission_classes=[
+            IsAdminUser,
+        ],
+    )
+    def cache_stats(self, request, **kwargs):
+        """Счетчики попаданий и промахов кэша отображений рецептов."""
 
-        response_string += '\n\n\u00A9 Foodgram  \u2122. 2023.'
-        return response_string
+        return Response(recipe_cache.get_stats())
 
     @action(
         detail=False,
@@ -171,84 +385,238 @@ class RecipeViewSet(NotPutModelViewSet):
             IsAuthenticated,
         ],
     )
-    def download_shopping_cart(self, request, **kwargs):
-        """Загрузить текстовый файл со списком покупок."""
+    def feed(self, request, **kwargs):
+        """Лента рецептов авторов из подписок, новые первыми."""
+
+        queryset = self.get_queryset()
+
+        def fetch(position, descending, limit):
+            recipe_ids = get_feed_page(
+                request.user, position, descending, limit
+            )
+            recipes = queryset.in_bulk(recipe_ids)
+            return [
+                recipes[recipe_id]
+                for recipe_id in recipe_ids
+                if recipe_id in recipes
+            ]
+
+        page = self.paginator.paginate_cursor(fetch, request)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def make_shopping_cart_response(self, request, **kwargs):
+        """Формирует файл со списком покупок.
+
+        Готовый файл берется из кэша, PDF строится в пуле процессов,
+        текст и CSV отдаются потоком.
+        """
 
-        ingredient_in_cart = (
-            Ingredient.objects.filter(
-                recipes__shopping_cart_recipes__user=request.user
+        file_format = request.accepted_renderer.format
+        version = self.shopping_cart_version
+        content = shopping_cart.get_cached_file(
+            request.user, file_format, version
+        )
+        if content is not None:
+            return HttpResponse(content)
+
+        items = shopping_cart.get_cart_items(request.user)
+        if file_format == PDFRenderer.format:
+            content = shopping_cart.make_pdf(items)
+            shopping_cart.cache_file(
+                request.user, file_format, version, content
             )
-            .values('name', 'measurement_unit')
-            .annotate(amount=Sum('recipe__amount'))
+            return HttpResponse(content)
+
+        iter_file = (
+            shopping_cart.iter_csv
+            if file_format == CSVRenderer.format
+            else shopping_cart.iter_text
         )
+        return StreamingHttpResponse(
+            shopping_cart.iter_and_cache(
+                iter_file(items.iterator()),
+                request.user,
+                file_format,
+                version,
+            )
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Отдает ошибки загрузки списка покупок в JSON, а не в формате
+        запрошенного файла."""
 
-        file_name = 'shopping_list.txt'
+        if self.action == 'download_shopping_cart' and getattr(
+            response, 'exception', False
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
-        return HttpResponse(
-            self.make_shopping_cart_text_string(ingredient_in_cart),
-            headers={
-                'Content-Type': 'text/plain',
-                'Content-Disposition': f'attachment; filename={file_name}',
-            },
+    @action(
+        detail=False,
+        methods=[
+            'GET',
+        ],
+        permission_classes=[
+            IsAuthenticated,
+        ],
+        renderer_classes=[
+            PlainTextRenderer,
+            CSVRenderer,
+            PDFRenderer,
+        ],
+    )
+    def download_shopping_cart(self, request, **kwargs):
+        """Загрузить файл со списком покупок.
+
+        Формат выбирается параметром format (txt, csv, pdf)
+        или заголовком Accept.
+        """
+
+        renderer = request.accepted_renderer
+        response = self.conditional_response(
+            self.make_shopping_cart_response, request, **kwargs
+        )
+        response['Content-Type'] = renderer.media_type + (
+            f'; charset={renderer.charset}' if renderer.charset else ''
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_list.{renderer.format}'
         )
+        return response
 
 
 class UserSubscriptionsViewSet(viewsets.GenericViewSet):
     """Вьюсет для подписок."""
 
     queryset = User.objects.all()
+    pagination_class = CursorPageLimitPagination
     permission_classes = [
         IsAuthenticated,
     ]
 
-    def check_author_existenсe(self):
-        """Проверка входных данных из path-параметров запроса."""
-
-        if not User.objects.filter(pk=self.kwargs.get('pk')).exists():
-            raise NotFound('Автор не найден.')
-
-    def get_subscription_data(self) -> dict:
-        """Возвращает данные для сериализатора подписки."""
-        self.check_author_existenсe()
-        return {'user': self.request.user.pk, 'author': self.kwargs.get('pk')}
-
     def get_context(self) -> dict:
         """Возвращает контекст запроса для передачи в сериализатор,
         где используется параметр recipe_limit."""
 
         return {'request': self.request}
 
+    def get_recipes_limit(self):
+        """Возвращает значение параметра recipes_limit запроса."""
+
+        recipes_limit = self.request.GET.get('recipes_limit')
+        if not recipes_limit:
+            return None
+        if not recipes_limit.isdigit():
+            raise ValidationError(
+                {'recipes_limit': 'Ожидается целое неотрицательное число.'}
+            )
+        return int(recipes_limit)
+
+    def get_subscriptions_queryset(self):
+        """Возвращает авторов, на которых подписан пользователь."""
+
+        return (
+            User.objects.filter(subscribers__user=self.request.user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .order_by('id')
+        )
+
+    def prefetch_recipes(self, authors, recipes_limit=None):
+        """Подгружает рецепты авторов страницы одним запросом,
+        не более recipes_limit последних рецептов на автора."""
+
+        recipes = Recipe.objects.filter(author__in=authors)
+        if recipes_limit:
+            recipes = recipes.latest_per_author(recipes_limit)
+        prefetch_related_objects(
+            authors, Prefetch('recipes', queryset=recipes)
+        )
+
     @action(
         detail=False,
         methods=['POST', 'DELETE'],
         url_path=r'(?P<pk>\d+)/subscribe',
     )
     def subscribe(self, request, **kwargs):
-        """Подписка добавить-удалить."""
-
-        if request.method == 'POST':
-            serializer = SubscriptionCreateSerializer(
-                data=self.get_subscription_data()
-            )
+        """Подписка добавить-удалить.
 
-            if serializer.is_valid(raise_exception=True):
-                subscription = serializer.save()
-                subscription_serializer = UserWithRecipesSerializer(
-                    instance=subscription.author, context=self.get_context()
-                )
+        Подписка добавляется или удаляется одним запросом, а причина
+        отказа выясняется только при отказе.
+        """
 
+        author_id = int(self.kwargs['pk'])
+        if request.method == 'POST':
+            if author_id == request.user.pk:
+                message = 'Подписка на самого себя запрещена.'
+            elif chosen.add(Subscription, request.user.pk, [author_id]):
+                author = get_object_or_404(User, pk=author_id)
+                author.is_subscribed = True
                 return Response(
-                    data=subscription_serializer.data,
+                    data=UserWithRecipesSerializer(
+                        instance=author, context=self.get_context()
+                    ).data,
                     status=status.HTTP_201_CREATED,
                 )
+            else:
+                message = 'Подписка уже существует.'
+        else:
+            if chosen.remove(Subscription, request.user.pk, [author_id]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            message = 'Запись отсутствует.'
+        if not User.objects.filter(pk=author_id).exists():
+            raise NotFound('Автор не найден.')
+        raise ValidationError({'non_field_errors': [message]})
 
-        serializer = SubscriptionDeleteSerializer(
-            data=self.get_subscription_data()
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+    )
+    def bulk_subscribe(self, request, **kwargs):
+        """Подписка добавить-удалить пакетом авторов
+        в одной транзакции."""
+
+        ids = get_bulk_ids(request)
+        authors = User.objects.in_bulk(ids)
+        errors = {
+            pk: (status.HTTP_404_NOT_FOUND, 'Автор не найден.')
+            for pk in ids
+            if pk not in authors
+        }
+        found = [pk for pk in ids if pk in authors]
+        if request.method == 'POST':
+            if request.user.pk in found:
+                found.remove(request.user.pk)
+                errors[request.user.pk] = (
+                    status.HTTP_400_BAD_REQUEST,
+                    'Подписка на самого себя запрещена.',
+                )
+            changed = chosen.add(Subscription, request.user.pk, found)
+            unchanged_error = 'Подписка уже существует.'
+            changed_status = status.HTTP_201_CREATED
+            subscribed = [authors[pk] for pk in changed]
+            for author in subscribed:
+                author.is_subscribed = True
+            self.prefetch_recipes(subscribed, self.get_recipes_limit())
+            data = dict(
+                zip(
+                    changed,
+                    UserWithRecipesSerializer(
+                        subscribed, many=True, context=self.get_context()
+                    ).data,
+                )
+            )
+        else:
+            changed = chosen.remove(Subscription, request.user.pk, found)
+            unchanged_error = 'Запись отсутствует.'
+            changed_status = status.HTTP_204_NO_CONTENT
+            data = {}
+        errors.update(
+            (pk, (status.HTTP_400_BAD_REQUEST, unchanged_error))
+            for pk in set(found) - set(changed)
         )
-        serializer.is_valid(raise_exception=True)
-        instance = serializer.instance
-        instance.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return make_bulk_response(ids, changed_status, data, errors)
 
     @action(
         detail=False,
@@ -259,10 +627,72 @@ class UserSubscriptionsViewSet(viewsets.GenericViewSet):
     def subscriptions(self, request, **kwargs):
         """Список подписок."""
 
-        user = request.user
-        queryset = User.objects.filter(subscribers__user=user)
-        pages = self.paginate_queryset(queryset)
+        recipes_limit = self.get_recipes_limit()
+        pages = self.paginate_queryset(self.get_subscriptions_queryset())
+        self.prefetch_recipes(pages, recipes_limit)
         serializer = UserWithRecipesSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
+
+
+class JobViewSet(viewsets.GenericViewSet):
+    """Вьюсет для фоновых задач."""
+
+    permission_classes = [
+        IsAdminUser,
+    ]
+
+    @action(
+        detail=False,
+        methods=[
+            'GET',
+        ],
+    )
+    def metrics(self, request, **kwargs):
+        """Глубина очереди и задержки выполнения фоновых задач."""
+
+        return Response(get_job_metrics())
+
+
+def metrics_view(request):
+    """Метрики запросов, кэша и очереди задач для Prometheus.
+
+    Доступны только с адресов и сетей METRICS_ALLOWED_IPS.
+    """
+
+    if not metrics.is_allowed_client(request.META.get('REMOTE_ADDR', '')):
+        raise Http404
+    cache_stats = recipe_cache.get_stats()
+    job_metrics = get_job_metrics()
+    gauges = (
+        (
+            'foodgram_recipe_cache_requests_total',
+            'counter',
+            'Обращения к кэшу отображений рецептов.',
+            [
+                ((('result', 'hit'),), cache_stats['hits']),
+                ((('result', 'miss'),), cache_stats['misses']),
+            ],
+        ),
+        (
+            'foodgram_jobs',
+            'gauge',
+            'Количество фоновых задач по статусам.',
+            [
+                ((('name', name), ('status', job_status)), count)
+                for name, statuses in sorted(job_metrics['depth'].items())
+                for job_status, count in sorted(statuses.items())
+            ],
+        ),
+        (
+            'foodgram_jobs_oldest_pending_seconds',
+            'gauge',
+            'Время ожидания самой старой готовой к выполнению задачи.',
+            [((), job_metrics['oldest_pending_seconds'])],
+        ),
+    )
+    return HttpResponse(
+        metrics.render(gauges),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -6,4 +6,11 @@ python manage.py make_admin
 # Выполняем загружаем тестовые данные
 python manage.py load_test_data
 # Запускаем gunicorn, выход из скрипта с замещением 
+# SERVER_INTERFACE=asgi запускает воркеры uvicorn с асинхронными
+# представлениями чтения
+if [ "$SERVER_INTERFACE" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 \
+        --worker-class uvicorn.workers.UvicornWorker \
+        foodgram_backend.asgi:application
+fi
 exec gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
\ No newline at end of file
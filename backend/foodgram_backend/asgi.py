@@ -1,6 +1,7 @@
 """ASGI config for foodgram_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Read endpoints of tags, ingredients and recipes are served by async views.
 """
 
 import os
@@ -8,5 +9,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,284 @@
+"""Пул подключений к базе данных.
+
+Django 3.2 открывает подключение на каждый запрос и закрывает его
+в конце запроса. Движки foodgram_backend.db_pool.postgresql
+и foodgram_backend.db_pool.sqlite3 вместо этого берут подключение
+из пула процесса и возвращают его туда при закрытии.
+
+Параметры пула задаются ключом POOL настроек базы данных:
+MIN_SIZE - сколько подключений держится открытыми при простое,
+MAX_SIZE - наибольшее число подключений процесса, TIMEOUT - сколько
+секунд ждать свободного подключения, HEALTH_CHECK_INTERVAL - после
+скольких секунд простоя подключение проверяется запросом перед
+выдачей, MAX_IDLE - через сколько секунд простоя закрываются
+подключения сверх MIN_SIZE, MAX_LIFETIME - наибольший возраст
+подключения в секундах.
+
+При возврате незавершенная транзакция откатывается, а сломанное
+подключение или подключение, закрытое внутри atomic, закрывается
+совсем.
+"""
+
+import abc
+import os
+import threading
+import time
+from collections import deque
+from contextlib import closing
+
+from django.dispatch import Signal
+
+DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'HEALTH_CHECK_INTERVAL': 30,
+    'MAX_IDLE': 300,
+    'MAX_LIFETIME': 3600,
+}
+
+# Отправляется после выдачи подключения, аргумент wait - время
+# ожидания в секундах.
+connection_checked_out = Signal()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """Свободное подключение не появилось за время ожидания."""
+
+
+class PooledConnection:
+    """Подключение драйвера с временем открытия и возврата в пул."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+def ping(raw):
+    """Проверяет подключение драйвера запросом."""
+
+    with closing(raw.cursor()) as cursor:
+        cursor.execute('SELECT 1')
+
+
+class ConnectionPool:
+    """Пул подключений процесса."""
+
+    def __init__(self, options: dict):
+        self.min_size = options['MIN_SIZE']
+        self.max_size = options['MAX_SIZE']
+        self.timeout = options['TIMEOUT']
+        self.health_check_interval = options['HEALTH_CHECK_INTERVAL']
+        self.max_idle = options['MAX_IDLE']
+        self.max_lifetime = options['MAX_LIFETIME']
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.wait_seconds = 0.0
+
+    def _take(self):
+        """Берет свободное подключение либо место под новое.
+
+        Возвращает PooledConnection или None, если нужно открыть
+        новое подключение.
+        """
+
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'Нет свободного подключения к базе данных '
+                        f'за {self.timeout} с, открыто {self._size}.'
+                    )
+                self.waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def _discard(self, pooled):
+        with self._condition:
+            self._size -= 1
+            self.discarded += 1
+            self._condition.notify()
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, pooled) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at >= self.max_lifetime:
+            return False
+        if now - pooled.released_at < self.health_check_interval:
+            return True
+        try:
+            ping(pooled.raw)
+        except Exception:
+            return False
+        return True
+
+    def acquire(self, connect):
+        """Выдает подключение драйвера и время ожидания в секундах.
+
+        connect открывает новое подключение, если свободных нет
+        и размер пула меньше наибольшего.
+        """
+
+        started = time.monotonic()
+        while True:
+            pooled = self._take()
+            if pooled is None:
+                try:
+                    pooled = PooledConnection(connect())
+                except BaseException:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self.created += 1
+                break
+            if self._is_alive(pooled):
+                break
+            self._discard(pooled)
+        wait = time.monotonic() - started
+        with self._condition:
+            self._in_use[id(pooled.raw)] = pooled
+            self.checkouts += 1
+            self.wait_seconds += wait
+        return pooled.raw, wait
+
+    def release(self, raw, reusable: bool):
+        """Возвращает подключение в пул или закрывает его."""
+
+        with self._condition:
+            pooled = self._in_use.pop(id(raw), None)
+        if pooled is None:
+            raw.close()
+            return
+        if not reusable:
+            self._discard(pooled)
+            return
+        now = time.monotonic()
+        pooled.released_at = now
+        expired = []
+        with self._condition:
+            self._idle.append(pooled)
+            while (
+                len(self._idle) > self.min_size
+                and now - self._idle[0].released_at >= self.max_idle
+            ):
+                expired.append(self._idle.popleft())
+                self._size -= 1
+                self.discarded += 1
+            self._condition.notify()
+        for pooled in expired:
+            try:
+                pooled.raw.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+                'wait_seconds': self.wait_seconds,
+            }
+
+
+def get_pool(alias: str, options: dict) -> ConnectionPool:
+    """Возвращает пул подключений процесса для базы данных alias.
+
+    Пул, унаследованный при fork, не используется: его подключения
+    принадлежат родительскому процессу.
+    """
+
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = ConnectionPool(dict(DEFAULTS, **options))
+        return pool
+
+
+def get_pool_stats() -> dict:
+    """Состояние пулов текущего процесса по базам данных."""
+
+    with _pools_lock:
+        pools = [
+            (alias, pool)
+            for alias, pool in _pools.items()
+            if pool.pid == os.getpid()
+        ]
+    return {alias: pool.get_stats() for alias, pool in pools}
+
+
+class PooledDatabaseWrapperMixin(abc.ABC):
+    """Примесь к DatabaseWrapper, берущая подключения из пула."""
+
+    def use_pool(self) -> bool:
+        return True
+
+    def get_pool(self) -> ConnectionPool:
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    @abc.abstractmethod
+    def is_reusable(self, raw) -> bool:
+        """Приводит подключение в исходное состояние перед возвратом.
+
+        Возвращает False, если подключение нельзя использовать снова.
+        """
+
+    def get_new_connection(self, conn_params):
+        if not self.use_pool():
+            return super().get_new_connection(conn_params)
+        try:
+            raw, wait = self.get_pool().acquire(
+                lambda: super(
+                    PooledDatabaseWrapperMixin, self
+                ).get_new_connection(conn_params)
+            )
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+        connection_checked_out.send(
+            sender=self.__class__, alias=self.alias, wait=wait
+        )
+        return raw
+
+    def _close(self):
+        if self.connection is None or not self.use_pool():
+            return super()._close()
+        # Подключение, закрытое внутри atomic, остается у обертки
+        # до отката, поэтому в пул не возвращается.
+        reusable = not self.in_atomic_block and self.is_reusable(
+            self.connection
+        )
+        with self.wrap_database_errors:
+            self.get_pool().release(self.connection, reusable)
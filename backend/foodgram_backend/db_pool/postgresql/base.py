@@ -0,0 +1,32 @@
+"""Движок PostgreSQL с пулом подключений."""
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from foodgram_backend.db_pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Уровень изоляции задается обертке при открытии подключения,
+        # а подключение из пула могло открыть другая обертка.
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def is_reusable(self, raw) -> bool:
+        if raw.closed:
+            return False
+        status = raw.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                raw.rollback()
+            except Exception:
+                return False
+        if not raw.autocommit:
+            raw.autocommit = True
+        return True
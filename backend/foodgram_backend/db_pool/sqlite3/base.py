@@ -0,0 +1,23 @@
+"""Движок SQLite с пулом подключений.
+
+Используется для проверки пула без сервера PostgreSQL. Подключения
+к базе в памяти не пулятся: у каждого из них своя база.
+"""
+
+from django.db.backends.sqlite3 import base
+
+from foodgram_backend.db_pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def use_pool(self) -> bool:
+        return not self.is_in_memory_db()
+
+    def is_reusable(self, raw) -> bool:
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+            raw.isolation_level = None
+        except Exception:
+            return False
+        return True
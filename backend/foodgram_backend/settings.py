@@ -3,6 +3,7 @@
 Generated by 'django-admin startproject' using Django 3.2.19.
 """
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,17 +63,145 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+# Пул подключений процесса, см. foodgram_backend.db_pool.
+DB_POOL = os.getenv('DB_POOL', '0') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram_backend.db_pool.postgresql'
+            if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECK_INTERVAL': float(
+                os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)
+            ),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+        },
     }
 }
 
+RECIPE_CACHE_BACKEND = os.getenv(
+    'RECIPE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recipes': {
+        'BACKEND': RECIPE_CACHE_BACKEND,
+        'LOCATION': os.getenv('RECIPE_CACHE_LOCATION', 'recipes'),
+        'TIMEOUT': int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60)),
+    },
+}
+
+if RECIPE_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['recipes']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', 10000)),
+    }
+
+# Кэш токенов аутентификации. Он должен быть общим для всех процессов
+# сервера, иначе выход из системы и смена пароля сразу действуют только
+# в одном процессе, поэтому по умолчанию кэш файловый. Файловый кэш
+# при переполнении MAX_ENTRIES удаляет случайную часть записей
+# (1/CULL_FREQUENCY), а не давно не читанные, поэтому в продакшене
+# лучше задать memcached, вытесняющий записи по давности чтения.
+TOKEN_CACHE_BACKEND = os.getenv(
+    'TOKEN_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+CACHES['tokens'] = {
+    'BACKEND': TOKEN_CACHE_BACKEND,
+    'LOCATION': os.getenv(
+        'TOKEN_CACHE_LOCATION',
+        os.path.join(tempfile.gettempdir(), 'foodgram-tokens'),
+    ),
+    'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', 5 * 60)),
+}
+
+if TOKEN_CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['tokens']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', 10000)),
+    }
+
+SHOPPING_CART_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_CART_CACHE_TIMEOUT', 60 * 60)
+)
+SHOPPING_CART_PDF_WORKERS = int(os.getenv('SHOPPING_CART_PDF_WORKERS', 2))
+SHOPPING_CART_PDF_TIMEOUT = int(os.getenv('SHOPPING_CART_PDF_TIMEOUT', 30))
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+# Начиная с этого значения счетчика избранного изменения записываются
+# приращениями, а не обновлением строки рецепта.
+FAVORITES_COUNT_HOT_THRESHOLD = int(
+    os.getenv('FAVORITES_COUNT_HOT_THRESHOLD', 1000)
+)
+
+# Наибольшее количество id в пакетном добавлении и удалении
+# избранного, корзины покупок и подписок.
+BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 100))
+
+# Рецепты авторов, у которых не меньше подписчиков или рецептов,
+# не записываются в ленты подписок, а читаются напрямую. Обратно
+# в ленты автор записывается, когда подписчиков и рецептов у него
+# становится меньше FEED_PUSH_*, чтобы автор у границы не переключался
+# туда и обратно.
+FEED_PULL_SUBSCRIBERS = int(os.getenv('FEED_PULL_SUBSCRIBERS', 1000))
+FEED_PULL_RECIPES = int(os.getenv('FEED_PULL_RECIPES', 1000))
+FEED_PUSH_SUBSCRIBERS = int(
+    os.getenv('FEED_PUSH_SUBSCRIBERS', FEED_PULL_SUBSCRIBERS * 4 // 5)
+)
+FEED_PUSH_RECIPES = int(
+    os.getenv('FEED_PUSH_RECIPES', FEED_PULL_RECIPES * 4 // 5)
+)
+
+# Метрики запросов процессов складываются в файлы каталога METRICS_DIR.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+# Адреса и сети, с которых доступен /metrics, через запятую. Шлюз nginx
+# /metrics не проксирует, поэтому Prometheus в сети docker обращается
+# к backend:8000/metrics напрямую, и его адрес входит в сеть docker:
+# METRICS_ALLOWED_IPS=127.0.0.1,172.16.0.0/12.
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+# Запросы дольше порога, мс, пишутся в журнал.
+SLOW_REQUEST_THRESHOLD = int(os.getenv('SLOW_REQUEST_THRESHOLD', 500))
+
+# Асинхронные представления чтения тегов, ингредиентов и рецептов.
+# Включаются в foodgram_backend/asgi.py для запуска под ASGI.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '0') == '1'
+
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+# Время блокировки выполняющейся задачи, секунд.
+JOBS_VISIBILITY_TIMEOUT = int(os.getenv('JOBS_VISIBILITY_TIMEOUT', 300))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+# Задержка первого повтора, секунд; удваивается с каждой попыткой.
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+# Сколько дней хранить выполненные задачи.
+JOBS_RETENTION = int(os.getenv('JOBS_RETENTION', 7))
+# Периодические задачи: имя задачи и интервал, секунд.
+JOBS_PERIODIC = {
+    'fold_favorites_count_deltas': 60,
+    'update_pulled_authors': 60,
+    'cleanup_jobs': 60 * 60,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,6 +234,13 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Как часто процесс проверяет версию каталога тегов, секунд.
+TAG_REGISTRY_TTL = float(os.getenv('TAG_REGISTRY_TTL', 5))
+
+INGREDIENT_INDEX_PATH = os.getenv(
+    'INGREDIENT_INDEX_PATH', os.path.join(BASE_DIR, 'ingredient_index.bin')
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -114,7 +251,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -122,6 +259,13 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'api.exceptions.non_field_errors_exception_handler',
 }
 
+# Basic-аутентификация проверяет пароль на каждом запросе, это дорогое
+# вычисление хэша. В продакшене ее стоит отключить: API_BASIC_AUTH=0.
+if os.getenv('API_BASIC_AUTH', '1') != '1':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].remove(
+        'rest_framework.authentication.BasicAuthentication'
+    )
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
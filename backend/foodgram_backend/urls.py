@@ -4,9 +4,12 @@ from django.contrib import admin
 from django.urls import include, path
 from djoser.views import UserViewSet
 
+from api.views import metrics_view
+
 urlpatterns = [
     path('api/', include('api.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/auth/', include('djoser.urls.authtoken')),
     path('api/users/', UserViewSet.as_view({'get': 'list', 'post': 'create'})),
     path('api/users/<int:id>/', UserViewSet.as_view({'get': 'retrieve'})),
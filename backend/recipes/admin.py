@@ -6,10 +6,12 @@ from recipes.models import (
     Favorite,
     Ingredient,
     IngredientInRecipe,
+    Job,
     Recipe,
     ShoppingCart,
     Tag,
 )
+from recipes.search import search_recipes
 
 
 @admin.register(Tag)
@@ -90,6 +92,8 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'display_favorite_count',
     )
+    # Счетчик изменяется только приращениями, см. recipes.counters.
+    readonly_fields = ('favorites_count',)
     list_filter = (
         'tags',
         'name',
@@ -104,9 +108,36 @@ class RecipeAdmin(admin.ModelAdmin):
         RecipeTagsInLine,
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по названию, тегам, ингредиентам и описанию
+        через полнотекстовый индекс.
+        """
+
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term, rank=False), False
+
     @admin.display(description='Добавлено в избранное, раз.')
     def display_favorite_count(self, obj: Recipe):
         """Доополнительное поле, сколько раз рейцепт
         добавлен пользователями в избранное."""
 
-        return obj.in_favorites.count()
+        return obj.favorites_count
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Настройки отображения модели Job в административной панели."""
+
+    list_display = (
+        'name',
+        'status',
+        'attempts',
+        'run_after',
+        'finished_at',
+    )
+    list_filter = (
+        'status',
+        'name',
+    )
+    search_fields = ('key',)
@@ -8,3 +8,8 @@ class RecipesConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        """Подключает обработчики сигналов."""
+
+        import recipes.signals  # noqa: F401
@@ -0,0 +1,116 @@
+"""Модуль изменения подборок и подписок.
+
+Записи избранного, корзины покупок и подписок пользователя
+добавляются одним запросом INSERT ... ON CONFLICT DO NOTHING RETURNING
+и удаляются одним DELETE ... RETURNING, как по одной, так и пакетом.
+Запрос возвращает только те записи, которые он сам добавил
+или удалил, поэтому при одновременных запросах каждая запись
+учитывается ровно один раз, а повторный запрос не приводит
+к ошибке целостности.
+
+Такие запросы не вызывают обработчики recipes.signals, поэтому
+счетчики, списки покупок и ленты изменяются здесь же, одним
+запросом на весь пакет.
+"""
+
+from django.db import connection, transaction
+
+from recipes import counters, feed, shopping_list
+from recipes.models import Favorite, ShoppingCart, Subscription
+
+# Поле записи, ссылающееся на выбранный объект.
+FIELDS = {
+    Favorite: 'recipe',
+    ShoppingCart: 'recipe',
+    Subscription: 'author',
+}
+
+
+def apply_changes(model, user_id: int, ids: list, added: bool):
+    """Изменяет счетчики, списки покупок и ленты, как обработчики
+    сигналов записи и удаления model."""
+
+    delta = 1 if added else -1
+    if model is Favorite:
+        counters.change_favorites_counts(ids, delta)
+    elif model is ShoppingCart:
+        if added:
+            shopping_list.add_recipes(user_id, ids)
+        else:
+            shopping_list.remove_recipes(user_id, ids)
+    elif model is Subscription:
+        counters.change_subscribers_counts(ids, delta)
+        if added:
+            feed.backfill_authors(user_id, ids)
+        else:
+            feed.prune_authors(user_id, ids)
+
+
+def get_names(model) -> tuple:
+    """Возвращает имена таблицы model, столбца пользователя
+    и столбца выбранного объекта для SQL."""
+
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field(FIELDS[model]).column),
+    )
+
+
+def execute(sql: str, params: list) -> set:
+    """Выполняет запрос и возвращает множество значений
+    первого столбца."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def add(model, user_id: int, ids: list) -> list:
+    """Добавляет записи model пользователя для объектов ids.
+
+    Записи создаются только для существующих объектов. Возвращает id
+    объектов, записи для которых добавлены этим запросом.
+    """
+
+    if not ids:
+        return []
+    table, user_column, column = get_names(model)
+    target = model._meta.get_field(FIELDS[model]).related_model._meta
+    quote = connection.ops.quote_name
+    target_table, target_pk = quote(target.db_table), quote(target.pk.column)
+    added = execute(
+        f'INSERT INTO {table} ({user_column}, {column}) '
+        f'SELECT %s, {target_pk} FROM {target_table} '
+        f'WHERE {target_pk} IN ({", ".join(["%s"] * len(ids))}) '
+        f'ON CONFLICT DO NOTHING RETURNING {column}',
+        [user_id, *ids],
+    )
+    added = [pk for pk in ids if pk in added]
+    if added:
+        apply_changes(model, user_id, added, True)
+    return added
+
+
+@transaction.atomic
+def remove(model, user_id: int, ids: list) -> list:
+    """Удаляет записи model пользователя для объектов ids.
+
+    Возвращает id объектов, записи для которых удалены этим запросом.
+    """
+
+    if not ids:
+        return []
+    table, user_column, column = get_names(model)
+    removed = execute(
+        f'DELETE FROM {table} WHERE {user_column} = %s '
+        f'AND {column} IN ({", ".join(["%s"] * len(ids))}) '
+        f'RETURNING {column}',
+        [user_id, *ids],
+    )
+    removed = [pk for pk in ids if pk in removed]
+    if removed:
+        apply_changes(model, user_id, removed, False)
+    return removed
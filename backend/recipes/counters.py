@@ -0,0 +1,199 @@
+"""Модуль денормализованных счетчиков.
+
+Счетчики хранятся в столбцах Recipe.favorites_count,
+User.recipes_count и User.subscribers_count и изменяются
+одним запросом UPDATE ... SET count = count + n при каждой записи
+в избранное, создании рецепта или подписке.
+
+Чтобы строка популярного рецепта не становилась точкой конкуренции
+за блокировку, для рецептов, набравших FAVORITES_COUNT_HOT_THRESHOLD
+добавлений в избранное, изменения записываются отдельными строками
+в FavoritesCountDelta и периодически сворачиваются в столбец.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from recipes.jobs import register_job
+from recipes.models import FavoritesCountDelta, Recipe
+from users.models import User
+
+
+def change_favorites_count(recipe_id: int, delta: int):
+    """Изменяет счетчик избранного рецепта."""
+
+    updated = Recipe.objects.filter(
+        pk=recipe_id,
+        favorites_count__lt=settings.FAVORITES_COUNT_HOT_THRESHOLD,
+    ).update(favorites_count=F('favorites_count') + delta)
+    if not updated and Recipe.objects.filter(pk=recipe_id).exists():
+        FavoritesCountDelta.objects.create(recipe_id=recipe_id, delta=delta)
+
+
+def change_favorites_counts(recipe_ids, delta: int):
+    """Изменяет счетчики избранного рецептов: одним UPDATE
+    для обычных рецептов и одним INSERT приращений для популярных."""
+
+    if len(recipe_ids) == 1:
+        # Для одного рецепта популярность проверяется самим UPDATE.
+        change_favorites_count(recipe_ids[0], delta)
+        return
+    hot = set(
+        Recipe.objects.filter(
+            pk__in=recipe_ids,
+            favorites_count__gte=settings.FAVORITES_COUNT_HOT_THRESHOLD,
+        ).values_list('pk', flat=True)
+    )
+    Recipe.objects.filter(pk__in=set(recipe_ids) - hot).update(
+        favorites_count=F('favorites_count') + delta
+    )
+    FavoritesCountDelta.objects.bulk_create(
+        [
+            FavoritesCountDelta(recipe_id=recipe_id, delta=delta)
+            for recipe_id in hot
+        ]
+    )
+
+
+def change_recipes_count(author_id: int, delta: int):
+    """Изменяет счетчик рецептов автора."""
+
+    User.objects.filter(pk=author_id).update(
+        recipes_count=F('recipes_count') + delta
+    )
+
+
+def change_subscribers_count(author_id: int, delta: int):
+    """Изменяет счетчик подписчиков автора."""
+
+    change_subscribers_counts([author_id], delta)
+
+
+def change_subscribers_counts(author_ids, delta: int):
+    """Изменяет счетчики подписчиков авторов одним запросом."""
+
+    User.objects.filter(pk__in=author_ids).update(
+        subscribers_count=F('subscribers_count') + delta
+    )
+
+
+@register_job('fold_favorites_count_deltas')
+@transaction.atomic
+def fold_favorites_count_deltas() -> int:
+    """Сворачивает накопленные приращения в счетчики избранного.
+
+    Возвращает количество обновленных рецептов.
+    """
+
+    last_id = (
+        FavoritesCountDelta.objects.order_by('-id')
+        .values_list('id', flat=True)
+        .first()
+    )
+    if last_id is None:
+        return 0
+    deltas = FavoritesCountDelta.objects.filter(id__lte=last_id)
+    totals = (
+        deltas.values('recipe_id')
+        .annotate(total=Sum('delta'))
+        .values_list('recipe_id', 'total')
+        .order_by()
+    )
+    for recipe_id, total in totals:
+        Recipe.objects.filter(pk=recipe_id).update(
+            favorites_count=F('favorites_count') + total
+        )
+    folded = len(totals)
+    deltas.delete()
+    return folded
+
+
+def count_subquery(model, field: str):
+    """Подзапрос количества связанных строк модели."""
+
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+            .order_by(),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def get_expected_counts():
+    """Возвращает запросы с фактическими значениями счетчиков."""
+
+    from recipes.models import Favorite, Subscription
+
+    return (
+        (
+            Recipe.objects.all(),
+            'favorites_count',
+            count_subquery(Favorite, 'recipe'),
+        ),
+        (
+            User.objects.all(),
+            'recipes_count',
+            count_subquery(Recipe, 'author'),
+        ),
+        (
+            User.objects.all(),
+            'subscribers_count',
+            count_subquery(Subscription, 'author'),
+        ),
+    )
+
+
+def find_drift() -> dict:
+    """Возвращает количество строк с расхождением по каждому счетчику.
+
+    Несвернутые приращения учитываются.
+    """
+
+    drift = {}
+    for queryset, field, expected in get_expected_counts():
+        current = F(field)
+        if field == 'favorites_count':
+            current = current + Coalesce(
+                Subquery(
+                    FavoritesCountDelta.objects.filter(
+                        recipe=OuterRef('pk')
+                    )
+                    .values('recipe')
+                    .annotate(total=Sum('delta'))
+                    .values('total')
+                    .order_by(),
+                    output_field=IntegerField(),
+                ),
+                0,
+            )
+        drift[field] = (
+            queryset.annotate(current=current, expected=expected)
+            .exclude(current=F('expected'))
+            .count()
+        )
+    return drift
+
+
+@transaction.atomic
+def reconcile_counters() -> dict:
+    """Пересчитывает все счетчики по исходным таблицам.
+
+    Возвращает количество исправленных строк по каждому счетчику.
+    """
+
+    FavoritesCountDelta.objects.all().delete()
+    fixed = {}
+    for queryset, field, expected in get_expected_counts():
+        fixed[field] = (
+            queryset.annotate(expected=expected)
+            .exclude(**{field: F('expected')})
+            .update(**{field: expected})
+        )
+    return fixed
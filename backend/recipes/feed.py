@@ -0,0 +1,214 @@
+"""Модуль ленты подписок.
+
+Лента пользователя - таблица FeedItem с рецептами авторов,
+на которых он подписан. Новый рецепт записывается в ленты всех
+подписчиков автора, при подписке в ленту добавляются рецепты автора,
+при отписке - удаляются.
+
+Авторы, у которых не меньше FEED_PULL_SUBSCRIBERS подписчиков
+или FEED_PULL_RECIPES рецептов, в ленты не записываются: запись
+в тысячи лент или тысяч рецептов была бы слишком дорогой. Такие
+авторы отмечаются в таблице PulledAuthor, их рецепты при чтении
+ленты выбираются напрямую и объединяются с лентой.
+
+Отметки обновляет периодическая задача update_pulled_authors. Автор
+снимается с прямого чтения, только когда подписчиков и рецептов
+у него меньше FEED_PUSH_*. Сначала ленты подписчиков дополняются
+его рецептами, которых в них нет, и лишь затем отметка удаляется,
+поэтому рецепты автора не пропадают из лент.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from recipes.jobs import register_job
+from recipes.models import FeedItem, PulledAuthor, Recipe, Subscription
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+def get_pulled_authors():
+    """Авторы, рецепты которых не записываются в ленты."""
+
+    return PulledAuthor.objects.filter(backfilling=False).values(
+        'author_id'
+    )
+
+
+def is_pulled(author_id: int) -> bool:
+    return get_pulled_authors().filter(author_id=author_id).exists()
+
+
+def fan_out(recipe: Recipe):
+    """Записывает новый рецепт в ленты подписчиков автора."""
+
+    author_id = recipe.author_id
+    if is_pulled(author_id):
+        return
+    user_ids = Subscription.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe=recipe, author_id=author_id)
+            for user_id in user_ids
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id: int, author_id: int):
+    """Добавляет в ленту пользователя рецепты автора."""
+
+    if not is_pulled(author_id):
+        insert_author_recipes(user_id, author_id)
+
+
+def insert_author_recipes(user_id: int, author_id: int):
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id in Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('id', flat=True)
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_authors(user_id: int, author_ids):
+    """Добавляет в ленту пользователя рецепты нескольких авторов."""
+
+    pushed = User.objects.filter(pk__in=author_ids).exclude(
+        pk__in=get_pulled_authors()
+    )
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author)
+            for recipe_id, author in Recipe.objects.filter(
+                author__in=pushed
+            ).values_list('id', 'author_id')
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id: int, author_id: int):
+    """Удаляет из ленты пользователя рецепты автора."""
+
+    prune_authors(user_id, [author_id])
+
+
+def prune_authors(user_id: int, author_ids):
+    """Удаляет из ленты пользователя рецепты авторов."""
+
+    FeedItem.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def get_feed_page(user, position, descending: bool, limit: int) -> list:
+    """Возвращает не более limit id рецептов ленты пользователя
+    после position в заданном порядке.
+
+    Лента и рецепты читаемых напрямую авторов выбираются отдельными
+    запросами по индексам и объединяются.
+    """
+
+    lookup = 'lt' if descending else 'gt'
+    sign = '-' if descending else ''
+    items = FeedItem.objects.filter(user=user).order_by(f'{sign}recipe_id')
+    pulled = Recipe.objects.filter(
+        author__in=PulledAuthor.objects.filter(
+            author__subscribers__user=user
+        ).values('author_id')
+    ).order_by(f'{sign}id')
+    if position is not None:
+        items = items.filter(**{f'recipe_id__{lookup}': position})
+        pulled = pulled.filter(**{f'id__{lookup}': position})
+    recipe_ids = set(items.values_list('recipe_id', flat=True)[:limit])
+    recipe_ids.update(pulled.values_list('id', flat=True)[:limit])
+    return sorted(recipe_ids, reverse=descending)[:limit]
+
+
+@transaction.atomic
+def rebuild_feeds() -> int:
+    """Приводит ленты в соответствие с подписками.
+
+    Удаляет записи без подписки и добавляет недостающие рецепты
+    записываемых в ленты авторов. Возвращает количество подписок.
+    """
+
+    FeedItem.objects.exclude(
+        Exists(
+            Subscription.objects.filter(
+                user=OuterRef('user'), author=OuterRef('author')
+            )
+        )
+    ).delete()
+    subscriptions = Subscription.objects.exclude(
+        author__in=get_pulled_authors()
+    ).values_list('user_id', 'author_id')
+    count = 0
+    for user_id, author_id in subscriptions.iterator():
+        insert_author_recipes(user_id, author_id)
+        count += 1
+    return count
+
+
+def backfill_subscribers(author_id: int):
+    """Добавляет рецепты автора в ленты всех его подписчиков."""
+
+    user_ids = Subscription.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    for user_id in user_ids.iterator():
+        insert_author_recipes(user_id, author_id)
+
+
+@register_job('update_pulled_authors')
+def update_pulled_authors() -> int:
+    """Отмечает авторов для прямого чтения и снимает отметки.
+
+    Возвращает количество авторов, снятых с прямого чтения.
+    """
+
+    pull = Q(subscribers_count__gte=settings.FEED_PULL_SUBSCRIBERS) | Q(
+        recipes_count__gte=settings.FEED_PULL_RECIPES
+    )
+    push = Q(subscribers_count__lt=settings.FEED_PUSH_SUBSCRIBERS) & Q(
+        recipes_count__lt=settings.FEED_PUSH_RECIPES
+    )
+    PulledAuthor.objects.bulk_create(
+        [
+            PulledAuthor(author_id=author_id)
+            for author_id in User.objects.filter(pull).values_list(
+                'pk', flat=True
+            )
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    PulledAuthor.objects.filter(
+        backfilling=True, author__in=User.objects.filter(pull)
+    ).update(backfilling=False)
+    PulledAuthor.objects.filter(
+        backfilling=False, author__in=User.objects.filter(push)
+    ).update(backfilling=True)
+
+    # Пока ленты дополняются, новые рецепты и подписки уже
+    # записываются в ленты, а чтение остается прямым.
+    removed = 0
+    for author_id in PulledAuthor.objects.filter(
+        backfilling=True
+    ).values_list('author_id', flat=True):
+        backfill_subscribers(author_id)
+        removed += PulledAuthor.objects.filter(
+            author_id=author_id, backfilling=True
+        ).delete()[0]
+    return removed
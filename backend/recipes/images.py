@@ -0,0 +1,158 @@
+"""Модуль производных изображений рецептов.
+
+Для каждого изображения рецепта строятся уменьшенные копии
+фиксированных размеров (карточка списка, страница рецепта, экраны
+высокой плотности) в форматах WebP и JPEG. Построение выполняется
+фоновой задачей (см. recipes.jobs), не задерживая запрос.
+После построения у рецептов отмечается наличие копий и обновляется
+дата изменения, чтобы кэшированные отображения получили ссылки
+на копии. Копии изображения, которое больше не используется
+рецептами, удаляются.
+"""
+
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from recipes.jobs import enqueue, register_job
+
+DERIVATIVES_PATH = 'recipe/derivatives/'
+# Название: ширина и высота.
+SIZES = {
+    'card': (400, 300),
+    'detail': (800, 600),
+    'retina': (1600, 1200),
+}
+# Расширение файла: формат Pillow. WebP строится, если Pillow
+# собран с его поддержкой.
+FORMATS = {
+    extension: file_format
+    for extension, file_format in (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+    if file_format != 'WEBP' or features.check('webp')
+}
+QUALITY = 80
+
+
+def get_derivative_name(image_name: str, size: str, extension: str) -> str:
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{DERIVATIVES_PATH}{stem}_{size}.{extension}'
+
+
+def derivatives_exist(image_name: str) -> bool:
+    """Построены ли копии изображения.
+
+    Копии сохраняются по порядку, поэтому достаточно проверить
+    последнюю из них.
+    """
+
+    return default_storage.exists(
+        get_derivative_name(image_name, list(SIZES)[-1], list(FORMATS)[-1])
+    )
+
+
+def delete_derivatives(image_name: str) -> bool:
+    """Удаляет копии изображения, если его не используют рецепты.
+
+    Возвращает True, если копии удалены.
+    """
+
+    from recipes.models import Recipe
+
+    if Recipe.objects.filter(image=image_name).exists():
+        return False
+    for size in SIZES:
+        for extension in FORMATS:
+            name = get_derivative_name(image_name, size, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+    return True
+
+
+def render_derivatives(content: bytes) -> dict:
+    """Строит копии изображения, возвращает содержимое файлов
+    по названию размера и расширению."""
+
+    derivatives = {}
+    with Image.open(BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for size, dimensions in SIZES.items():
+        resized = ImageOps.fit(image, dimensions, Image.LANCZOS)
+        for extension, file_format in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                format=file_format,
+                quality=QUALITY,
+                optimize=True,
+                progressive=file_format == 'JPEG',
+            )
+            derivatives[size, extension] = buffer.getvalue()
+    return derivatives
+
+
+def generate_derivatives(image_name: str, force: bool = False) -> bool:
+    """Строит и сохраняет копии изображения.
+
+    Возвращает False, если копии уже построены или изображение
+    не используется рецептами.
+    """
+
+    from recipes.models import Recipe
+
+    recipes = Recipe.objects.filter(image=image_name)
+    if not recipes.exists():
+        return False
+    if not force and derivatives_exist(image_name):
+        recipes.filter(image_derivatives=False).update(
+            image_derivatives=True, updated_at=timezone.now()
+        )
+        return False
+    with default_storage.open(image_name, 'rb') as file:
+        content = file.read()
+    for (size, extension), data in render_derivatives(content).items():
+        name = get_derivative_name(image_name, size, extension)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(data))
+    recipes.update(image_derivatives=True, updated_at=timezone.now())
+    return True
+
+
+@register_job('recipe_images')
+def generate_recipe_images(image: str):
+    """Фоновая задача построения копий изображения."""
+
+    generate_derivatives(image)
+
+
+def schedule_derivatives(image_name: str):
+    """Ставит построение копий изображения в очередь фоновых задач."""
+
+    enqueue(
+        'recipe_images', key=f'recipe_images:{image_name}', image=image_name
+    )
+
+
+def get_srcset(image_name: str, build_url) -> dict:
+    """Возвращает для каждого формата строку srcset с копиями
+    изображения. Наличие копий проверяет вызывающий."""
+
+    srcset = {}
+    for extension in FORMATS:
+        urls = (
+            (
+                build_url(
+                    default_storage.url(
+                        get_derivative_name(image_name, size, extension)
+                    )
+                ),
+                width,
+            )
+            for size, (width, _) in SIZES.items()
+        )
+        srcset[extension] = ', '.join(f'{url} {width}w' for url, width in urls)
+    return srcset
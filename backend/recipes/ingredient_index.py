@@ -0,0 +1,207 @@
+"""Модуль индекса ингредиентов для поиска по началу названия.
+
+Индекс - отсортированный по приведенному к единому регистру названию
+бинарный файл, который каждый процесс отображает в память (mmap).
+Страницы файла разделяются всеми процессами gunicorn средствами ОС,
+а поиск по префиксу выполняется двоичным поиском без обращения к базе.
+
+Формат файла:
+    заголовок - сигнатура и количество записей;
+    таблица записей фиксированной длины, отсортированная по ключу;
+    область строк в кодировке UTF-8, на которую ссылаются записи.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+
+MAGIC = b'FGINGIDX'
+UTF = 'UTF-8'
+
+# Сигнатура, количество записей.
+HEADER = struct.Struct('<8sI')
+# Смещение и длина ключа, id ингредиента,
+# смещение и длина названия, смещение и длина единицы измерения.
+ENTRY = struct.Struct('<IHQIHIH')
+
+
+def make_key(name: str) -> bytes:
+    """Возвращает ключ индекса для названия или префикса."""
+
+    return name.casefold().encode(UTF)
+
+
+def build_ingredient_index(path=None):
+    """Строит файл индекса по текущим данным таблицы ингредиентов.
+
+    Файл записывается во временный и атомарно подменяет прежний,
+    поэтому читающие процессы всегда видят целостный индекс.
+    """
+
+    from recipes.models import Ingredient
+
+    path = path or settings.INGREDIENT_INDEX_PATH
+    rows = sorted(
+        (make_key(name), pk, name.encode(UTF), unit.encode(UTF))
+        for pk, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator()
+    )
+
+    offset = HEADER.size + ENTRY.size * len(rows)
+    entries, strings = [], []
+    for key, pk, name, unit in rows:
+        key_offset = offset
+        name_offset = key_offset + len(key)
+        unit_offset = name_offset + len(name)
+        offset = unit_offset + len(unit)
+        entries.append(
+            ENTRY.pack(
+                key_offset,
+                len(key),
+                pk,
+                name_offset,
+                len(name),
+                unit_offset,
+                len(unit),
+            )
+        )
+        strings.extend((key, name, unit))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(rows)))
+            file.writelines(entries)
+            file.writelines(strings)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def invalidate_ingredient_index(path=None):
+    """Удаляет файл индекса.
+
+    Индекс будет перестроен при следующем поиске в любом из процессов,
+    поэтому массовые изменения ингредиентов не вызывают
+    многократной пересборки.
+    """
+
+    try:
+        os.remove(path or settings.INGREDIENT_INDEX_PATH)
+    except FileNotFoundError:
+        pass
+
+
+class IngredientIndex:
+    """Отображенный в память индекс ингредиентов.
+
+    При каждом поиске проверяет, не был ли файл пересобран другим
+    процессом, и при необходимости отображает его заново.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._stat = None
+        self._count = 0
+
+    def get_path(self):
+        return self.path or settings.INGREDIENT_INDEX_PATH
+
+    def _file_stat(self, path):
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _open(self):
+        """Возвращает актуальное отображение файла индекса и число записей.
+
+        Если файл отсутствует, строит его.
+        """
+
+        path = self.get_path()
+        try:
+            stat = self._file_stat(path)
+        except FileNotFoundError:
+            build_ingredient_index(path)
+            stat = self._file_stat(path)
+
+        with self._lock:
+            if stat != self._stat:
+                with open(path, 'rb') as file:
+                    index_mmap = mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                magic, count = HEADER.unpack_from(index_mmap, 0)
+                if magic != MAGIC:
+                    index_mmap.close()
+                    raise ValueError(f'{path} не является индексом.')
+                self._mmap, self._stat, self._count = (
+                    index_mmap,
+                    stat,
+                    count,
+                )
+            return self._mmap, self._count
+
+    def _entry(self, index_mmap, position):
+        return ENTRY.unpack_from(
+            index_mmap, HEADER.size + ENTRY.size * position
+        )
+
+    def _key(self, index_mmap, position):
+        key_offset, key_length, *_ = self._entry(index_mmap, position)
+        return index_mmap[key_offset:key_offset + key_length]
+
+    def search(self, prefix: str) -> list:
+        """Возвращает ингредиенты, название которых начинается с prefix,
+        без учета регистра, упорядоченные по id."""
+
+        index_mmap, count = self._open()
+        prefix_key = make_key(prefix)
+
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(index_mmap, middle) < prefix_key:
+                low = middle + 1
+            else:
+                high = middle
+
+        result = []
+        for position in range(low, count):
+            (
+                key_offset,
+                key_length,
+                pk,
+                name_offset,
+                name_length,
+                unit_offset,
+                unit_length,
+            ) = self._entry(index_mmap, position)
+            key = index_mmap[key_offset:key_offset + key_length]
+            if not key.startswith(prefix_key):
+                break
+            result.append(
+                {
+                    'id': pk,
+                    'name': index_mmap[
+                        name_offset:name_offset + name_length
+                    ].decode(UTF),
+                    'measurement_unit': index_mmap[
+                        unit_offset:unit_offset + unit_length
+                    ].decode(UTF),
+                }
+            )
+        result.sort(key=lambda ingredient: ingredient['id'])
+        return result
+
+
+ingredient_index = IngredientIndex()
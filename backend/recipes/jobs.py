@@ -0,0 +1,215 @@
+"""Модуль фоновых задач.
+
+Задачи хранятся в таблице Job и выполняются командой run_jobs
+без внешнего брокера. Обработчик задачи регистрируется декоратором
+register_job и получает параметры задачи именованными аргументами.
+
+Задача выполняется хотя бы один раз: при ошибке она повторяется
+с увеличивающейся задержкой, а если обработчик завершился, не успев
+отметить задачу, она снова становится доступной по истечении
+времени блокировки. Поэтому обработчики должны быть идемпотентными.
+"""
+
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+
+from recipes.models import Job
+
+registry = {}
+_periodic_keys = {}
+
+
+def register_job(name: str):
+    """Регистрирует функцию обработчиком задач с именем name."""
+
+    def decorator(handler):
+        registry[name] = handler
+        return handler
+
+    return decorator
+
+
+def enqueue(name: str, key: str = None, run_after=None, **payload) -> Job:
+    """Ставит задачу в очередь.
+
+    Если задача с ключом идемпотентности key уже есть в таблице,
+    новая задача не создается и возвращается существующая.
+    """
+
+    if name not in registry:
+        raise ValueError(f'Задача {name} не зарегистрирована.')
+    defaults = {
+        'name': name,
+        'payload': payload,
+        'run_after': run_after or timezone.now(),
+        'max_attempts': settings.JOBS_MAX_ATTEMPTS,
+    }
+    if key is None:
+        return Job.objects.create(**defaults)
+    return Job.objects.get_or_create(key=key, defaults=defaults)[0]
+
+
+def get_worker_name() -> str:
+    return f'{socket.gethostname()}:{threading.get_ident()}'
+
+
+def get_claimable(now):
+    """Условие задач, доступных для выполнения."""
+
+    return Q(status=Job.Status.PENDING, run_after__lte=now) | Q(
+        status=Job.Status.RUNNING, locked_until__lt=now
+    )
+
+
+def claim_job(worker: str):
+    """Берет первую доступную задачу и блокирует ее.
+
+    В PostgreSQL кандидат выбирается с SKIP LOCKED, поэтому обработчики
+    не ждут друг друга; захват подтверждается условным UPDATE.
+    """
+
+    now = timezone.now()
+    claimable = get_claimable(now)
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('run_after')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = Job.objects.filter(claimable, pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now
+            + timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT),
+            worker=worker,
+            started_at=now,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def run_job(job: Job):
+    """Выполняет захваченную задачу и сохраняет результат.
+
+    Результат не сохраняется, если задачу после истечения блокировки
+    уже взял другой обработчик.
+    """
+
+    owned = Job.objects.filter(
+        pk=job.pk, worker=job.worker, attempts=job.attempts
+    )
+    try:
+        registry[job.name](**job.payload)
+    except Exception:
+        now = timezone.now()
+        failed = job.attempts >= job.max_attempts
+        owned.update(
+            status=Job.Status.FAILED if failed else Job.Status.PENDING,
+            run_after=now + get_retry_delay(job.attempts),
+            locked_until=None,
+            error=traceback.format_exc(),
+            finished_at=now if failed else None,
+        )
+        return False
+    owned.update(
+        status=Job.Status.DONE,
+        locked_until=None,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_next_job(worker: str = None):
+    """Выполняет одну доступную задачу.
+
+    Возвращает None, если доступных задач нет, иначе признак успеха.
+    """
+
+    job = claim_job(worker or get_worker_name())
+    if job is None:
+        return None
+    return run_job(job)
+
+
+def enqueue_periodic_jobs(now=None):
+    """Ставит в очередь периодические задачи из JOBS_PERIODIC.
+
+    Ключ задачи включает номер интервала, поэтому при нескольких
+    запущенных run_jobs задача ставится один раз за интервал.
+    """
+
+    timestamp = int((now or timezone.now()).timestamp())
+    for name, interval in settings.JOBS_PERIODIC.items():
+        key = f'{name}:{timestamp // interval}'
+        if _periodic_keys.get(name) != key:
+            enqueue(name, key=key)
+            _periodic_keys[name] = key
+
+
+def get_job_metrics() -> dict:
+    """Глубина очереди и задержки выполнения задач.
+
+    Задержка ожидания - время от run_after до начала последней попытки,
+    длительность - время выполнения, по задачам, завершенным
+    за последний час.
+    """
+
+    now = timezone.now()
+    depth = {}
+    for name, status, count in (
+        Job.objects.values('name', 'status')
+        .annotate(count=Count('pk'))
+        .values_list('name', 'status', 'count')
+        .order_by()
+    ):
+        depth.setdefault(name, {})[status] = count
+    oldest = Job.objects.filter(
+        status=Job.Status.PENDING, run_after__lte=now
+    ).aggregate(oldest=Min('run_after'))['oldest']
+    latency = Job.objects.filter(
+        status=Job.Status.DONE, finished_at__gte=now - timedelta(hours=1)
+    ).aggregate(
+        count=Count('pk'),
+        wait_avg=Avg(F('started_at') - F('run_after')),
+        wait_max=Max(F('started_at') - F('run_after')),
+        duration_avg=Avg(F('finished_at') - F('started_at')),
+        duration_max=Max(F('finished_at') - F('started_at')),
+    )
+    return {
+        'depth': depth,
+        'oldest_pending_seconds': (
+            (now - oldest).total_seconds() if oldest else 0
+        ),
+        'done_last_hour': latency.pop('count'),
+        **{
+            f'{name}_seconds': value.total_seconds() if value else 0
+            for name, value in latency.items()
+        },
+    }
+
+
+@register_job('cleanup_jobs')
+def cleanup_jobs():
+    """Удаляет выполненные задачи старше JOBS_RETENTION дней."""
+
+    Job.objects.filter(
+        status=Job.Status.DONE,
+        finished_at__lt=timezone.now()
+        - timedelta(days=settings.JOBS_RETENTION),
+    ).delete()
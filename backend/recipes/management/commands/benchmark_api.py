@@ -0,0 +1,416 @@
+"""Модуль административной команды нагрузочного замера API."""
+
+import json
+import random
+import threading
+import time
+from itertools import count
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.urls import router
+from recipes.management.commands.benchmark_search import percentile
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag,
+)
+from users.models import User
+
+# Сценарии: имя маршрута api.urls и шаги одной итерации: метод, адрес
+# и, для пакетных действий, параметр с телом запроса. Переключатели
+# добавляются и сразу удаляются, поэтому данные после замера
+# не меняются. Изменение рецептов не замеряется: оно создает
+# фоновые задачи обработки изображений.
+SCENARIOS = (
+    ('api-root', (('GET', '/api/'),)),
+    ('tags-list', (('GET', '/api/tags/'),)),
+    ('tags-detail', (('GET', '/api/tags/{tag_id}/'),)),
+    ('ingredients-list', (('GET', '/api/ingredients/?name={prefix}'),)),
+    ('ingredients-detail', (('GET', '/api/ingredients/{ingredient_id}/'),)),
+    ('recipes-list', (('GET', '/api/recipes/'),)),
+    ('recipes-list', (('GET', '/api/recipes/?cursor='),)),
+    ('recipes-list', (('GET', '/api/recipes/?author={author_id}'),)),
+    ('recipes-list', (('GET', '/api/recipes/?tags={tag_slug}'),)),
+    ('recipes-list', (('GET', '/api/recipes/?is_favorited=1'),)),
+    ('recipes-list', (('GET', '/api/recipes/?search={word}'),)),
+    ('recipes-detail', (('GET', '/api/recipes/{recipe_id}/'),)),
+    ('recipes-feed', (('GET', '/api/recipes/feed/'),)),
+    (
+        'recipes-download-shopping-cart',
+        (('GET', '/api/recipes/download_shopping_cart/?format=txt'),),
+    ),
+    (
+        'recipes-favorite',
+        (
+            ('POST', '/api/recipes/{new_recipe_id}/favorite/'),
+            ('DELETE', '/api/recipes/{new_recipe_id}/favorite/'),
+        ),
+    ),
+    (
+        'recipes-shopping-cart',
+        (
+            ('POST', '/api/recipes/{new_recipe_id}/shopping_cart/'),
+            ('DELETE', '/api/recipes/{new_recipe_id}/shopping_cart/'),
+        ),
+    ),
+    (
+        'recipes-bulk-favorite',
+        (
+            ('POST', '/api/recipes/bulk_favorite/', 'new_recipe_ids'),
+            ('DELETE', '/api/recipes/bulk_favorite/', 'new_recipe_ids'),
+        ),
+    ),
+    (
+        'recipes-bulk-shopping-cart',
+        (
+            ('POST', '/api/recipes/bulk_shopping_cart/', 'new_recipe_ids'),
+            ('DELETE', '/api/recipes/bulk_shopping_cart/', 'new_recipe_ids'),
+        ),
+    ),
+    (
+        'users-subscribe',
+        (
+            ('POST', '/api/users/{new_author_id}/subscribe/'),
+            ('DELETE', '/api/users/{new_author_id}/subscribe/'),
+        ),
+    ),
+    (
+        'users-bulk-subscribe',
+        (
+            ('POST', '/api/users/bulk_subscribe/', 'new_author_ids'),
+            ('DELETE', '/api/users/bulk_subscribe/', 'new_author_ids'),
+        ),
+    ),
+    (
+        'users-subscriptions',
+        (('GET', '/api/users/subscriptions/?recipes_limit=3'),),
+    ),
+    ('recipes-cache-stats', (('GET', '/api/recipes/cache_stats/'),)),
+    ('jobs-metrics', (('GET', '/api/jobs/metrics/'),)),
+)
+ADMIN_SCENARIOS = ('recipes-cache-stats', 'jobs-metrics')
+# Кандидатов для переключателей на пользователя.
+CANDIDATES = 1000
+# Id в теле пакетного действия.
+BULK_SIZE = 20
+
+
+def sample(rng, queryset) -> list:
+    values = list(queryset.order_by('pk'))
+    return rng.sample(values, min(CANDIDATES, len(values)))
+
+
+class Worker:
+    """Клиент API от имени одного пользователя."""
+
+    def __init__(self, user, admin, rng):
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(admin)
+        self.rng = rng
+        self.recipe_ids = sample(
+            rng, Recipe.objects.values_list('pk', flat=True)
+        )
+        self.new_recipe_ids = list(
+            set(self.recipe_ids)
+            - set(
+                Favorite.objects.filter(user=user).values_list(
+                    'recipe_id', flat=True
+                )
+            )
+            - set(
+                ShoppingCart.objects.filter(user=user).values_list(
+                    'recipe_id', flat=True
+                )
+            )
+        )
+        self.author_ids = sample(
+            rng,
+            User.objects.filter(recipes_count__gt=0).values_list(
+                'pk', flat=True
+            ),
+        )
+        self.new_author_ids = list(
+            set(self.author_ids)
+            - set(
+                Subscription.objects.filter(user=user).values_list(
+                    'author_id', flat=True
+                )
+            )
+            - {user.pk}
+        )
+        self.tags = list(Tag.objects.values_list('pk', 'slug'))
+        self.ingredients = sample(
+            rng, Ingredient.objects.values_list('pk', 'name')
+        )
+        self.words = [
+            name.split()[0] for _, name in self.ingredients if name.split()
+        ]
+
+    def get_parameters(self) -> dict:
+        rng = self.rng
+        tag_id, tag_slug = rng.choice(self.tags)
+        ingredient_id, name = rng.choice(self.ingredients)
+        return {
+            'tag_id': tag_id,
+            'tag_slug': tag_slug,
+            'ingredient_id': ingredient_id,
+            'prefix': name[:3],
+            'word': rng.choice(self.words),
+            'recipe_id': rng.choice(self.recipe_ids),
+            'author_id': rng.choice(self.author_ids),
+            'new_recipe_id': rng.choice(self.new_recipe_ids),
+            'new_author_id': rng.choice(self.new_author_ids),
+            'new_recipe_ids': {
+                'ids': rng.sample(
+                    self.new_recipe_ids,
+                    min(BULK_SIZE, len(self.new_recipe_ids)),
+                )
+            },
+            'new_author_ids': {
+                'ids': rng.sample(
+                    self.new_author_ids,
+                    min(BULK_SIZE, len(self.new_author_ids)),
+                )
+            },
+        }
+
+    def run(self, name, steps) -> list:
+        """Выполняет итерацию сценария. Возвращает метод, задержку
+        и признак ошибки каждого шага."""
+
+        client = self.admin_client if name in ADMIN_SCENARIOS else self.client
+        parameters = self.get_parameters()
+        results = []
+        for method, url, *body in steps:
+            started = time.perf_counter()
+            response = getattr(client, method.lower())(
+                url.format(**parameters),
+                parameters[body[0]] if body else None,
+                format='json',
+            )
+            results.append(
+                (
+                    method,
+                    time.perf_counter() - started,
+                    response.status_code >= 400,
+                )
+            )
+        return results
+
+
+class Command(BaseCommand):
+    """Административная команда для замера задержки и пропускной
+    способности эндпоинтов API.
+
+    Запросы выполняются в процессе, без сети, несколькими потоками
+    на каждом уровне параллельности; у каждого потока свой
+    пользователь и свое подключение к базе данных. Результаты
+    выводятся в JSON и могут сравниваться с результатами предыдущего
+    запуска.
+    """
+
+    help = (
+        'Замеряет p50/p95/p99 задержки и количество запросов в секунду '
+        'для эндпоинтов API и выводит результаты в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            default='1,4,16',
+            help='Уровни параллельности через запятую.',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Итераций сценария на каждом уровне параллельности.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Итераций сценария для прогрева перед замером.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            help='Замерять только сценарии маршрутов с этим именем.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для результатов.')
+        parser.add_argument(
+            '--baseline',
+            help='Файл результатов предыдущего запуска для сравнения.',
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            help=(
+                'Допустимый относительный рост p95 по сравнению '
+                'с --baseline, например 0.2.'
+            ),
+        )
+
+    def get_workers(self, number, rng) -> list:
+        admin = User.objects.filter(is_staff=True).first()
+        users = sample(
+            rng,
+            User.objects.filter(
+                is_active=True, subscribes__isnull=False
+            ).distinct(),
+        )[:number]
+        if admin is None or not users:
+            raise CommandError(
+                'Нужна база с данными нагрузочных испытаний '
+                'и администратор.'
+            )
+        return [
+            Worker(
+                users[position % len(users)],
+                admin,
+                random.Random(rng.random()),
+            )
+            for position in range(number)
+        ]
+
+    def measure(self, name, steps, workers, iterations) -> dict:
+        """Выполняет итерации сценария в потоках, по одному
+        на исполнителя."""
+
+        latencies = {method: [] for method, *_ in steps}
+        errors = {method: 0 for method, *_ in steps}
+        counter, lock = count(), threading.Lock()
+
+        def work(worker):
+            try:
+                while next(counter) < iterations:
+                    results = worker.run(name, steps)
+                    with lock:
+                        for method, latency, error in results:
+                            latencies[method].append(latency)
+                            errors[method] += error
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=(worker,))
+            for worker in workers
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        return {
+            method: {
+                'requests': len(values),
+                'errors': errors[method],
+                'rps': round(len(values) / seconds, 1),
+                **{
+                    f'p{percent}_ms': round(
+                        percentile(values, percent) * 1000, 2
+                    )
+                    for percent in (50, 95, 99)
+                },
+            }
+            for method, values in latencies.items()
+        }
+
+    def compare(self, results, path, max_regression) -> int:
+        """Выводит изменение p95 относительно предыдущего запуска
+        и возвращает количество превышений max_regression."""
+
+        with open(path) as file:
+            baseline = {
+                (row['url'], row['method'], row['concurrency']): row
+                for row in json.load(file)['results']
+            }
+        regressions = 0
+        for row in results:
+            previous = baseline.get(
+                (row['url'], row['method'], row['concurrency'])
+            )
+            if not previous or not previous['p95_ms']:
+                continue
+            change = row['p95_ms'] / previous['p95_ms'] - 1
+            line = (
+                f'{row["method"]} {row["url"]} x{row["concurrency"]}: '
+                f'p95 {previous["p95_ms"]} -> {row["p95_ms"]} мс '
+                f'({change:+.0%})'
+            )
+            if max_regression is not None and change > max_regression:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        scenarios = [
+            (name, steps)
+            for name, steps in SCENARIOS
+            if not options['scenario'] or name in options['scenario']
+        ]
+        covered = {name for name, _ in SCENARIOS}
+        for route in sorted({url.name for url in router.urls} - covered):
+            self.stderr.write(f'Маршрут {route} не замеряется.')
+
+        rng = random.Random(options['seed'])
+        results = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            workers = self.get_workers(max(levels), rng)
+            for name, steps in scenarios:
+                self.measure(name, steps, workers[:1], options['warmup'])
+                for level in levels:
+                    measured = self.measure(
+                        name, steps, workers[:level], options['iterations']
+                    )
+                    for method, url, *_ in steps:
+                        row = {
+                            'endpoint': name,
+                            'method': method,
+                            'url': url,
+                            'concurrency': level,
+                            **measured[method],
+                        }
+                        results.append(row)
+                        self.stderr.write(
+                            f'{method} {url} x{level}: '
+                            f'p50 {row["p50_ms"]} мс, '
+                            f'p95 {row["p95_ms"]} мс, {row["rps"]} rps'
+                        )
+
+        report = {
+            'vendor': connection.vendor,
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+        if options['baseline']:
+            regressions = self.compare(
+                results, options['baseline'], options['max_regression']
+            )
+            if regressions:
+                raise CommandError(
+                    f'Рост p95 больше допустимого: {regressions}.'
+                )
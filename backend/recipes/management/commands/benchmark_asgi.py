@@ -0,0 +1,327 @@
+"""Модуль административной команды сравнения ASGI и WSGI под нагрузкой."""
+
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.benchmark_search import percentile
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+SERVERS = ('wsgi', 'asgi')
+URLS = (
+    '/api/tags/',
+    '/api/tags/{tag_id}/',
+    '/api/ingredients/?name={prefix}',
+    '/api/ingredients/{ingredient_id}/',
+    '/api/recipes/',
+    '/api/recipes/{recipe_id}/',
+)
+
+
+def summarize(latencies, errors, seconds) -> dict:
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / seconds, 1),
+        **{
+            f'p{percent}_ms': round(percentile(latencies, percent) * 1000, 2)
+            for percent in (50, 95, 99)
+        },
+    }
+
+
+class Command(BaseCommand):
+    """Административная команда для сравнения задержки эндпоинтов
+    чтения под синхронным WSGI и асинхронным ASGI.
+
+    Клиенты моделируются в процессе: каждый запрашивает адреса
+    по кругу и читает ответ --client-delay миллисекунд, как медленный
+    клиент. Синхронный сервер обслуживает не больше --workers
+    запросов одновременно, и воркер занят, пока клиент читает ответ.
+    ASGI-приложение обслуживает всех клиентов в одном цикле событий,
+    а код представлений выполняется в пуле из --threads потоков.
+
+    Каждый сервер замеряется в отдельном процессе, потому что
+    асинхронные представления включаются при загрузке маршрутов.
+    """
+
+    help = (
+        'Сравнивает p50/p95/p99 задержки и количество запросов в секунду '
+        'эндпоинтов чтения под WSGI и ASGI на уровнях параллельности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            default='4,16,64',
+            help='Количество одновременных клиентов через запятую.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=300,
+            help='Запросов на каждом уровне параллельности.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество синхронных воркеров WSGI.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Размер пула потоков ASGI для синхронного кода.',
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=50,
+            help='Время чтения ответа клиентом, мс.',
+        )
+        parser.add_argument(
+            '--server',
+            choices=SERVERS,
+            help='Замерить только этот сервер в текущем процессе.',
+        )
+        parser.add_argument('--output', help='Файл для результатов.')
+
+    def get_urls(self) -> list:
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        recipe = Recipe.objects.order_by('-pk').first()
+        if not (tag and ingredient and recipe):
+            raise CommandError('Нужна база с тестовыми данными.')
+        return [
+            url.format(
+                tag_id=tag.pk,
+                ingredient_id=ingredient.pk,
+                prefix=quote(ingredient.name[:3]),
+                recipe_id=recipe.pk,
+            )
+            for url in URLS
+        ]
+
+    def get_token(self) -> str:
+        user = (
+            User.objects.filter(is_active=True, subscribes__isnull=False)
+            .order_by('pk')
+            .first()
+        )
+        if user is None:
+            raise CommandError('Нужен пользователь с подписками.')
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def run_wsgi(self, urls, token, concurrency, options) -> dict:
+        from django.core.wsgi import get_wsgi_application
+
+        application = get_wsgi_application()
+        workers = threading.Semaphore(options['workers'])
+        delay = options['client_delay'] / 1000
+        counter, lock = count(), threading.Lock()
+        latencies, errors = [], [0]
+
+        def request(url):
+            parts = urlsplit(url)
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': parts.path,
+                'QUERY_STRING': parts.query,
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'REMOTE_ADDR': '127.0.0.1',
+                'HTTP_AUTHORIZATION': f'Token {token}',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+            }
+            statuses = []
+            with workers:
+                result = application(
+                    environ, lambda status, headers: statuses.append(status)
+                )
+                try:
+                    b''.join(result)
+                    time.sleep(delay)
+                finally:
+                    result.close()
+            return int(statuses[0].split()[0])
+
+        def client():
+            while True:
+                number = next(counter)
+                if number >= options['requests']:
+                    return
+                started = time.perf_counter()
+                status = request(urls[number % len(urls)])
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    errors[0] += status >= 400
+
+        threads = [
+            threading.Thread(target=client) for _ in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(latencies, errors[0], time.perf_counter() - started)
+
+    def run_asgi(self, urls, token, concurrency, options) -> dict:
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+        delay = options['client_delay'] / 1000
+        counter = count()
+        latencies, errors = [], [0]
+
+        async def request(url):
+            parts = urlsplit(url)
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': parts.path,
+                'query_string': parts.query.encode(),
+                'headers': [
+                    (b'host', b'testserver'),
+                    (b'authorization', f'Token {token}'.encode()),
+                ],
+                'client': ('127.0.0.1', 0),
+                'server': ('testserver', 80),
+            }
+            statuses = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(delay)
+
+            await application(scope, receive, send)
+            return statuses[0]
+
+        async def client():
+            while True:
+                number = next(counter)
+                if number >= options['requests']:
+                    return
+                started = time.perf_counter()
+                status = await request(urls[number % len(urls)])
+                latencies.append(time.perf_counter() - started)
+                errors[0] += status >= 400
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=options['threads'])
+            )
+            started = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return time.perf_counter() - started
+
+        seconds = asyncio.run(main())
+        return summarize(latencies, errors[0], seconds)
+
+    def measure(self, server, options) -> list:
+        """Замеряет сервер в текущем процессе."""
+
+        if settings.ASYNC_READ_VIEWS != (server == 'asgi'):
+            raise CommandError(
+                f'Для {server} нужен ASYNC_READ_VIEWS='
+                f'{int(server == "asgi")}.'
+            )
+        urls = self.get_urls()
+        token = self.get_token()
+        run = self.run_asgi if server == 'asgi' else self.run_wsgi
+        results = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for concurrency in options['concurrency']:
+                result = run(urls, token, concurrency, options)
+                results.append(result)
+                self.stderr.write(
+                    f'{server} x{concurrency}: p50 {result["p50_ms"]} мс, '
+                    f'p95 {result["p95_ms"]} мс, {result["rps"]} rps'
+                )
+        return results
+
+    def measure_in_subprocess(self, server, options) -> list:
+        arguments = [
+            sys.executable,
+            str(settings.BASE_DIR / 'manage.py'),
+            'benchmark_asgi',
+            f'--server={server}',
+            f'--concurrency={",".join(map(str, options["concurrency"]))}',
+            f'--requests={options["requests"]}',
+            f'--workers={options["workers"]}',
+            f'--threads={options["threads"]}',
+            f'--client-delay={options["client_delay"]}',
+        ]
+        environment = dict(
+            os.environ, ASYNC_READ_VIEWS=str(int(server == 'asgi'))
+        )
+        process = subprocess.run(
+            arguments, env=environment, stdout=subprocess.PIPE, check=True
+        )
+        return json.loads(process.stdout)
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        options['concurrency'] = [
+            int(level) for level in options['concurrency'].split(',')
+        ]
+        if options['server']:
+            results = self.measure(options['server'], options)
+            self.stdout.write(json.dumps(results))
+            return
+
+        measured = {
+            server: self.measure_in_subprocess(server, options)
+            for server in SERVERS
+        }
+        report = {
+            'urls': list(URLS),
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'client_delay_ms': options['client_delay'],
+            'results': [
+                {
+                    'concurrency': concurrency,
+                    **{
+                        server: measured[server][position]
+                        for server in SERVERS
+                    },
+                }
+                for position, concurrency in enumerate(
+                    options['concurrency']
+                )
+            ],
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,174 @@
+"""Модуль административной команды замера скорости поиска рецептов."""
+
+import json
+import random
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.search import index_recipes, search_recipes
+from users.models import User
+
+BATCH_SIZE = 1000
+WORDS_IN_NAME = 3
+WORDS_IN_TEXT = 40
+INGREDIENTS_IN_RECIPE = 6
+
+
+def percentile(values: list, percent: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+class Command(BaseCommand):
+    """Административная команда для замера задержки полнотекстового
+    поиска в сравнении с поиском подстроки.
+
+    Недостающие рецепты генерируются и удаляются после замера:
+    все выполняется в транзакции, которая откатывается.
+    """
+
+    help = (
+        'Замеряет задержку поиска рецептов на заданном количестве '
+        'рецептов и выводит перцентили в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100000,
+            help='Количество рецептов в базе при замере.',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Количество поисковых запросов.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=8,
+            help='Размер страницы результатов.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def generate_recipes(self, count, rng, words):
+        """Генерирует рецепты из слов названий ингредиентов."""
+
+        author_ids = list(User.objects.values_list('pk', flat=True))
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not author_ids or not ingredient_ids:
+            raise CommandError('Нужны пользователи и ингредиенты.')
+        last_id = Recipe.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        for start in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - start)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    name=' '.join(rng.sample(words, WORDS_IN_NAME))[:200],
+                    text=' '.join(rng.choices(words, k=WORDS_IN_TEXT)),
+                    cooking_time=rng.randint(5, 180),
+                    author_id=rng.choice(author_ids),
+                )
+                for _ in range(size)
+            )
+            recipe_ids = list(
+                Recipe.objects.filter(pk__gt=last_id).values_list(
+                    'pk', flat=True
+                )
+            )
+            last_id = max(recipe_ids)
+            if tag_ids:
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(
+                        recipe_id=recipe_id, tag_id=rng.choice(tag_ids)
+                    )
+                    for recipe_id in recipe_ids
+                )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, INGREDIENTS_IN_RECIPE
+                )
+            )
+            index_recipes(recipe_ids)
+
+    def measure(self, queries, make_queryset, limit) -> dict:
+        """Перцентили задержки первой страницы с общим количеством,
+        как в списке рецептов API.
+        """
+
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            queryset = make_queryset(query)
+            queryset.count()
+            list(queryset[:limit].values_list('pk', flat=True))
+            latencies.append((time.perf_counter() - started) * 1000)
+        return {
+            f'p{percent}_ms': round(percentile(latencies, percent), 2)
+            for percent in (50, 95, 99)
+        }
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        rng = random.Random(options['seed'])
+        words = sorted(
+            {
+                word
+                for name in Ingredient.objects.values_list('name', flat=True)
+                for word in name.lower().split()
+                if len(word) > 3 and word.isalpha()
+            }
+        )
+        if len(words) < WORDS_IN_TEXT:
+            raise CommandError('Недостаточно ингредиентов для генерации.')
+        queries = [
+            ' '.join(
+                word[:rng.randint(4, len(word))]
+                for word in rng.sample(words, rng.choice((1, 1, 2)))
+            )
+            for _ in range(options['queries'])
+        ]
+
+        def substring(query):
+            condition = Q()
+            for word in query.split():
+                condition &= Q(name__icontains=word) | Q(text__icontains=word)
+            return Recipe.objects.filter(condition)
+
+        with transaction.atomic():
+            missing = options['recipes'] - Recipe.objects.count()
+            if missing > 0:
+                started = time.monotonic()
+                self.generate_recipes(missing, rng, words)
+                self.stdout.write(
+                    f'Сгенерировано рецептов: {missing} за '
+                    f'{time.monotonic() - started:.1f} с.'
+                )
+            result = {
+                'vendor': connection.vendor,
+                'recipes': Recipe.objects.count(),
+                'queries': len(queries),
+                'search': self.measure(
+                    queries,
+                    lambda query: search_recipes(Recipe.objects.all(), query),
+                    options['limit'],
+                ),
+                'icontains': self.measure(
+                    queries, substring, options['limit']
+                ),
+            }
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(result, indent=2))
@@ -0,0 +1,146 @@
+"""Модуль административной команды проверки пула подключений."""
+
+import functools
+import threading
+import time
+from contextlib import closing
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from foodgram_backend.db_pool import (
+    DEFAULTS,
+    ConnectionPool,
+    PooledDatabaseWrapperMixin,
+    PoolTimeout,
+)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Административная команда для проверки пула подключений
+    под нагрузкой.
+
+    Потоки выполняют запросы через ORM, и пул базы данных default
+    должен выдавать каждое подключение только одному потоку
+    и не открывать подключений больше MAX_SIZE. Затем на отдельном
+    пуле из подключений той же базы проверяются отказ по истечении
+    времени ожидания и замена сломанного подключения.
+    """
+
+    help = (
+        'Проверяет пул подключений к базе данных из нескольких потоков '
+        'и выводит его состояние.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=32,
+            help='Количество потоков.',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Запросов на поток.',
+        )
+
+    def check_exclusive(self, threads, iterations) -> list:
+        """Выполняет запросы через ORM и возвращает ошибки."""
+
+        holders, errors = {}, []
+        lock = threading.Lock()
+
+        def work():
+            try:
+                for _ in range(iterations):
+                    connection.ensure_connection()
+                    raw = connection.connection
+                    with lock:
+                        if raw in holders.values():
+                            errors.append(
+                                'Подключение выдано двум потокам.'
+                            )
+                        holders[threading.get_ident()] = raw
+                    Recipe.objects.exists()
+                    with lock:
+                        del holders[threading.get_ident()]
+                    connection.close()
+            except Exception as error:
+                errors.append(repr(error))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stats = connection.get_pool().get_stats()
+        if stats['created'] - stats['discarded'] > stats['max_size']:
+            errors.append('Открыто подключений больше MAX_SIZE.')
+        return errors
+
+    def check_timeout(self, connect) -> list:
+        pool = ConnectionPool(dict(DEFAULTS, MAX_SIZE=2, TIMEOUT=0.2))
+        held = [pool.acquire(connect)[0] for _ in range(2)]
+        started = time.monotonic()
+        errors = []
+        try:
+            pool.acquire(connect)
+            errors.append('Пул выдал подключение сверх MAX_SIZE.')
+        except PoolTimeout:
+            if time.monotonic() - started < pool.timeout:
+                errors.append('Пул отказал раньше TIMEOUT.')
+        for raw in held:
+            pool.release(raw, reusable=False)
+        return errors
+
+    def check_broken(self, connect) -> list:
+        pool = ConnectionPool(dict(DEFAULTS, HEALTH_CHECK_INTERVAL=0))
+        raw, _ = pool.acquire(connect)
+        pool.release(raw, reusable=True)
+        # Подключение ломается, пока лежит в пуле.
+        raw.close()
+        replacement, _ = pool.acquire(connect)
+        errors = []
+        if replacement is raw:
+            errors.append('Пул выдал сломанное подключение.')
+        else:
+            with closing(replacement.cursor()) as cursor:
+                cursor.execute('SELECT 1')
+        pool.release(replacement, reusable=False)
+        return errors
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        if not isinstance(
+            connections[DEFAULT_DB_ALIAS], PooledDatabaseWrapperMixin
+        ):
+            raise CommandError(
+                'База данных default подключена без пула, '
+                'нужен движок foodgram_backend.db_pool.'
+            )
+
+        connect = functools.partial(
+            super(
+                PooledDatabaseWrapperMixin, connections[DEFAULT_DB_ALIAS]
+            ).get_new_connection,
+            connection.get_connection_params(),
+        )
+        errors = self.check_exclusive(
+            options['threads'], options['iterations']
+        )
+        errors += self.check_timeout(connect)
+        errors += self.check_broken(connect)
+
+        for name, value in connection.get_pool().get_stats().items():
+            self.stdout.write(f'{name}: {value}')
+        if errors:
+            for error in sorted(set(errors)):
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError(f'Найдено ошибок пула: {len(set(errors))}.')
+        self.stdout.write(self.style.SUCCESS('Пул подключений исправен.'))
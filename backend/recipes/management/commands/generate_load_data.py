@@ -0,0 +1,334 @@
+"""Модуль административной команды генерации данных для нагрузочных
+испытаний."""
+
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.management.commands.load_test_data import (
+    INGREDIENT,
+    INGREDIENT_FIELDS,
+    PATH,
+    TAGS,
+    iter_batches,
+    read_csv,
+    rebuild_derived_data,
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag,
+)
+from users.models import User
+
+BATCH_SIZE = 1000
+PASSWORD = 'load-test-password'
+WORDS_IN_NAME = 3
+WORDS_IN_TEXT = 40
+# Параметр распределения Парето количества избранного и подписок
+# пользователя: при 2 у немногих пользователей связей в разы больше
+# среднего.
+TAIL_ALPHA = 2.0
+
+
+class ZipfSampler:
+    """Выбор элементов по закону Ципфа: вероятность k-го по популярности
+    элемента пропорциональна 1 / k ** exponent.
+
+    Порядок популярности задается случайной перестановкой элементов.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(
+            accumulate(
+                1 / rank**exponent for rank in range(1, len(self.items) + 1)
+            )
+        )
+        self.rng = rng
+
+    def sample(self, count: int) -> set:
+        """Возвращает до count различных элементов."""
+
+        count = min(count, len(self.items))
+        chosen = set()
+        for _ in range(3):
+            chosen.update(
+                self.rng.choices(
+                    self.items,
+                    cum_weights=self.cum_weights,
+                    k=count - len(chosen),
+                )
+            )
+            if len(chosen) == count:
+                break
+        return chosen
+
+
+def get_tail_count(rng, mean: float) -> int:
+    """Количество связей пользователя с распределением Парето
+    и заданным средним."""
+
+    scale = mean * (TAIL_ALPHA - 1) / TAIL_ALPHA
+    return int(scale * rng.paretovariate(TAIL_ALPHA))
+
+
+class Command(BaseCommand):
+    """Административная команда для генерации данных нагрузочных
+    испытаний.
+
+    Авторство рецептов, избранное, списки покупок и подписки
+    распределены по закону Ципфа: небольшая доля рецептов и авторов
+    собирает большую часть связей. Количество избранного и подписок
+    у пользователя распределено по Парето. Ингредиенты и теги
+    загружаются из файлов тестовых данных, если их нет в базе.
+    Все созданные пользователи имеют пароль load-test-password.
+    """
+
+    help = (
+        'Генерирует пользователей, рецепты, избранное, списки покупок '
+        'и подписки для нагрузочных испытаний.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Количество создаваемых пользователей.',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=10000,
+            help='Количество создаваемых рецептов.',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=float,
+            default=20,
+            help='Среднее количество избранных рецептов пользователя.',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=float,
+            default=10,
+            help='Среднее количество подписок пользователя.',
+        )
+        parser.add_argument(
+            '--shopping-cart',
+            type=float,
+            default=3,
+            help='Среднее количество рецептов в списке покупок.',
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            default=6,
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном запросе вставки.',
+        )
+
+    def report(self, label, count, started):
+        seconds = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'{label}: {count}, {seconds:.1f} с.')
+        )
+
+    def bulk_create(self, model, objects) -> int:
+        count = 0
+        for batch in iter_batches(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        return count
+
+    def load_catalogs(self):
+        """Загружает ингредиенты и теги, если их нет в базе."""
+
+        if not Ingredient.objects.exists():
+            self.bulk_create(
+                Ingredient,
+                (
+                    Ingredient(**row)
+                    for row in read_csv(
+                        f'{PATH}{INGREDIENT}', INGREDIENT_FIELDS
+                    )
+                ),
+            )
+        if not Tag.objects.exists():
+            self.bulk_create(
+                Tag, (Tag(**row) for row in read_csv(f'{PATH}{TAGS}'))
+            )
+
+    def generate_users(self, count) -> list:
+        """Создает пользователей и возвращает их id."""
+
+        started = time.monotonic()
+        last_id = User.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        password = make_password(PASSWORD)
+        prefix = f'load{last_id + 1}'
+        self.bulk_create(
+            User,
+            (
+                User(
+                    username=f'{prefix}_{number}',
+                    email=f'{prefix}_{number}@example.com',
+                    first_name='Пользователь',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(count)
+            ),
+        )
+        user_ids = list(
+            User.objects.filter(pk__gt=last_id).values_list('pk', flat=True)
+        )
+        self.report('Пользователи', len(user_ids), started)
+        return user_ids
+
+    def generate_recipes(self, count, authors, options) -> list:
+        """Создает рецепты с тегами и ингредиентами, возвращает их id."""
+
+        started = time.monotonic()
+        rng = self.rng
+        ingredients = ZipfSampler(
+            Ingredient.objects.values_list('pk', flat=True),
+            options['zipf'],
+            rng,
+        )
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        words = sorted(
+            {
+                word
+                for name in Ingredient.objects.values_list('name', flat=True)
+                for word in name.lower().split()
+                if len(word) > 3 and word.isalpha()
+            }
+        )
+        recipe_ids = []
+        last_id = Recipe.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            author_ids = rng.choices(
+                authors.items, cum_weights=authors.cum_weights, k=size
+            )
+            Recipe.objects.bulk_create(
+                Recipe(
+                    name=' '.join(rng.sample(words, WORDS_IN_NAME))[:200],
+                    text=' '.join(rng.choices(words, k=WORDS_IN_TEXT)),
+                    cooking_time=rng.randint(5, 180),
+                    author_id=author_id,
+                )
+                for author_id in author_ids
+            )
+            batch = list(
+                Recipe.objects.filter(pk__gt=last_id).values_list(
+                    'pk', flat=True
+                )
+            )
+            last_id = max(batch)
+            recipe_ids.extend(batch)
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 2))
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in batch
+                for ingredient_id in ingredients.sample(
+                    options['ingredients_per_recipe']
+                )
+            )
+        self.report('Рецепты', len(recipe_ids), started)
+        return recipe_ids
+
+    def generate_links(self, model, field, user_ids, sampler, mean):
+        """Создает связи пользователей с выбранными по Ципфу объектами.
+
+        field - поле модели со ссылкой на объект; подписка пользователя
+        на самого себя пропускается.
+        """
+
+        started = time.monotonic()
+        count = self.bulk_create(
+            model,
+            (
+                model(user_id=user_id, **{field: target_id})
+                for user_id in user_ids
+                for target_id in sampler.sample(
+                    get_tail_count(self.rng, mean)
+                )
+                if field != 'author_id' or target_id != user_id
+            ),
+        )
+        self.report(model._meta.verbose_name_plural, count, started)
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя и 1 рецепт.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+        with transaction.atomic():
+            self.load_catalogs()
+            user_ids = self.generate_users(options['users'])
+            authors = ZipfSampler(user_ids, options['zipf'], self.rng)
+            recipe_ids = self.generate_recipes(
+                options['recipes'], authors, options
+            )
+            recipes = ZipfSampler(recipe_ids, options['zipf'], self.rng)
+            self.generate_links(
+                Favorite,
+                'recipe_id',
+                user_ids,
+                recipes,
+                options['favorites'],
+            )
+            self.generate_links(
+                ShoppingCart,
+                'recipe_id',
+                user_ids,
+                recipes,
+                options['shopping_cart'],
+            )
+            self.generate_links(
+                Subscription,
+                'author_id',
+                user_ids,
+                authors,
+                options['subscriptions'],
+            )
+            rebuild_derived_data()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Данные сгенерированы за {time.monotonic() - started:.1f} с.'
+            )
+        )
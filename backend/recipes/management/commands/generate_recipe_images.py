@@ -0,0 +1,50 @@
+"""Модуль административной команды построения копий изображений."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand
+
+from recipes.images import generate_derivatives
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Административная команда для построения копий изображений
+    рецептов, загруженных до появления копий.
+    """
+
+    help = 'Строит уменьшенные копии изображений рецептов в WebP и JPEG.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить уже построенные копии.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Количество потоков построения.',
+        )
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        force = options.get('force')
+        image_names = (
+            Recipe.objects.exclude(image='')
+            .exclude(image__isnull=True)
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            generated = sum(
+                executor.map(
+                    lambda image_name: generate_derivatives(image_name, force),
+                    image_names,
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Построены копии изображений: {generated}.')
+        )
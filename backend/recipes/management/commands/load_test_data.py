@@ -1,11 +1,21 @@
 """Модуль административной команды загрузки тестовых данных."""
 
+import json
+import re
+import time
 from csv import DictReader
+from itertools import islice
 
 from django.core.files import File
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 
+from recipes import versions
+from recipes.counters import reconcile_counters
+from recipes.feed import rebuild_feeds
+from recipes.ingredient_index import build_ingredient_index
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -14,6 +24,8 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
+from recipes.search import rebuild_search_index
+from recipes.shopping_list import rebuild_shopping_lists
 from users.models import User
 
 PATH = './data/'
@@ -30,6 +42,7 @@ INGREDIENT_IN_RECIPE = 'ingredient_in_recipes.csv'
 FAVORITES = 'favorites.csv'
 SHOPPING_CARTS = 'shopping_carts.csv'
 RECIPE_IMAGES_PATH = './data/pics/'
+BATCH_SIZE = 1000
 
 RECIPE_IMAGES = {
     '1': 'borsch.jpg',
@@ -46,9 +59,87 @@ RECIPE_IMAGES = {
     '12': 'omlet.jpg',
 }
 
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(path, fieldnames=None):
+    """Построчно читает csv файл."""
+
+    with open(path, encoding=UTF, newline='') as file:
+        yield from DictReader(file, fieldnames=fieldnames)
+
+
+def read_json(path, chunk_size=1 << 16):
+    """Поэлементно читает json файл с массивом объектов,
+    не загружая его в память целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    with open(path, encoding=UTF) as file:
+        while True:
+            chunk = file.read(chunk_size)
+            buffer = buffer[position:] + chunk
+            position = 0
+            while True:
+                position = JSON_SEPARATORS.match(buffer, position).end()
+                if position == len(buffer):
+                    break
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f'{path}: ожидается массив.')
+                    started = True
+                    position += 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break
+                if end == len(buffer) and chunk:
+                    break
+                yield item
+                position = end
+            if not chunk:
+                raise ValueError(f'{path}: неожиданный конец файла.')
+
+
+def iter_batches(iterable, size):
+    """Разбивает итерируемый объект на списки не длиннее size."""
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def rebuild_derived_data():
+    """Пересчитывает данные, которые поддерживаются сигналами.
+
+    bulk_create не отправляет сигналы, поэтому после загрузки
+    пересчитываются списки покупок, счетчики, ленты и поисковый
+    индекс, увеличиваются версии каталогов, а индекс ингредиентов
+    перестраивается после фиксации транзакции.
+    """
+
+    rebuild_shopping_lists()
+    reconcile_counters()
+    rebuild_feeds()
+    rebuild_search_index()
+    for name in (versions.TAGS, versions.INGREDIENTS, versions.USERS):
+        versions.bump_version(name)
+    transaction.on_commit(build_ingredient_index)
+
 
 class Command(BaseCommand):
-    """Административная команда для загрузки тестовых данных."""
+    """Административная команда для загрузки тестовых данных.
+
+    Файлы читаются потоково и записываются пакетами bulk_create
+    в одной транзакции. Ссылки в файлах - номера строк файлов
+    ингредиентов, тегов и рецептов; пользователи нумеруются
+    начиная с созданных до загрузки, затем по строкам users.csv.
+    Уже загруженные строки пропускаются, поэтому прерванную загрузку
+    можно запустить повторно.
+    """
 
     help = (
         'Загружает тестовые данные из csv файлов и изображения в базу '
@@ -56,111 +147,287 @@ class Command(BaseCommand):
         'пользователь.'
     )
 
-    def load_ingredient(self):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать и записать данные, затем откатить транзакцию.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном запросе вставки.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=f'{PATH}{INGREDIENT}',
+            help='Файл ингредиентов, csv или json.',
+        )
+
+    def report(self, label, count, started):
+        """Выводит количество загруженных строк и скорость загрузки."""
+
+        seconds = time.monotonic() - started
+        rate = count / seconds if seconds else count
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{label} {MESSAGE} Строк: {count}, {seconds:.2f} с, '
+                f'{rate:.0f} строк/с.'
+            )
+        )
+
+    def bulk_insert(self, label, model, objects, on_batch=None):
+        """Пакетно вставляет объекты, пропуская уже существующие."""
+
+        started = time.monotonic()
+        count = 0
+        for batch in iter_batches(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            if on_batch:
+                on_batch(batch)
+            count += len(batch)
+            if self.verbosity > 1:
+                self.stdout.write(f'{label}: {count}')
+        self.report(label, count, started)
+
+    def get_recipe_id(self, ref):
+        recipe_id = self.recipe_ids[int(ref) - 1]
+        if recipe_id in self.existing_recipe_ids:
+            self.touched_recipe_ids.add(recipe_id)
+        return recipe_id
+
+    def get_user_id(self, ref):
+        return self.user_ids[int(ref) - 1]
+
+    def load_ingredient(self, path):
         """Загрузка ингредиентов."""
 
-        for row in DictReader(
-            f=open(f'{PATH}{INGREDIENT}', encoding=UTF),
-            fieldnames=INGREDIENT_FIELDS,
-        ):
-            Ingredient.objects.get_or_create(**row)
-        self.stdout.write(self.style.SUCCESS(f'{INGREDIENT} {MESSAGE}'))
+        self.ingredient_ids = []
+
+        def resolve_ids(batch):
+            ids = {
+                (name, unit): pk
+                for pk, name, unit in Ingredient.objects.filter(
+                    name__in={ingredient.name for ingredient in batch}
+                ).values_list('id', 'name', 'measurement_unit')
+            }
+            self.ingredient_ids.extend(
+                ids[ingredient.name, ingredient.measurement_unit]
+                for ingredient in batch
+            )
+
+        rows = (
+            read_json(path)
+            if path.endswith('.json')
+            else read_csv(path, INGREDIENT_FIELDS)
+        )
+        self.bulk_insert(
+            path,
+            Ingredient,
+            (
+                Ingredient(
+                    name=row['name'],
+                    measurement_unit=row['measurement_unit'],
+                )
+                for row in rows
+            ),
+            resolve_ids,
+        )
 
     def load_users(self):
         """Загрузка пользователей."""
 
-        for row in DictReader(f=open(f'{PATH}{USERS}', encoding=UTF)):
-            User.objects.get_or_create(**row)
-        self.stdout.write(self.style.SUCCESS(f'{USERS} {MESSAGE}'))
+        existing = list(User.objects.order_by('id').values_list('id', 'email'))
+        emails, loaded_ids = set(), []
+
+        def resolve_ids(batch):
+            ids = dict(
+                User.objects.filter(
+                    email__in=[user.email for user in batch]
+                ).values_list('email', 'id')
+            )
+            loaded_ids.extend(ids[user.email] for user in batch)
+            emails.update(ids)
+
+        self.bulk_insert(
+            USERS,
+            User,
+            (
+                User(**dict(row, is_active=row.get('is_active') != '0'))
+                for row in read_csv(f'{PATH}{USERS}')
+            ),
+            resolve_ids,
+        )
+        self.user_ids = [
+            pk for pk, email in existing if email not in emails
+        ] + loaded_ids
 
     def load_tags(self):
         """Загрузка тегов."""
 
-        for row in DictReader(f=open(f'{PATH}{TAGS}', encoding=UTF)):
-            Tag.objects.get_or_create(**row)
-        self.stdout.write(self.style.SUCCESS(f'{TAGS} {MESSAGE}'))
+        slugs = []
+
+        def make_tags():
+            for row in read_csv(f'{PATH}{TAGS}'):
+                slugs.append(row['slug'])
+                yield Tag(**row)
+
+        self.bulk_insert(TAGS, Tag, make_tags())
+        ids = dict(Tag.objects.values_list('slug', 'id'))
+        self.tag_ids = [ids[slug] for slug in slugs]
 
     def load_recipes(self):
         """Загрузка рецептов."""
 
-        for row in DictReader(f=open(f'{PATH}{RECIPES}', encoding=UTF)):
-            Recipe.objects.get_or_create(
-                author=User.objects.get(pk=row.pop('author_id')), **row
+        ids = {
+            (author_id, name): pk
+            for pk, author_id, name in Recipe.objects.values_list(
+                'id', 'author_id', 'name'
             )
-        self.stdout.write(self.style.SUCCESS(f'{RECIPES} {MESSAGE}'))
+        }
+        self.existing_recipe_ids = set(ids.values())
+        self.touched_recipe_ids = set()
+        keys = []
+
+        def make_recipes():
+            for row in read_csv(f'{PATH}{RECIPES}'):
+                row['author_id'] = self.get_user_id(row['author_id'])
+                key = (row['author_id'], row['name'])
+                keys.append(key)
+                if key not in ids:
+                    ids[key] = None
+                    yield Recipe(**row)
+
+        self.bulk_insert(RECIPES, Recipe, make_recipes())
+        ids = {
+            (author_id, name): pk
+            for pk, author_id, name in Recipe.objects.values_list(
+                'id', 'author_id', 'name'
+            )
+        }
+        self.recipe_ids = [ids[key] for key in keys]
 
     def load_recipe_tags(self):
         """Загрузка тегов рецептов."""
 
-        for row in DictReader(f=open(f'{PATH}{RECIPE_TAGS}', encoding=UTF)):
-            Recipe.objects.get(id=row.get('recipe_id')).tags.add(
-                row.get('tag_id')
-            )
-        self.stdout.write(self.style.SUCCESS(f'{RECIPE_TAGS} {MESSAGE}'))
+        self.bulk_insert(
+            RECIPE_TAGS,
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(
+                    recipe_id=self.get_recipe_id(row['recipe_id']),
+                    tag_id=self.tag_ids[int(row['tag_id']) - 1],
+                )
+                for row in read_csv(f'{PATH}{RECIPE_TAGS}')
+            ),
+        )
 
     def load_ingredient_in_recipe(self):
         """Загрузка ингредиентов рецептов."""
 
-        for row in DictReader(
-            f=open(f'{PATH}{INGREDIENT_IN_RECIPE}', encoding=UTF)
-        ):
-            IngredientInRecipe.objects.get_or_create(
-                recipe=Recipe.objects.get(id=row.pop('recipe_id')),
-                ingredient=Ingredient.objects.get(id=row.pop('ingredient_id')),
-                **row,
+        existing = set(
+            IngredientInRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id'
             )
-        self.stdout.write(
-            self.style.SUCCESS(f'{INGREDIENT_IN_RECIPE} {MESSAGE}')
+        )
+
+        def make_ingredients():
+            for row in read_csv(f'{PATH}{INGREDIENT_IN_RECIPE}'):
+                key = (
+                    self.get_recipe_id(row['recipe_id']),
+                    self.ingredient_ids[int(row['ingredient_id']) - 1],
+                )
+                if key not in existing:
+                    existing.add(key)
+                    yield IngredientInRecipe(
+                        recipe_id=key[0],
+                        ingredient_id=key[1],
+                        amount=int(row['amount']),
+                    )
+
+        self.bulk_insert(
+            INGREDIENT_IN_RECIPE, IngredientInRecipe, make_ingredients()
+        )
+
+    def load_user_recipes(self, file_name, model):
+        """Загрузка связей пользователей и рецептов."""
+
+        self.bulk_insert(
+            file_name,
+            model,
+            (
+                model(
+                    user_id=self.get_user_id(row['user_id']),
+                    recipe_id=self.get_recipe_id(row['recipe_id']),
+                )
+                for row in read_csv(f'{PATH}{file_name}')
+            ),
         )
 
     def load_favorites(self):
         """Загрузка избранного."""
 
-        for row in DictReader(f=open(f'{PATH}{FAVORITES}', encoding=UTF)):
-            Favorite.objects.get_or_create(
-                recipe=Recipe.objects.get(id=row.pop('recipe_id')),
-                user=User.objects.get(id=row.pop('user_id')),
-            )
-        self.stdout.write(self.style.SUCCESS(f'{FAVORITES} {MESSAGE}'))
+        self.load_user_recipes(FAVORITES, Favorite)
 
     def load_shopping_carts(self):
         """Загрузка корзины для покупок."""
 
-        for row in DictReader(f=open(f'{PATH}{SHOPPING_CARTS}', encoding=UTF)):
-            ShoppingCart.objects.get_or_create(
-                recipe=Recipe.objects.get(id=row.pop('recipe_id')),
-                user=User.objects.get(id=row.pop('user_id')),
-            )
-        self.stdout.write(self.style.SUCCESS(f'{SHOPPING_CARTS} {MESSAGE}'))
+        self.load_user_recipes(SHOPPING_CARTS, ShoppingCart)
 
     def load_recipe_images(self):
         """Загрузка изображений рецептов."""
 
-        for id, file_name in RECIPE_IMAGES.items():
-            f = open(f'{RECIPE_IMAGES_PATH}{file_name}', mode='rb')
-            image_file = File(f)
-            recipe = Recipe.objects.get(id=id)
-            recipe.image.save(file_name, image_file, save=True)
+        recipe_ids = {
+            ref: self.recipe_ids[int(ref) - 1]
+            for ref in RECIPE_IMAGES
+            if int(ref) <= len(self.recipe_ids)
+        }
+        recipes = Recipe.objects.in_bulk(recipe_ids.values())
+        for ref, file_name in RECIPE_IMAGES.items():
+            recipe = recipes.get(recipe_ids.get(ref))
+            if recipe is None or recipe.image:
+                continue
+            with open(f'{RECIPE_IMAGES_PATH}{file_name}', mode='rb') as file:
+                recipe.image.save(file_name, File(file), save=True)
             self.stdout.write(
                 self.style.SUCCESS(
                     f'{RECIPE_IMAGES_PATH}{file_name} {MESSAGE}'
                 )
             )
 
+    def update_derived_data(self):
+        """Обновляет данные, которые поддерживаются сигналами."""
+
+        for batch in iter_batches(self.touched_recipe_ids, self.batch_size):
+            Recipe.objects.filter(pk__in=batch).update(
+                updated_at=timezone.now()
+            )
+        rebuild_derived_data()
+
     def handle(self, *args, **options):
         """Исполнение административной команды."""
 
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        dry_run = options['dry_run']
+        started = time.monotonic()
         try:
             if User.objects.count() > 0:
-                self.load_ingredient()
-                self.load_users()
-                self.load_tags()
-                self.load_recipes()
-                self.load_recipe_tags()
-                self.load_ingredient_in_recipe()
-                self.load_favorites()
-                self.load_shopping_carts()
-                self.load_recipe_images()
+                with transaction.atomic():
+                    self.load_ingredient(options['ingredients'])
+                    self.load_users()
+                    self.load_tags()
+                    self.load_recipes()
+                    self.load_recipe_tags()
+                    self.load_ingredient_in_recipe()
+                    self.load_favorites()
+                    self.load_shopping_carts()
+                    if dry_run:
+                        transaction.set_rollback(True)
+                    else:
+                        self.load_recipe_images()
+                        self.update_derived_data()
             else:
                 self.stdout.write(
                     self.style.ERROR(
@@ -168,6 +435,15 @@ class Command(BaseCommand):
                         'пользователя - администратора проекта.'
                     )
                 )
+                return
         except IntegrityError as err:
-            self.stdout.write(self.style.ERROR(f'ERROR - {err}'))
-            exit()
+            raise CommandError(f'ERROR - {err}')
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('Пробный запуск, изменения отменены.')
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Загрузка завершена за {time.monotonic() - started:.2f} с.'
+            )
+        )
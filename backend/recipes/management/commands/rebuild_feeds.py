@@ -0,0 +1,24 @@
+"""Модуль административной команды пересчета лент подписок."""
+
+from django.core.management import BaseCommand
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    """Административная команда для пересчета лент подписок
+    по подпискам пользователей.
+    """
+
+    help = (
+        'Удаляет из лент подписок записи без подписки и добавляет '
+        'недостающие рецепты авторов.'
+    )
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        count = rebuild_feeds()
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересчитаны, подписок: {count}.')
+        )
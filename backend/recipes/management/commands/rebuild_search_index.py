@@ -0,0 +1,21 @@
+"""Модуль административной команды построения поискового индекса."""
+
+from django.core.management import BaseCommand
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """Административная команда для построения поискового индекса
+    рецептов заново.
+    """
+
+    help = 'Строит заново полнотекстовый индекс рецептов.'
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        count = rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Индекс построен, рецептов: {count}.')
+        )
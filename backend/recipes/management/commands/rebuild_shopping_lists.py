@@ -0,0 +1,55 @@
+"""Модуль административной команды пересчета списков покупок."""
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.shopping_list import find_drift, rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """Административная команда для проверки и пересчета
+    таблицы списков покупок по корзинам пользователей.
+    """
+
+    help = (
+        'Проверяет таблицу списков покупок на расхождения с корзинами '
+        'пользователей и пересчитывает ее.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только проверить и вывести расхождения, без пересчета.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='id пользователя, можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        user_ids = options.get('user_ids')
+        drift = find_drift(user_ids)
+        for user_id, ingredient_id, actual, expected in drift:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'{actual} != {expected}'
+            )
+
+        if options.get('verify'):
+            if drift:
+                raise CommandError(f'Найдено расхождений: {len(drift)}.')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        count = rebuild_shopping_lists(user_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Списки покупок пересчитаны, строк: {count}, '
+                f'исправлено расхождений: {len(drift)}.'
+            )
+        )
@@ -0,0 +1,60 @@
+"""Модуль административной команды пересчета счетчиков."""
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.counters import (
+    find_drift,
+    fold_favorites_count_deltas,
+    reconcile_counters,
+)
+
+
+class Command(BaseCommand):
+    """Административная команда для сворачивания приращений
+    и пересчета денормализованных счетчиков.
+    """
+
+    help = (
+        'Сворачивает приращения счетчика избранного, проверяет счетчики '
+        'избранного, рецептов и подписчиков и пересчитывает их.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только проверить и вывести расхождения, без пересчета.',
+        )
+        parser.add_argument(
+            '--fold',
+            action='store_true',
+            help='Только свернуть приращения счетчика избранного.',
+        )
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        if options.get('fold'):
+            count = fold_favorites_count_deltas()
+            self.stdout.write(
+                self.style.SUCCESS(f'Приращения свернуты, рецептов: {count}.')
+            )
+            return
+
+        drift = find_drift()
+        for field, count in drift.items():
+            self.stdout.write(f'{field}: расхождений {count}')
+
+        if options.get('verify'):
+            if any(drift.values()):
+                raise CommandError('Найдены расхождения.')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        fixed = reconcile_counters()
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Счетчики пересчитаны, исправлено строк: '
+                f'{sum(fixed.values())}.'
+            )
+        )
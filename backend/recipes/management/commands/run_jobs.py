@@ -0,0 +1,98 @@
+"""Модуль административной команды выполнения фоновых задач."""
+
+import json
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from recipes.jobs import (
+    enqueue_periodic_jobs,
+    get_job_metrics,
+    get_worker_name,
+    run_next_job,
+)
+
+
+class Command(BaseCommand):
+    """Административная команда для выполнения фоновых задач
+    в нескольких потоках.
+    """
+
+    help = (
+        'Выполняет фоновые задачи из таблицы задач до получения '
+        'сигнала завершения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.JOBS_WORKERS,
+            help='Количество потоков-обработчиков.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить доступные задачи и завершиться.',
+        )
+        parser.add_argument(
+            '--metrics',
+            action='store_true',
+            help='Вывести глубину очереди и задержки задач.',
+        )
+
+    def work(self, stop: threading.Event, once: bool):
+        """Цикл потока-обработчика."""
+
+        worker = get_worker_name()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    result = run_next_job(worker)
+                except DatabaseError as error:
+                    self.stdout.write(self.style.ERROR(f'{worker}: {error}'))
+                    connection.close()
+                    stop.wait(settings.JOBS_POLL_INTERVAL)
+                    continue
+                if result is False:
+                    self.stdout.write(self.style.ERROR(f'{worker}: ошибка.'))
+                if result is None:
+                    if once:
+                        return
+                    stop.wait(settings.JOBS_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        if options.get('metrics'):
+            self.stdout.write(json.dumps(get_job_metrics(), indent=2))
+            return
+
+        stop = threading.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *args: stop.set())
+
+        once = options.get('once')
+        threads = [
+            threading.Thread(target=self.work, args=(stop, once))
+            for _ in range(options['threads'])
+        ]
+        self.stdout.write(
+            self.style.SUCCESS(f'Запущено обработчиков: {len(threads)}.')
+        )
+        enqueue_periodic_jobs()
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            if not once and not stop.is_set():
+                enqueue_periodic_jobs()
+            time.sleep(settings.JOBS_POLL_INTERVAL)
+        connection.close()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены.'))
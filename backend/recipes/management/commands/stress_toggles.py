@@ -0,0 +1,171 @@
+"""Модуль административной команды проверки переключателей
+под одновременными запросами."""
+
+import random
+import threading
+from collections import Counter
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from recipes import counters, shopping_list
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription
+from users.models import User
+
+# Переключатели: модель, поле выбранного объекта и адрес.
+TOGGLES = (
+    (Favorite, 'recipe', '/api/recipes/{pk}/favorite/'),
+    (ShoppingCart, 'recipe', '/api/recipes/{pk}/shopping_cart/'),
+    (Subscription, 'author', '/api/users/{pk}/subscribe/'),
+)
+# Ожидаемые статусы одновременных запросов: ровно один успешный,
+# остальные получают ошибку 400.
+EXPECTED = {'POST': 201, 'DELETE': 204}
+
+
+class Command(BaseCommand):
+    """Административная команда для проверки добавления и удаления
+    избранного, корзины покупок и подписок одновременными запросами.
+
+    В каждом раунде потоки одновременно, через барьер, отправляют
+    одинаковый запрос от имени одного пользователя: сначала все
+    добавляют запись, затем все удаляют. Ровно один запрос должен
+    добавить или удалить запись, остальные - получить ошибку 400,
+    ответов 500 и повторяющихся записей быть не должно. После всех
+    раундов проверяются счетчики и списки покупок.
+    """
+
+    help = (
+        'Отправляет одновременные запросы добавления и удаления '
+        'избранного, корзины покупок и подписок и проверяет, что нет '
+        'повторяющихся записей и ответов 500.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Количество одновременных запросов.',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Раундов на каждый переключатель.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def run_concurrently(self, user, method, url, threads) -> list:
+        """Отправляет threads одинаковых запросов одновременно
+        и возвращает их статусы."""
+
+        barrier = threading.Barrier(threads)
+        statuses = []
+        lock = threading.Lock()
+
+        def work():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                response = getattr(client, method.lower())(url)
+                status = response.status_code
+            except Exception as error:
+                status = repr(error)
+            finally:
+                connection.close()
+            with lock:
+                statuses.append(status)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses
+
+    def check_round(self, model, field, url, user, pk, threads) -> list:
+        """Добавляет и удаляет запись одновременными запросами.
+
+        Возвращает описания нарушений.
+        """
+
+        errors = []
+        rows = model.objects.filter(user=user, **{field: pk})
+        for method, expected_rows in (('POST', 1), ('DELETE', 0)):
+            statuses = Counter(
+                self.run_concurrently(user, method, url, threads)
+            )
+            if statuses != {EXPECTED[method]: 1, 400: threads - 1}:
+                errors.append(f'{method} {url}: статусы {dict(statuses)}')
+            if rows.count() != expected_rows:
+                errors.append(
+                    f'{method} {url}: записей {rows.count()}, '
+                    f'ожидалось {expected_rows}'
+                )
+        return errors
+
+    def handle(self, *args, **options):
+        """Исполнение административной команды."""
+
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(is_active=True).order_by('pk'))
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        if len(users) < 2 or not recipe_ids:
+            raise CommandError('Нужны пользователи и рецепты.')
+
+        errors, requests = [], 0
+        touched = set()
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for model, field, url in TOGGLES:
+                for _ in range(options['rounds']):
+                    user = rng.choice(users)
+                    if field == 'author':
+                        candidates = [
+                            author.pk for author in users if author != user
+                        ]
+                    else:
+                        candidates = recipe_ids
+                    chosen = set(
+                        model.objects.filter(user=user).values_list(
+                            f'{field}_id', flat=True
+                        )
+                    )
+                    free = [pk for pk in candidates if pk not in chosen]
+                    if not free:
+                        continue
+                    pk = rng.choice(free)
+                    touched.add(user.pk)
+                    errors += self.check_round(
+                        model,
+                        field,
+                        url.format(pk=pk),
+                        user,
+                        pk,
+                        options['threads'],
+                    )
+                    requests += 2 * options['threads']
+
+        drift = counters.find_drift()
+        for name, count in drift.items():
+            if count:
+                errors.append(f'{name}: расхождений {count}')
+        shopping_drift = shopping_list.find_drift(touched)
+        if shopping_drift:
+            errors.append(
+                f'Списки покупок: расхождений {len(shopping_drift)}'
+            )
+
+        self.stdout.write(f'Запросов: {requests}.')
+        if errors:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError(f'Найдено ошибок: {len(errors)}.')
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Повторяющихся записей, ответов 500 и расхождений нет.'
+            )
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Subscription = apps.get_model('recipes', 'Subscription')
+
+    def count(model, field):
+        return Coalesce(
+            models.Subquery(
+                model.objects.filter(**{field: models.OuterRef('pk')})
+                .values(field)
+                .annotate(count=models.Count('pk'))
+                .values('count')
+                .order_by(),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        )
+
+    Recipe.objects.update(favorites_count=count(Favorite, 'recipe'))
+    User.objects.update(
+        recipes_count=count(Recipe, 'author'),
+        subscribers_count=count(Subscription, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shoppinglistitem'),
+        ('users', '0002_user_recipes_count_subscribers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, verbose_name='Добавлено в избранное, раз'),
+        ),
+        migrations.CreateModel(
+            name='FavoritesCountDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Приращение')),
+                ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='favorites_count_deltas', to='recipes.recipe')),
+            ],
+            options={
+                'verbose_name': 'Приращение счетчика избранного',
+                'verbose_name_plural': 'Приращения счетчика избранного',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.19 on 2026-10-18 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('recipes', 'Subscription')
+
+    subscriptions = Subscription.objects.exclude(
+        models.Q(author__subscribers_count__gte=settings.FEED_PULL_SUBSCRIBERS)
+        | models.Q(author__recipes_count__gte=settings.FEED_PULL_RECIPES)
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        FeedItem.objects.bulk_create(
+            [
+                FeedItem(
+                    user_id=user_id, recipe_id=recipe_id, author_id=author_id
+                )
+                for recipe_id in Recipe.objects.filter(
+                    author_id=author_id
+                ).values_list('id', flat=True)
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Запись ленты подписок',
+                'verbose_name_plural': 'Записи ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'author'], name='feed_item_user_author'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_recipe_in_user_feed'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+TABLE = 'recipes_recipe_search'
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {TABLE} ('
+            'recipe_id bigint PRIMARY KEY, document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {TABLE}_document ON {TABLE} USING GIN (document)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+            'name, tags, ingredients, text, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    else:
+        return
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    tags, ingredients = {}, {}
+    for recipe_id, name in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag__name'
+    ):
+        tags.setdefault(recipe_id, []).append(name)
+    for recipe_id, name in IngredientInRecipe.objects.values_list(
+        'recipe_id', 'ingredient__name'
+    ):
+        ingredients.setdefault(recipe_id, []).append(name)
+    documents = [
+        (
+            recipe_id,
+            name,
+            ' '.join(tags.get(recipe_id, ())),
+            ' '.join(ingredients.get(recipe_id, ())),
+            text,
+        )
+        for recipe_id, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        )
+    ]
+    if vendor == 'postgresql':
+        sql = (
+            f'INSERT INTO {TABLE} (recipe_id, document) VALUES (%s, '
+            "setweight(to_tsvector('russian', %s), 'A') || "
+            "setweight(to_tsvector('russian', %s), 'B') || "
+            "setweight(to_tsvector('russian', %s), 'C') || "
+            "setweight(to_tsvector('russian', %s), 'D'))"
+        )
+    else:
+        sql = (
+            f'INSERT INTO {TABLE} (rowid, name, tags, ingredients, text) '
+            'VALUES (%s, %s, %s, %s, %s)'
+        )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(sql, documents)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_feeditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
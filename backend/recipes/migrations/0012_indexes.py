@@ -0,0 +1,41 @@
+# Generated by Django 3.2.19 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+# Поиск ингредиентов по началу названия без учета регистра
+# (istartswith) выполняется как UPPER(name) LIKE 'ПРЕФИКС%'.
+INGREDIENT_NAME_INDEX = 'ingredient_name_upper'
+
+
+def create_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {INGREDIENT_NAME_INDEX} ON recipes_ingredient '
+            '(UPPER(name) text_pattern_ops)'
+        )
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX {INGREDIENT_NAME_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['author', 'user'], name='subscription_author_user'),
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index
+        ),
+    ]
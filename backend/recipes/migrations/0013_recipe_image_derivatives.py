@@ -0,0 +1,46 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:14
+
+import os
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+# Копии изображения на момент миграции: последней сохраняется копия
+# наибольшего размера в формате JPEG.
+DERIVATIVES_PATH = 'recipe/derivatives/'
+LAST_DERIVATIVE_SUFFIX = '_retina.jpeg'
+
+
+def derivatives_exist(image_name):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return default_storage.exists(
+        f'{DERIVATIVES_PATH}{stem}{LAST_DERIVATIVE_SUFFIX}'
+    )
+
+
+def mark_built_derivatives(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    image_names = (
+        Recipe.objects.exclude(image='')
+        .exclude(image__isnull=True)
+        .values_list('image', flat=True)
+        .distinct()
+    )
+    built = [name for name in image_names if derivatives_exist(name)]
+    Recipe.objects.filter(image__in=built).update(image_derivatives=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives',
+            field=models.BooleanField(default=False, verbose_name='Копии изображения построены'),
+        ),
+        migrations.RunPython(mark_built_derivatives, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_pulled_authors(apps, schema_editor):
+    PulledAuthor = apps.get_model('recipes', 'PulledAuthor')
+    User = apps.get_model('users', 'User')
+
+    author_ids = User.objects.filter(
+        models.Q(subscribers_count__gte=settings.FEED_PULL_SUBSCRIBERS)
+        | models.Q(recipes_count__gte=settings.FEED_PULL_RECIPES)
+    ).values_list('pk', flat=True)
+    PulledAuthor.objects.bulk_create(
+        [PulledAuthor(author_id=author_id) for author_id in author_ids],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulledAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_pull', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('backfilling', models.BooleanField(default=False, verbose_name='Ленты дополняются')),
+            ],
+            options={
+                'verbose_name': 'Автор, читаемый в ленты напрямую',
+                'verbose_name_plural': 'Авторы, читаемые в ленты напрямую',
+            },
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:22
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_pulledauthor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchText',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_text', serialize=False, to='recipes.recipe')),
+                ('name', models.TextField()),
+                ('tags', models.TextField()),
+                ('ingredients', models.TextField()),
+                ('text', models.TextField()),
+            ],
+            options={
+                'db_table': 'recipes_recipe_search',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeSearchVector',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_vector', serialize=False, to='recipes.recipe')),
+                ('document', django.contrib.postgres.search.SearchVectorField()),
+            ],
+            options={
+                'db_table': 'recipes_recipe_search',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,10 +1,15 @@
 """Модуль моделей приложения Recipes."""
 
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import EmptyResultSet
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from users.models import User
+from users.models import CounterFieldsMixin, User
 
 
 class Tag(models.Model):
@@ -80,7 +85,80 @@ class Ingredient(models.Model):
         ]
 
 
-class Recipe(models.Model):
+def recipe_read_lookups() -> tuple:
+    """Возвращает связи рецепта, необходимые для его отображения."""
+
+    return (
+        'author',
+        'tags',
+        models.Prefetch(
+            'ingredient',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        ),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_user_flags(self, user: User):
+        """Аннотирует рецепты признаками избранного и корзины покупок
+        текущего пользователя."""
+
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def latest_per_author(self, limit: int):
+        """Оставляет не более limit последних рецептов каждого автора.
+
+        Нумерует рецепты внутри автора оконной функцией ROW_NUMBER
+        в порядке убывания id и отбирает первые limit из них одним запросом.
+        """
+
+        ranked = (
+            self.annotate(
+                author_rank=models.Window(
+                    expression=RowNumber(),
+                    partition_by=models.F('author'),
+                    order_by=models.F('id').desc(),
+                )
+            )
+            .order_by()
+            .values('pk', 'author_rank')
+        )
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.filter(
+            pk__in=RawSQL(
+                f'SELECT "id" FROM ({sql}) AS "ranked" '
+                'WHERE "author_rank" <= %s',
+                (*params, limit),
+            )
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель Рецепт."""
 
     name = models.CharField(
@@ -124,6 +202,19 @@ class Recipe(models.Model):
     in_favorites = models.ManyToManyField(
         to=User, through='Favorite', related_name='favorite_recipes'
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True
+    )
+    favorites_count = models.IntegerField(
+        verbose_name='Добавлено в избранное, раз', default=0
+    )
+    image_derivatives = models.BooleanField(
+        verbose_name='Копии изображения построены', default=False
+    )
+
+    counter_fields = ('favorites_count',)
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self) -> str:
         return f'{self.name}'
@@ -134,6 +225,9 @@ class Recipe(models.Model):
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(fields=('author', '-id'), name='recipe_author_id'),
+        )
 
 
 class IngredientInRecipe(models.Model):
@@ -222,6 +316,68 @@ class Favorite(models.Model):
         ]
 
 
+class ShoppingListItem(models.Model):
+    """Модель Строка списка покупок.
+
+    Суммарное количество ингредиента в корзине покупок пользователя.
+    Поддерживается при изменении корзины и ингредиентов рецептов
+    (см. recipes.shopping_list), название и единица измерения
+    ингредиента хранятся в строке, чтобы список читался без соединений.
+    """
+
+    user = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    name = models.CharField(verbose_name='Название', max_length=200)
+    measurement_unit = models.CharField(
+        verbose_name='Единица измерения', max_length=200
+    )
+    amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        """Настройки модели строк списка покупок."""
+
+        ordering = ('name', 'measurement_unit')
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_ingredient_in_user_shopping_list',
+            )
+        ]
+
+
+class FavoritesCountDelta(models.Model):
+    """Модель Приращение счетчика избранного.
+
+    Для популярных рецептов изменения счетчика избранного не обновляют
+    строку рецепта, а добавляются сюда и периодически сворачиваются
+    в Recipe.favorites_count (см. recipes.counters).
+    """
+
+    # Без ограничения внешнего ключа: приращение может быть записано
+    # при каскадном удалении рецепта, уже после удаления его приращений.
+    recipe = models.ForeignKey(
+        to=Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='favorites_count_deltas',
+    )
+    delta = models.IntegerField(verbose_name='Приращение')
+
+    class Meta:
+        """Настройки модели приращений счетчика избранного."""
+
+        verbose_name = 'Приращение счетчика избранного'
+        verbose_name_plural = 'Приращения счетчика избранного'
+
+
 class Subscription(models.Model):
     """Модель подписка на авторов рецептов."""
 
@@ -255,3 +411,212 @@ class Subscription(models.Model):
                 name='users_cannot_subscribe_themselves',
             ),
         ]
+        indexes = (
+            models.Index(
+                fields=('author', 'user'), name='subscription_author_user'
+            ),
+        )
+
+
+class FeedItem(models.Model):
+    """Модель Запись ленты подписок.
+
+    Рецепты авторов, на которых подписан пользователь, записываются
+    в его ленту при создании рецепта и при оформлении подписки.
+    Рецепты авторов с большим числом подписчиков или рецептов
+    в ленты не записываются и читаются напрямую (см. recipes.feed).
+    """
+
+    user = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        to=Recipe, on_delete=models.CASCADE, related_name='feed_items'
+    )
+    author = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name='+'
+    )
+
+    class Meta:
+        """Настройки модели записей ленты подписок."""
+
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_recipe_in_user_feed',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'), name='feed_item_user_author'
+            ),
+        )
+
+
+class PulledAuthor(models.Model):
+    """Модель Автор, читаемый в ленты напрямую.
+
+    Рецепты таких авторов не записываются в ленты подписчиков,
+    а выбираются при чтении ленты (см. recipes.feed). Пока ленты
+    подписчиков дополняются рецептами автора (backfilling), новые
+    рецепты уже записываются в ленты, а чтение остается прямым.
+    """
+
+    author = models.OneToOneField(
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_pull',
+    )
+    backfilling = models.BooleanField(
+        verbose_name='Ленты дополняются', default=False
+    )
+
+    class Meta:
+        """Настройки модели авторов, читаемых в ленты напрямую."""
+
+        verbose_name = 'Автор, читаемый в ленты напрямую'
+        verbose_name_plural = 'Авторы, читаемые в ленты напрямую'
+
+
+class RecipeSearchVector(models.Model):
+    """Модель Документ рецепта в поисковом индексе PostgreSQL.
+
+    Таблица создается миграцией и заполняется модулем recipes.search,
+    модель нужна только для соединения с ней в запросах.
+    """
+
+    recipe = models.OneToOneField(
+        to=Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='search_vector',
+    )
+    document = SearchVectorField()
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_search'
+
+
+class RecipeSearchText(models.Model):
+    """Модель Документ рецепта в поисковом индексе SQLite FTS5.
+
+    Id рецепта хранится в rowid виртуальной таблицы.
+    """
+
+    recipe = models.OneToOneField(
+        to=Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='search_text',
+        db_column='rowid',
+    )
+    name = models.TextField()
+    tags = models.TextField()
+    ingredients = models.TextField()
+    text = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_search'
+
+
+class TableVersion(models.Model):
+    """Модель Версия таблицы.
+
+    Счетчик изменений данных таблицы, используется для формирования
+    валидаторов условных GET-запросов без обращения к самой таблице.
+    """
+
+    name = models.CharField(
+        verbose_name='Таблица', max_length=64, primary_key=True
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия', default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True
+    )
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.version})'
+
+    class Meta:
+        """Настройки модели версий таблиц."""
+
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+
+class Job(models.Model):
+    """Модель Фоновая задача.
+
+    Задачи выполняются командой run_jobs. Выполняющаяся задача
+    блокируется до locked_until; если обработчик не завершил ее
+    к этому времени, задачу может взять другой обработчик.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(verbose_name='Задача', max_length=100)
+    payload = models.JSONField(verbose_name='Параметры', default=dict)
+    key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name='Состояние',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток', default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток', default=5
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Выполнить после', default=timezone.now
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Заблокирована до', null=True, blank=True
+    )
+    worker = models.CharField(
+        verbose_name='Обработчик', max_length=100, blank=True
+    )
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания', auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Дата начала', null=True, blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Дата завершения', null=True, blank=True
+    )
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    class Meta:
+        """Настройки модели фоновых задач."""
+
+        ordering = ('run_after',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = (
+            models.Index(
+                fields=('status', 'run_after'), name='job_status_run_after'
+            ),
+        )
@@ -0,0 +1,227 @@
+"""Модуль полнотекстового поиска рецептов.
+
+Документ рецепта - название, названия тегов, названия ингредиентов
+и описание - хранится в отдельной таблице recipes_recipe_search:
+в PostgreSQL это столбец tsvector с GIN-индексом, в SQLite -
+виртуальная таблица FTS5 с id рецепта в rowid. Таблица создается
+миграцией и обновляется после фиксации изменений рецепта, тега
+или ингредиента.
+
+Каждое слово запроса ищется как префикс, все слова должны
+встретиться в документе. Совпадения в названии весят больше,
+чем в тегах, ингредиентах и описании.
+
+В запросах рецептов таблица присоединяется через неуправляемые
+модели RecipeSearchVector и RecipeSearchText, поэтому поиск
+сочетается с остальными условиями и сортировками ORM.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+
+from recipes.models import IngredientInRecipe, Recipe
+
+TABLE = 'recipes_recipe_search'
+BATCH_SIZE = 1000
+MAX_TERMS = 8
+# Веса названия, тегов, ингредиентов и описания в SQLite.
+# В PostgreSQL им соответствуют веса A, B, C и D.
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+TERM_RE = re.compile(r'\w+')
+
+POSTGRESQL_DOCUMENT = (
+    "setweight(to_tsvector('russian', %s), 'A') || "
+    "setweight(to_tsvector('russian', %s), 'B') || "
+    "setweight(to_tsvector('russian', %s), 'C') || "
+    "setweight(to_tsvector('russian', %s), 'D')"
+)
+
+
+class FTS5Function(Func):
+    """Выражение над таблицей FTS5, к которой относится столбец
+    первого аргумента.
+
+    Функции FTS5 принимают имя таблицы, а не столбец, поэтому
+    в SQL подставляется псевдоним присоединенной таблицы.
+    """
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, *arguments = self.source_expressions
+        sql, params = [], []
+        for argument in arguments:
+            argument_sql, argument_params = compiler.compile(argument)
+            sql.append(argument_sql)
+            params.extend(argument_params)
+        return (
+            self.template
+            % {
+                'table': connection.ops.quote_name(column.alias),
+                'expressions': ', '.join(sql),
+            },
+            params,
+        )
+
+
+class FTS5Match(FTS5Function):
+    """Условие полнотекстового поиска FTS5."""
+
+    template = '%(table)s MATCH %(expressions)s'
+    output_field = BooleanField()
+
+
+class FTS5Rank(FTS5Function):
+    """Релевантность найденной строки FTS5 с весами столбцов."""
+
+    template = '-bm25(%(table)s, %(expressions)s)'
+    output_field = FloatField()
+
+
+def is_supported() -> bool:
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def get_terms(query: str) -> list:
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def get_match_query(terms: list) -> str:
+    """Запрос полнотекстового поиска на языке базы данных."""
+
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def get_documents(recipe_ids) -> list:
+    """Возвращает документы рецептов для индекса."""
+
+    tags, ingredients = {}, {}
+    for recipe_id, name in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag__name'):
+        tags.setdefault(recipe_id, []).append(name)
+    for recipe_id, name in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        ingredients.setdefault(recipe_id, []).append(name)
+    return [
+        (
+            recipe_id,
+            name,
+            ' '.join(tags.get(recipe_id, ())),
+            ' '.join(ingredients.get(recipe_id, ())),
+            text,
+        )
+        for recipe_id, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('id', 'name', 'text')
+    ]
+
+
+def remove_recipes(recipe_ids):
+    """Удаляет рецепты из индекса."""
+
+    if not is_supported() or not recipe_ids:
+        return
+    column = 'recipe_id' if connection.vendor == 'postgresql' else 'rowid'
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE {column} IN ({placeholders})',
+            list(recipe_ids),
+        )
+
+
+def index_recipes(recipe_ids):
+    """Обновляет документы рецептов в индексе.
+
+    Рецепты, которых уже нет в базе, удаляются из индекса.
+    """
+
+    if not is_supported():
+        return
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        documents = get_documents(batch)
+        if connection.vendor == 'sqlite':
+            remove_recipes(batch)
+            sql = (
+                f'INSERT INTO {TABLE} '
+                '(rowid, name, tags, ingredients, text) '
+                'VALUES (%s, %s, %s, %s, %s)'
+            )
+        else:
+            remove_recipes(
+                set(batch) - {document[0] for document in documents}
+            )
+            sql = (
+                f'INSERT INTO {TABLE} (recipe_id, document) '
+                f'VALUES (%s, {POSTGRESQL_DOCUMENT}) '
+                'ON CONFLICT (recipe_id) '
+                'DO UPDATE SET document = EXCLUDED.document'
+            )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, documents)
+
+
+def schedule_index(recipe_ids):
+    """Обновляет документы рецептов после фиксации транзакции."""
+
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: index_recipes(recipe_ids))
+
+
+@transaction.atomic
+def rebuild_search_index() -> int:
+    """Строит индекс заново. Возвращает количество рецептов."""
+
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    recipe_ids = list(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    )
+    index_recipes(recipe_ids)
+    return len(recipe_ids)
+
+
+def search_recipes(queryset, query: str, rank: bool = True):
+    """Отбирает рецепты, подходящие под запрос.
+
+    С rank=True рецепты упорядочиваются по убыванию релевантности.
+    Без поддержки полнотекстового поиска слова ищутся в названии.
+    """
+
+    terms = get_terms(query)
+    if not terms:
+        return queryset
+    if not is_supported():
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term)
+        return queryset.filter(condition)
+
+    match_query = get_match_query(terms)
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            match_query, config='russian', search_type='raw'
+        )
+        queryset = queryset.filter(search_vector__document=search_query)
+        score = SearchRank(F('search_vector__document'), search_query)
+    else:
+        # Соединение без условия на присоединенную таблицу было бы
+        # внешним, и SQLite выполнял бы поиск для каждого рецепта.
+        queryset = queryset.filter(search_text__isnull=False).filter(
+            FTS5Match(F('search_text__name'), Value(match_query))
+        )
+        score = FTS5Rank(
+            F('search_text__name'), *(Value(weight) for weight in WEIGHTS)
+        )
+    if not rank:
+        return queryset
+    return queryset.annotate(search_rank=score).order_by('-search_rank', '-id')
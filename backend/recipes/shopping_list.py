@@ -0,0 +1,271 @@
+"""Модуль поддержки списков покупок.
+
+Таблица ShoppingListItem хранит для каждого пользователя суммарное
+количество каждого ингредиента рецептов из его корзины покупок.
+Изменения корзины и ингредиентов рецептов применяются к ней
+приращениями, а rebuild_shopping_lists пересчитывает ее целиком
+для восстановления после расхождений.
+"""
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.models import (
+    Ingredient,
+    IngredientInRecipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+
+
+def get_recipe_amounts(recipe_ids) -> dict:
+    """Возвращает суммарные количества ингредиентов рецептов
+    по id ингредиента."""
+
+    amounts = defaultdict(int)
+    for ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def get_deltas(old: dict, new: dict) -> dict:
+    """Возвращает ненулевые разности количеств ингредиентов."""
+
+    deltas = {
+        ingredient_id: new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        for ingredient_id in set(old) | set(new)
+    }
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def apply_deltas(user_ids, deltas: dict):
+    """Применяет приращения количеств ингредиентов
+    к спискам покупок пользователей.
+
+    Существующие строки изменяются одним UPDATE, недостающие
+    создаются одним INSERT, поэтому количество запросов не зависит
+    от количества ингредиентов.
+    """
+
+    user_ids = set(user_ids)
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        ).update(
+            amount=F('amount')
+            + Case(
+                *[
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        added = [key for key, delta in deltas.items() if delta > 0]
+        existing = set(
+            ShoppingListItem.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=added
+            ).values_list('user_id', 'ingredient_id')
+        )
+        missing = [
+            (user_id, ingredient_id)
+            for user_id in user_ids
+            for ingredient_id in added
+            if (user_id, ingredient_id) not in existing
+        ]
+        if missing:
+            create_items(missing, deltas)
+        ShoppingListItem.objects.filter(
+            user_id__in=user_ids, amount__lte=0
+        ).delete()
+
+
+def create_items(keys, deltas: dict):
+    """Создает строки списков покупок для пар
+    (id пользователя, id ингредиента).
+
+    Если какую-то из строк одновременно создал другой запрос, строки
+    создаются по одной.
+    """
+
+    ingredients = Ingredient.objects.in_bulk(
+        {ingredient_id for _, ingredient_id in keys}
+    )
+    try:
+        with transaction.atomic():
+            ShoppingListItem.objects.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient=ingredients[ingredient_id],
+                        name=ingredients[ingredient_id].name,
+                        measurement_unit=(
+                            ingredients[ingredient_id].measurement_unit
+                        ),
+                        amount=deltas[ingredient_id],
+                    )
+                    for user_id, ingredient_id in keys
+                ]
+            )
+    except IntegrityError:
+        for user_id, ingredient_id in keys:
+            create_item(
+                user_id, ingredients[ingredient_id], deltas[ingredient_id]
+            )
+
+
+def create_item(user_id, ingredient: Ingredient, amount: int):
+    """Создает строку списка покупок.
+
+    Если строку одновременно создал другой запрос, увеличивает ее.
+    """
+
+    try:
+        with transaction.atomic():
+            ShoppingListItem.objects.create(
+                user_id=user_id,
+                ingredient=ingredient,
+                name=ingredient.name,
+                measurement_unit=ingredient.measurement_unit,
+                amount=amount,
+            )
+    except IntegrityError:
+        ShoppingListItem.objects.filter(
+            user_id=user_id, ingredient=ingredient
+        ).update(amount=F('amount') + amount)
+
+
+def add_recipe(user_id, recipe_id):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+
+    add_recipes(user_id, [recipe_id])
+
+
+def add_recipes(user_id, recipe_ids):
+    """Добавляет ингредиенты рецептов в список покупок пользователя."""
+
+    apply_deltas([user_id], get_recipe_amounts(recipe_ids))
+
+
+def remove_recipe(user_id, recipe_id):
+    """Убирает ингредиенты рецепта из списка покупок пользователя."""
+
+    remove_recipes(user_id, [recipe_id])
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Убирает ингредиенты рецептов из списка покупок пользователя."""
+
+    apply_deltas(
+        [user_id],
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(
+                recipe_ids
+            ).items()
+        },
+    )
+
+
+def change_recipe(recipe_id, deltas: dict):
+    """Применяет изменение ингредиентов рецепта к спискам покупок
+    пользователей, добавивших его в корзину."""
+
+    if deltas:
+        apply_deltas(
+            ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+                'user_id', flat=True
+            ),
+            deltas,
+        )
+
+
+def get_expected_items(user_ids=None) -> dict:
+    """Пересчитывает списки покупок по корзинам.
+
+    Возвращает словарь (id пользователя, id ингредиента): строка.
+    """
+
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    rows = (
+        IngredientInRecipe.objects.filter(
+            recipe__shopping_cart_recipes__in=carts
+        )
+        .values(
+            'recipe__shopping_cart_recipes__user',
+            'ingredient',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        )
+        .annotate(amount=Sum('amount'))
+        .order_by()
+    )
+    return {
+        (row['recipe__shopping_cart_recipes__user'], row['ingredient']): (
+            ShoppingListItem(
+                user_id=row['recipe__shopping_cart_recipes__user'],
+                ingredient_id=row['ingredient'],
+                name=row['ingredient__name'],
+                measurement_unit=row['ingredient__measurement_unit'],
+                amount=row['amount'],
+            )
+        )
+        for row in rows
+    }
+
+
+def find_drift(user_ids=None) -> list:
+    """Возвращает расхождения таблицы списков покупок с корзинами.
+
+    Каждое расхождение - кортеж (id пользователя, id ингредиента,
+    количество в таблице, ожидаемое количество).
+    """
+
+    expected = get_expected_items(user_ids)
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    actual = {
+        (item.user_id, item.ingredient_id): item for item in items.iterator()
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        expected_item, actual_item = expected.get(key), actual.get(key)
+        expected_row = expected_item and (
+            expected_item.name,
+            expected_item.measurement_unit,
+            expected_item.amount,
+        )
+        actual_row = actual_item and (
+            actual_item.name,
+            actual_item.measurement_unit,
+            actual_item.amount,
+        )
+        if expected_row != actual_row:
+            drift.append((*key, actual_row, expected_row))
+    return drift
+
+
+@transaction.atomic
+def rebuild_shopping_lists(user_ids=None) -> int:
+    """Пересчитывает таблицу списков покупок целиком.
+
+    Возвращает количество записанных строк.
+    """
+
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    expected = get_expected_items(user_ids)
+    ShoppingListItem.objects.bulk_create(expected.values(), batch_size=1000)
+    return len(expected)
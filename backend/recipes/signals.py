@@ -0,0 +1,341 @@
+"""Модуль обработчиков сигналов приложения Recipes."""
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import counters, feed, search, shopping_list
+from recipes.images import delete_derivatives, schedule_derivatives
+from recipes.ingredient_index import invalidate_ingredient_index
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Subscription,
+    Tag,
+)
+from recipes.tag_registry import tag_registry
+from recipes.versions import INGREDIENTS, TAGS, USERS, bump_version
+from users.models import User
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс ингредиентов после фиксации изменений."""
+
+    transaction.on_commit(invalidate_ingredient_index)
+
+
+def is_last_login_update(update_fields) -> bool:
+    """Обновлена только дата последнего входа пользователя.
+
+    Такое изменение не влияет на данные, отдаваемые API.
+    """
+
+    return bool(update_fields) and set(update_fields) <= {'last_login'}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    """Увеличивает версию каталога ингредиентов."""
+
+    bump_version(INGREDIENTS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    """Увеличивает версию каталога тегов."""
+
+    bump_version(TAGS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_tag_registry(sender, **kwargs):
+    """Сбрасывает реестр тегов процесса после фиксации изменений."""
+
+    transaction.on_commit(tag_registry.invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_version(sender, update_fields=None, **kwargs):
+    """Увеличивает версию пользователей."""
+
+    if is_last_login_update(update_fields):
+        return
+    bump_version(USERS)
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_ingredient_change(sender, instance, created, **kwargs):
+    """Обновляет дату изменения рецептов с измененным ингредиентом."""
+
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Tag)
+def touch_recipes_on_tag_change(sender, instance, created, **kwargs):
+    """Обновляет дату изменения рецептов с измененным тегом."""
+
+    if not created:
+        Recipe.objects.filter(tags=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=User)
+def touch_recipes_on_author_change(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """Обновляет дату изменения рецептов автора при изменении его данных."""
+
+    if not created and not is_last_login_update(update_fields):
+        Recipe.objects.filter(author=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def touch_recipe_on_ingredient_change(sender, instance, **kwargs):
+    """Обновляет дату изменения рецепта при изменении его ингредиентов."""
+
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_on_tags_change(sender, instance, action, pk_set, **kwargs):
+    """Обновляет дату изменения рецепта при изменении его тегов."""
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Recipe):
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set or ())
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок."""
+
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    """Убирает ингредиенты рецепта из списка покупок.
+
+    При каскадном удалении рецепта его строки корзины и ингредиенты
+    удаляются в произвольном порядке. Обработчики удаления вычитают
+    только то, что еще связано в базе, поэтому количество
+    вычитается ровно один раз при любом порядке.
+    """
+
+    shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_ingredient_in_recipe(sender, instance, **kwargs):
+    """Запоминает прежний ингредиент и количество перед изменением."""
+
+    instance._previous = (
+        IngredientInRecipe.objects.filter(pk=instance.pk)
+        .values_list('ingredient_id', 'amount')
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def change_shopping_lists_on_save(sender, instance, **kwargs):
+    """Применяет изменение ингредиента рецепта к спискам покупок."""
+
+    old = dict([instance._previous]) if instance._previous else {}
+    shopping_list.change_recipe(
+        instance.recipe_id,
+        shopping_list.get_deltas(
+            old, {instance.ingredient_id: int(instance.amount)}
+        ),
+    )
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def change_shopping_lists_on_delete(sender, instance, **kwargs):
+    """Убирает удаленный ингредиент рецепта из списков покупок."""
+
+    shopping_list.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: -int(instance.amount)}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def rename_shopping_list_items(sender, instance, created, **kwargs):
+    """Обновляет название и единицу измерения в списках покупок."""
+
+    if not created:
+        ShoppingListItem.objects.filter(ingredient=instance).update(
+            name=instance.name, measurement_unit=instance.measurement_unit
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def change_favorites_count(sender, instance, created=False, **kwargs):
+    """Изменяет счетчик избранного рецепта."""
+
+    if created or kwargs['signal'] is post_delete:
+        counters.change_favorites_count(
+            instance.recipe_id, 1 if created else -1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def change_recipes_count(sender, instance, created=False, **kwargs):
+    """Изменяет счетчик рецептов автора."""
+
+    if created or kwargs['signal'] is post_delete:
+        counters.change_recipes_count(
+            instance.author_id, 1 if created else -1
+        )
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def change_subscribers_count(sender, instance, created=False, **kwargs):
+    """Изменяет счетчик подписчиков автора."""
+
+    if created or kwargs['signal'] is post_delete:
+        counters.change_subscribers_count(
+            instance.author_id, 1 if created else -1
+        )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    """Запоминает прежнее изображение рецепта перед изменением.
+
+    Отметка о копиях берется из базы: при замене изображения она
+    сбрасывается, иначе сохраняется как есть.
+    """
+
+    previous = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list('image', 'image_derivatives')
+        .first()
+        if instance.pk
+        else None
+    )
+    instance._previous_image, derivatives = previous or (None, False)
+    # Новый файл еще не записан в хранилище, и его имя может измениться.
+    unchanged = (
+        instance.image._committed
+        and instance.image.name == instance._previous_image
+    )
+    instance.image_derivatives = unchanged and derivatives
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Ставит построение копий изображения рецепта в очередь
+    и удаляет копии замененного изображения."""
+
+    if instance.image and not instance.image_derivatives:
+        schedule_derivatives(instance.image.name)
+    previous = instance._previous_image
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: delete_derivatives(previous))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_derivatives(sender, instance, **kwargs):
+    """Удаляет копии изображения удаленного рецепта."""
+
+    if instance.image:
+        image_name = instance.image.name
+        transaction.on_commit(lambda: delete_derivatives(image_name))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    """Записывает новый рецепт в ленты подписчиков автора."""
+
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    """Добавляет рецепты автора в ленту нового подписчика."""
+
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_feed(sender, instance, **kwargs):
+    """Удаляет рецепты автора из ленты отписавшегося пользователя."""
+
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    """Обновляет документ рецепта в поисковом индексе.
+
+    Индекс обновляется после фиксации транзакции, когда теги
+    и ингредиенты рецепта уже записаны.
+    """
+
+    search.schedule_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_index(sender, instance, **kwargs):
+    """Удаляет рецепт из поискового индекса."""
+
+    search.remove_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def index_recipes_on_tag_change(sender, instance, created, **kwargs):
+    """Обновляет в индексе рецепты с измененным тегом."""
+
+    if not created:
+        search.schedule_index(
+            Recipe.objects.filter(tags=instance).values_list('pk', flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def index_recipes_on_ingredient_change(sender, instance, created, **kwargs):
+    """Обновляет в индексе рецепты с измененным ингредиентом."""
+
+    if not created:
+        search.schedule_index(
+            Recipe.objects.filter(ingredients=instance).values_list(
+                'pk', flat=True
+            )
+        )
@@ -0,0 +1,56 @@
+"""Модуль реестра тегов.
+
+Тегов немного, и меняются они редко, поэтому соответствие слагов
+и id хранится в памяти процесса. Реестр перечитывается, если
+изменилась версия каталога тегов; версия проверяется не чаще раза
+в TAG_REGISTRY_TTL секунд. В процессе, изменившем тег, реестр
+сбрасывается сразу после фиксации изменений.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.models import Tag
+from recipes.versions import TAGS, get_versions
+
+
+class TagRegistry:
+    """Соответствие слагов тегов и их id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._version = None
+        self._checked_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def get_ids(self) -> dict:
+        """Возвращает словарь id тегов по слагам."""
+
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._ids is not None
+                and now - self._checked_at < settings.TAG_REGISTRY_TTL
+            ):
+                return self._ids
+            version = get_versions(TAGS)[TAGS][0]
+            if self._ids is None or version != self._version:
+                self._ids = dict(Tag.objects.values_list('slug', 'id'))
+                self._version = version
+            self._checked_at = now
+            return self._ids
+
+
+tag_registry = TagRegistry()
+
+
+def get_tag_choices() -> list:
+    """Варианты слагов для фильтров и форм."""
+
+    return [(slug, slug) for slug in tag_registry.get_ids()]
@@ -0,0 +1,41 @@
+"""Модуль счетчиков версий таблиц.
+
+Версии используются в качестве валидаторов (ETag, Last-Modified)
+для условных GET-запросов к каталогам тегов, ингредиентов и рецептам.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import TableVersion
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+USERS = 'users'
+
+
+def bump_version(name: str):
+    """Увеличивает версию таблицы."""
+
+    updated = TableVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        TableVersion.objects.get_or_create(name=name)
+        bump_version(name)
+
+
+def get_versions(*names: str) -> dict:
+    """Возвращает версии и даты изменения таблиц одним запросом.
+
+    Для таблиц, которые еще не изменялись, возвращает нулевую версию.
+    """
+
+    versions = {name: (0, None) for name in names}
+    versions.update(
+        (name, (version, updated_at))
+        for name, version, updated_at in TableVersion.objects.filter(
+            name__in=names
+        ).values_list('name', 'version', 'updated_at')
+    )
+    return versions
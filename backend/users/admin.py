@@ -14,6 +14,13 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'subscribers_count',
+    )
+    # Счетчики изменяются только приращениями, см. recipes.counters.
+    readonly_fields = (
+        'recipes_count',
+        'subscribers_count',
     )
     list_filter = (
         'email',
@@ -6,7 +6,44 @@ from django.db.models import UniqueConstraint
 from django.utils.translation import gettext_lazy as _
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Примесь к модели с денормализованными счетчиками.
+
+    Счетчики counter_fields изменяются запросами UPDATE
+    (recipes.counters), поэтому их значения в загруженном экземпляре
+    могут устареть. save() существующей строки без update_fields
+    сохраняет все загруженные поля, кроме счетчиков.
+    """
+
+    counter_fields = ()
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        if update_fields is None and not (
+            force_insert or self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель пользователя."""
 
     username = models.CharField(
@@ -45,6 +82,15 @@ class User(AbstractUser):
         },
     )
 
+    recipes_count = models.IntegerField(
+        verbose_name='Количество рецептов', default=0
+    )
+    subscribers_count = models.IntegerField(
+        verbose_name='Количество подписчиков', default=0
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name', 'password', 'id')
 
@@ -40,9 +40,27 @@ class DjoserUserSerializer(DjoserStandartUserSerializer):
             'password': {'write_only': True},
         }
 
+    def get_subscribed_author_ids(self) -> set:
+        """Возвращает id авторов, на которых подписан текущий пользователь.
+
+        Множество загружается одним запросом и хранится в объекте запроса,
+        поэтому разделяется всеми сериализаторами одного ответа.
+        """
+
+        request = self.context.get('request')
+        if not hasattr(request, 'subscribed_author_ids'):
+            request.subscribed_author_ids = set(
+                Subscription.objects.filter(user=request.user).values_list(
+                    'author_id', flat=True
+                )
+            )
+        return request.subscribed_author_ids
+
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user: User = self.context.get('request').user
         return (
             user.is_authenticated
-            and Subscription.objects.filter(user=user, author=obj).exists()
+            and obj.pk in self.get_subscribed_author_ids()
         )